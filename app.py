@@ -5,17 +5,47 @@ A lightweight web application for transcribing audio from YouTube videos and loc
 """
 
 import os
-import tempfile
 import shutil
-from flask import Flask, request, render_template, jsonify, send_file
-import whisper
-import yt_dlp
+from flask import Flask, Response, request, render_template, jsonify, send_file
 from werkzeug.utils import secure_filename
 import logging
 from datetime import datetime
+import functools
+import gc
 import json
-from docx import Document
+import re
 import threading
+import time
+import uuid
+from jobs import JobQueue, QueueFullError, TranscriptionCancelled
+from job_store import JobStore
+from model_registry import ModelRegistry, estimated_model_mb
+from model_policy import AUTO_MODEL, ModelPolicy
+from quantization import PRECISIONS, load_model, model_key
+from batched_inference import InferenceEngine, SerializedModel
+from chunking import SAMPLE_RATE, transcribe_parallel, transcribe_sequential
+import transcript_cache
+from transcript_cache import TranscriptCache
+from pcm_cache import PCMCache, file_key
+from ingest import AudioBuffer, PCMStreamDecoder, StreamingUploadRequest, UploadSink, decode_file
+from live import LiveTranscriber
+from transcript_store import TRANSCRIPT_EXTENSION, TranscriptReader, write_transcript
+from exporters import EXPORT_FORMATS, ExportCache
+from search_index import TRANSCRIPT_FILE_EXTENSIONS, SearchIndex
+from catalog import TranscriptCatalog
+from maintenance import InsufficientStorageError, Maintenance
+from batch import BatchRunner
+from youtube_fetch import Fetch, YouTubeFetcher
+from vad import compact_speech
+from metrics import RATIO_BUCKETS, MetricsRegistry, StageTimer
+import click
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    # Live transcription over WebSocket needs flask-sock
+    Sock = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +55,57 @@ app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['TRANSCRIPTS_FOLDER'] = 'transcripts'
+app.config['TRANSCRIPTION_WORKERS'] = 2  # Number of background transcription workers
+app.config['MAX_QUEUED_JOBS'] = 50  # Jobs allowed to wait before requests get a 429
+app.config['MODEL_CONCURRENCY'] = {'medium': 1, 'large': 1}  # Max running jobs per model size
+app.config['MODEL_MEMORY_BUDGET_MB'] = 4096  # Memory allowed for resident Whisper models
+app.config['PRELOAD_MODELS'] = ['base']  # Model sizes warmed up in the background at startup
+app.config['INFERENCE_PRECISION'] = 'fp32'  # Weights used unless a request asks otherwise: fp32, or int8 for dynamically quantized models
+app.config['AUTO_MODEL_SIZES'] = ['tiny', 'base', 'small', 'medium']  # Candidates for model_size "auto", fastest first
+app.config['AUTO_TARGET_SECONDS'] = 300  # Completion time, queue wait included, that "auto" aims for
+app.config['AUTO_ASSUMED_SECONDS'] = 600  # Audio length "auto" assumes when it is not known at submission
+app.config['DRAFT_MODEL'] = 'tiny'  # Fast first pass for requests that ask to refine
+app.config['AUTO_REFINE_MODEL'] = 'small'  # Model whose result replaces the draft when "auto" is refined
+app.config['PARALLEL_TRANSCRIPTION'] = True  # Split long audio across a process pool
+app.config['PARALLEL_MIN_SECONDS'] = 20 * 60  # Audio at least this long is transcribed in chunks
+app.config['PARALLEL_CHUNK_SECONDS'] = 5 * 60  # Target chunk length, cut at the nearest pause
+app.config['PARALLEL_PROCESSES'] = os.cpu_count()  # Processes (one model each) for chunked transcription
+app.config['STREAM_WINDOW_SECONDS'] = 25  # Window size for incremental transcription with progress events
+app.config['INFERENCE_BATCHING'] = True  # Run concurrent jobs' encoder passes on the same model as one batch
+app.config['INFERENCE_MAX_BATCH'] = 8  # Most mel windows encoded in one batch
+app.config['INFERENCE_MAX_WAIT_MS'] = 50  # Longest a window waits for others to join its batch
+app.config['LIVE_MAX_SESSIONS'] = 4  # Concurrent live WebSocket transcriptions, each re-decoding its buffer continuously
+app.config['LIVE_STEP_SECONDS'] = 1.0  # New audio that triggers another pass over a live buffer
+app.config['LIVE_BUFFER_SECONDS'] = 15  # Live buffer length beyond which committed audio is trimmed
+app.config['LIVE_MAX_BUFFER_SECONDS'] = 25  # Live buffer length at which tentative words are committed regardless
+app.config['LIVE_IDLE_SECONDS'] = 30  # A live stream sending nothing for this long is ended
+app.config['YOUTUBE_DOWNLOAD_WORKERS'] = 3  # YouTube audio streams fetched at once, alongside transcription
+app.config['YOUTUBE_READY_SECONDS'] = 30  # Audio buffered before transcription of a download may start
+app.config['VAD_ENABLED'] = False  # Skip silence before transcription unless a request says otherwise
+app.config['VAD_MIN_SILENCE_SECONDS'] = 1.0  # Shorter pauses are transcribed as part of the speech around them
+app.config['WORD_TIMESTAMPS_ENABLED'] = False  # Store per-word timings unless a request says otherwise
+app.config['CACHE_FOLDER'] = 'cache'
+app.config['TRANSCRIPT_CACHE_MAX_BYTES'] = 512 * 1024 * 1024  # Size bound for cached transcription results
+app.config['PCM_CACHE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # Decoded audio kept on disk for re-transcription
+app.config['PCM_CACHE_MEMORY_BYTES'] = 256 * 1024 * 1024  # Decoded audio of short recordings kept in memory
+app.config['PCM_CACHE_MMAP_MIN_SECONDS'] = 5 * 60  # Recordings at least this long are cached as memory-mapped files
+app.config['SEARCH_INDEX_PATH'] = os.path.join(app.config['CACHE_FOLDER'], 'search.sqlite3')
+app.config['CATALOG_PATH'] = os.path.join(app.config['CACHE_FOLDER'], 'catalog.sqlite3')
+app.config['MAINTENANCE_INTERVAL_SECONDS'] = 600  # How often retention policies are applied in the background
+app.config['MIN_FREE_DISK_BYTES'] = 1024 * 1024 * 1024  # New uploads and jobs are refused (507) below this much free space
+app.config['RECLAIM_FREE_DISK_BYTES'] = 2 * 1024 * 1024 * 1024  # Maintenance evicts cached data to keep this much free
+app.config['UPLOAD_MAX_AGE_SECONDS'] = 24 * 3600  # Uploads left behind longer than this are removed
+app.config['ORPHAN_GRACE_SECONDS'] = 300  # Leftover uploads and partial writes older than this are removed at startup
+app.config['EXPORT_MAX_AGE_SECONDS'] = 7 * 24 * 3600  # Rendered exports are re-rendered after this long
+app.config['EXPORT_CACHE_MAX_BYTES'] = 1024 * 1024 * 1024  # Size bound for rendered exports
+app.config['TRANSCRIPT_MAX_AGE_DAYS'] = None  # Transcripts older than this are deleted; None keeps them
+app.config['TRANSCRIPTS_MAX_BYTES'] = None  # Oldest transcripts are deleted beyond this total; None for no limit
+app.config['TRANSCRIPT_SOURCE_QUOTAS'] = {}  # Bytes of transcripts kept per source, e.g. {'youtube': 5 * 1024 ** 3}
+app.config['BATCH_INPUT_FOLDER'] = 'batch_inputs'  # Server-side directories /batch may read from
+app.config['BATCH_MANIFEST_FOLDER'] = os.path.join(app.config['TRANSCRIPTS_FOLDER'], 'batches')
+app.config['BATCH_MAX_QUEUED_JOBS'] = 10  # Batch items allowed to wait in the job queue at once, across all batches
+# SQLite file holding job state shared by worker processes; set by gunicorn.conf.py
+app.config['JOB_STORE_PATH'] = os.environ.get('JOB_STORE_PATH')
 
 # Create necessary directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -33,122 +114,417 @@ os.makedirs(app.config['TRANSCRIPTS_FOLDER'], exist_ok=True)
 # Supported file extensions
 ALLOWED_EXTENSIONS = {'mp3', 'mp4', 'wav', 'flac', 'm4a', 'ogg', 'wma', 'aac'}
 
-# Global variable to store the Whisper model
-whisper_model = None
+# Decode uploads through ffmpeg while the request body is still arriving
+StreamingUploadRequest.allowed_extensions = ALLOWED_EXTENSIONS
+app.request_class = StreamingUploadRequest
+
+def whisper_loader(model_size):
+    """Load a Whisper model (or quantized variant), importing whisper and torch on first use."""
+    return load_model(model_size)
+
+# Resident Whisper models, shared by all workers
+model_registry = ModelRegistry(whisper_loader, memory_budget_mb=app.config['MODEL_MEMORY_BUDGET_MB'])
+
+# Picks a model size for "auto" requests from audio length and queue load
+model_policy = ModelPolicy(
+    sizes=app.config['AUTO_MODEL_SIZES'],
+    target_seconds=app.config['AUTO_TARGET_SECONDS'],
+    assumed_seconds=app.config['AUTO_ASSUMED_SECONDS'],
+)
+
+# Shares encoder passes between jobs transcribing with the same model
+inference_engine = InferenceEngine(
+    max_batch=app.config['INFERENCE_MAX_BATCH'],
+    max_wait_seconds=app.config['INFERENCE_MAX_WAIT_MS'] / 1000,
+)
+
+# Results keyed on audio content, model size and decode options
+transcript_cache_store = TranscriptCache(
+    os.path.join(app.config['CACHE_FOLDER'], 'transcripts'),
+    max_bytes=app.config['TRANSCRIPT_CACHE_MAX_BYTES'],
+)
+
+# Decoded 16 kHz PCM, so re-running a source with another model skips ffmpeg
+pcm_cache = PCMCache(
+    os.path.join(app.config['CACHE_FOLDER'], 'pcm'),
+    disk_max_bytes=app.config['PCM_CACHE_MAX_BYTES'],
+    memory_max_bytes=app.config['PCM_CACHE_MEMORY_BYTES'],
+    mmap_min_seconds=app.config['PCM_CACHE_MMAP_MIN_SECONDS'],
+)
+
+# Rendered TXT/SRT/VTT/DOCX/JSON exports, keyed on the transcript version
+export_cache = ExportCache(os.path.join(app.config['CACHE_FOLDER'], 'exports'))
+
+# Full-text index over transcript segments
+search_index = SearchIndex(app.config['SEARCH_INDEX_PATH'])
+
+# Metadata of every saved transcript, for listings and lookups by name
+transcript_catalog = TranscriptCatalog(app.config['CATALOG_PATH'])
+
+# Retention policies and disk-pressure reclamation for uploads, transcripts and caches
+maintenance = Maintenance(
+    app.config['UPLOAD_FOLDER'],
+    app.config['TRANSCRIPTS_FOLDER'],
+    export_cache,
+    # Decoded audio is cheaper to recreate than a transcription result
+    caches=[('pcm_cache', pcm_cache), ('transcript_cache', transcript_cache_store)],
+    catalog=transcript_catalog,
+    on_transcript_removed=search_index.remove,
+    temp_folders=[pcm_cache.folder, transcript_cache_store.folder],
+    interval_seconds=app.config['MAINTENANCE_INTERVAL_SECONDS'],
+    min_free_bytes=app.config['MIN_FREE_DISK_BYTES'],
+    reclaim_free_bytes=app.config['RECLAIM_FREE_DISK_BYTES'],
+    upload_max_age_seconds=app.config['UPLOAD_MAX_AGE_SECONDS'],
+    export_max_age_seconds=app.config['EXPORT_MAX_AGE_SECONDS'],
+    export_max_bytes=app.config['EXPORT_CACHE_MAX_BYTES'],
+    transcript_max_age_seconds=(app.config['TRANSCRIPT_MAX_AGE_DAYS'] * 86400
+                                if app.config['TRANSCRIPT_MAX_AGE_DAYS'] is not None else None),
+    transcripts_max_bytes=app.config['TRANSCRIPTS_MAX_BYTES'],
+    source_quotas=app.config['TRANSCRIPT_SOURCE_QUOTAS'],
+    orphan_grace_seconds=app.config['ORPHAN_GRACE_SECONDS'],
+)
+
+def sync_transcript_indexes():
+    """Catch the catalog and search index up with files added or removed while the service was down,
+    then sweep up what a process that died mid-job left behind."""
+    transcript_catalog.sync_folder(app.config['TRANSCRIPTS_FOLDER'])
+    search_index.sync_folder(app.config['TRANSCRIPTS_FOLDER'])
+    maintenance.sweep_orphans()
 
-# Global variable to track the current transcription thread
-current_transcription_thread = None
-cancel_event = threading.Event()
+# Runs in the background so startup isn't delayed
+transcript_index_sync = threading.Thread(target=sync_transcript_indexes, daemon=True)
+transcript_index_sync.start()
+
+# Job status, events and metric values visible to every worker process when serving with several
+job_store = JobStore(app.config['JOB_STORE_PATH']) if app.config['JOB_STORE_PATH'] else None
+
+# Metrics exposed at /metrics, totalled across worker processes through the job store
+metrics = MetricsRegistry(store=job_store)
+stage_seconds = metrics.histogram('transcriber_stage_seconds', 'Seconds spent per job in each pipeline stage', ['stage'])
+real_time_factor = metrics.histogram('transcriber_real_time_factor', 'Inference seconds per second of audio',
+                                     ['model_size'], buckets=RATIO_BUCKETS)
+audio_seconds_total = metrics.counter('transcriber_audio_seconds_total', 'Seconds of audio transcribed', ['model_size'])
+bytes_processed_total = metrics.counter('transcriber_bytes_processed_total', 'Bytes of input audio received', ['source'])
+jobs_total = metrics.counter('transcriber_jobs_total', 'Finished jobs by kind and outcome', ['kind', 'status'])
+job_errors_total = metrics.counter('transcriber_job_errors_total', 'Failed jobs by exception type', ['type'])
+cache_requests_total = metrics.counter('transcriber_cache_requests_total', 'Cache lookups by cache and result',
+                                       ['cache', 'result'])
+model_evictions_total = metrics.counter('transcriber_model_evictions_total', 'Models evicted from memory')
+queue_depth = metrics.gauge('transcriber_queue_depth', 'Jobs waiting to start')
+jobs_running = metrics.gauge('transcriber_jobs_running', 'Jobs currently running')
+models_loaded = metrics.gauge('transcriber_models_loaded', 'Whisper models resident in memory')
+encoder_batches_total = metrics.counter('transcriber_encoder_batches_total', 'Batched encoder passes run')
+encoder_windows_total = metrics.counter('transcriber_encoder_windows_total', 'Mel windows encoded in batches')
+reclaimed_bytes_total = metrics.counter('transcriber_reclaimed_bytes_total', 'Disk space freed by maintenance',
+                                        ['area', 'reason'])
+reclaimed_files_total = metrics.counter('transcriber_reclaimed_files_total', 'Files removed by maintenance',
+                                        ['area', 'reason'])
+storage_rejections_total = metrics.counter('transcriber_storage_rejections_total',
+                                           'Requests refused for lack of free disk space')
+disk_free_bytes = metrics.gauge('transcriber_disk_free_bytes', 'Free disk space for uploads and transcripts',
+                                aggregate='max')
+
+def record_job_finished(job):
+    jobs_total.inc(kind=job.kind or 'unknown', status=job.status)
+    if job.status == 'failed':
+        job_errors_total.inc(type=job.error_type or 'unknown')
+    elif job.status == 'completed' and job.started_at and job.finished_at:
+        run_seconds = datetime.fromisoformat(job.finished_at) - datetime.fromisoformat(job.started_at)
+        model_policy.observe_job(run_seconds.total_seconds())
+
+def record_stage_timings(timer):
+    for stage, seconds in timer.seconds.items():
+        stage_seconds.observe(seconds, stage=stage)
+
+# Background queue that runs transcriptions outside the request thread
+job_queue = JobQueue(
+    workers=app.config['TRANSCRIPTION_WORKERS'],
+    max_queue_size=app.config['MAX_QUEUED_JOBS'],
+    model_concurrency=app.config['MODEL_CONCURRENCY'],
+    on_finish=record_job_finished,
+    store=job_store,
+)
+
+# Fetches YouTube audio ahead of the transcription workers; shorter videos
+# are handed over while still downloading, long ones once complete so they
+# can be split across processes
+youtube_fetcher = YouTubeFetcher(
+    workers=app.config['YOUTUBE_DOWNLOAD_WORKERS'],
+    ready_seconds=app.config['YOUTUBE_READY_SECONDS'],
+    progressive_max_seconds=app.config['PARALLEL_MIN_SECONDS'] if app.config['PARALLEL_TRANSCRIPTION'] else None,
+    on_ready=lambda fetch: job_queue.wake(),
+)
+
+# Batches of files, directories and playlists scheduled onto the job queue
+batch_runner = BatchRunner(job_queue, app.config['BATCH_MANIFEST_FOLDER'],
+                           max_queued_jobs=app.config['BATCH_MAX_QUEUED_JOBS'])
+
+def prepare_for_fork():
+    """Get a pre-forking server's master process ready to fork its workers.
+
+    Loads ``PRELOAD_MODELS`` so every worker shares their weights
+    copy-on-write instead of loading its own copy, lets the startup catalog
+    and search index sync and orphan sweep finish so no lock is held across
+    the fork, and moves
+    everything loaded so far out of the garbage collector's reach so
+    collections in the workers don't write to (and so copy) those pages.
+    """
+    model_registry.warm_up(app.config['PRELOAD_MODELS'])
+    transcript_index_sync.join()
+    gc.collect()
+    gc.freeze()
+
+@app.before_request
+def start_background_threads():
+    """Start disk maintenance and metrics publishing in the serving process, never in a pre-forking master."""
+    maintenance.start()
+    metrics.start_publishing()
 
 def load_whisper_model(model_size="base"):
     """Load the Whisper model."""
-    global whisper_model
-    if whisper_model is None:
-        logger.info(f"Loading Whisper model: {model_size}")
-        try:
-            whisper_model = whisper.load_model(model_size)
-            logger.info("Whisper model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading Whisper model: {e}")
-            raise
-    return whisper_model
+    return model_registry.get(model_size)
+
+def inference_model(model_size):
+    """Load the Whisper model, wrapped to share encoder passes when batching is on.
+
+    Either way the wrapper serializes decoding, which can't run on one model
+    instance from several threads at once.
+    """
+    model = load_whisper_model(model_size)
+    if app.config['INFERENCE_BATCHING']:
+        inference_engine.retain(model_registry.loaded_sizes())
+        return inference_engine.wrap(model_size, model)
+    return SerializedModel(model)
+
+def parallel_processes(model_size):
+    """Chunk worker processes to use for ``model_size``: PARALLEL_PROCESSES, as far as
+    their copies of the model fit in what MODEL_MEMORY_BUDGET_MB leaves after pinned models."""
+    budget_mb = model_registry.unpinned_budget_mb(excluding_charge='chunk_pool')
+    fitting = int(budget_mb // estimated_model_mb(model_size))
+    return min(app.config['PARALLEL_PROCESSES'] or os.cpu_count() or 1, fitting)
+
+def charge_chunk_pool(model_size):
+    """Charge callback for the chunk pool of ``model_size``: each process holds its own model."""
+    model_mb = estimated_model_mb(model_size)
+    return lambda processes: model_registry.charge('chunk_pool', processes * model_mb)
 
 def allowed_file(filename):
     """Check if the uploaded file has an allowed extension."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def download_youtube_audio(url, output_path):
-    """Download audio from YouTube video."""
-    try:
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-            'extractaudio': True,
-            'audioformat': 'mp3',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            # Add user agent and other headers to avoid 403 errors
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            },
-            # Additional options to handle restrictions
-            'extractor_retries': 3,
-            'fragment_retries': 3,
-            'skip_unavailable_fragments': True,
-            'ignore_errors': False,
-            'no_warnings': False,
-            # Use cookies if available
-            'cookiefile': None,
-            # Throttle requests to avoid rate limiting
-            'sleep_interval': 1,
-            'max_sleep_interval': 5,
-            # Try different extraction methods
-            'youtube_include_dash_manifest': False,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            try:
-                # First try to get info without downloading
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'Unknown')
-                
-                # Then download
-                ydl.download([url])
-                
-                # Find the downloaded file
-                for file in os.listdir(output_path):
-                    if file.endswith('.mp3'):
-                        return os.path.join(output_path, file), title
-                        
-            except yt_dlp.utils.DownloadError as e:
-                if "403" in str(e) or "Forbidden" in str(e):
-                    raise Exception("YouTube access forbidden. This video may be restricted or require sign-in. Try a different video or check if the URL is correct.")
-                elif "unavailable" in str(e).lower():
-                    raise Exception("This YouTube video is unavailable or private. Please try a different video.")
-                elif "ffmpeg" in str(e).lower() or "ffprobe" in str(e).lower():
-                    raise Exception("FFmpeg is required for YouTube downloads but not found. Please restart your terminal/browser and try again, or install FFmpeg manually.")
-                else:
-                    raise Exception(f"YouTube download failed: {str(e)}")
-                    
-        return None, None
-    except Exception as e:
-        logger.error(f"Error downloading YouTube video: {e}")
-        raise
+def youtube_video_id(url):
+    """Extract the video ID from a YouTube URL without touching the network."""
+    match = re.search(r'(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})', url)
+    return match.group(1) if match else None
+
+def expand_youtube_url(url):
+    """Return the video URLs of a playlist URL, or ``[url]`` for a single video."""
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({'extract_flat': 'in_playlist', 'quiet': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if info.get('_type') != 'playlist':
+        return [url]
+    urls = []
+    for entry in info.get('entries') or []:
+        if entry:
+            urls.append(entry.get('url') or f"https://www.youtube.com/watch?v={entry['id']}")
+    return urls
+
+def decode_audio(audio_path, progress=None, cancel_token=None, cache_key=None, timer=None):
+    """Decode an audio file to 16 kHz mono float32 PCM.
+
+    With a ``cache_key`` the decoded audio is looked up in and added to the
+    PCM cache, so decoding the same source again is skipped. Time spent is
+    added to ``timer``'s ``decode`` stage.
+    """
+    with (timer or StageTimer()).stage('decode'):
+        return _decode_audio(audio_path, progress, cancel_token, cache_key)
+
+def _decode_audio(audio_path, progress, cancel_token, cache_key):
+    if cache_key is not None:
+        cached = pcm_cache.get(cache_key)
+        if cached is not None:
+            if progress is not None:
+                progress('progress', stage='decode', status='cached')
+            return cached[0]
+    if progress is not None:
+        progress('progress', stage='decode', status='started')
+    audio = decode_file(audio_path, cancel_token=cancel_token)
+    if cache_key is not None:
+        audio = pcm_cache.put(cache_key, audio)
+    return audio
+
+def transcribe_audio(audio_path, model_size="base", progress=None, cancel_token=None, vad=False, timer=None,
+                     word_timestamps=False):
+    """Transcribe an audio file path or decoded PCM array using Whisper, with cancellation support.
+
+    ``audio_path`` may also be an AudioBuffer that is still being filled,
+    which is transcribed window by window as the audio arrives.
+    ``progress(event, **data)`` receives a ``segment`` event for every
+    segment as it is produced and ``progress`` events with the share of
+    audio processed so far. ``cancel_token`` is checked between decode
+    windows and kills the ffmpeg decode if triggered.
+
+    With ``vad`` only the detected speech is transcribed; timestamps still
+    refer to the original recording and the result's ``vad`` entry reports
+    how much audio was skipped. ``timer`` receives the ``decode``, ``vad``,
+    ``model_load`` and ``inference`` stage times. ``word_timestamps`` adds a
+    ``words`` list with per-word timings to every segment.
+    """
+    timeline = None
+    timer = timer or StageTimer()
+    options = {'word_timestamps': True} if word_timestamps else {}
+
+    def on_segment(segment):
+        if progress is not None:
+            if timeline is not None:
+                segment = timeline.remap_segment(segment)
+            progress('segment', id=segment['id'], start=segment['start'], end=segment['end'], text=segment['text'])
+
+    def on_progress(done_seconds, total_seconds):
+        if progress is not None:
+            progress('progress', stage='transcribe', processed_seconds=round(done_seconds, 2),
+                     total_seconds=round(total_seconds, 2) if total_seconds else None,
+                     percent=min(100.0, round(100 * done_seconds / total_seconds, 1)) if total_seconds else None)
 
-def transcribe_audio(audio_path, model_size="base"):
-    """Transcribe audio file using Whisper, with cancellation support."""
     try:
-        model = load_whisper_model(model_size)
-        logger.info(f"Starting transcription of: {audio_path}")
+        logger.info(f"Starting transcription of: {audio_path if isinstance(audio_path, str) else 'decoded audio'}")
         # Check for cancellation before starting
-        if cancel_event.is_set():
-            raise Exception("Transcription cancelled by user.")
-        result = model.transcribe(audio_path)
-        # Check for cancellation after transcription (if possible)
-        if cancel_event.is_set():
-            raise Exception("Transcription cancelled by user.")
+        if cancel_token is not None:
+            cancel_token.check()
+        # Decode once; Whisper accepts the 16 kHz PCM array directly
+        audio = decode_audio(audio_path, progress, cancel_token, timer=timer) if isinstance(audio_path, str) else audio_path
+        if vad and isinstance(audio, AudioBuffer):
+            # Speech detection looks at the whole recording
+            audio = audio.to_array()
+        streaming = isinstance(audio, AudioBuffer)
+        if streaming:
+            duration = audio.expected_seconds
+        else:
+            duration = len(audio) / SAMPLE_RATE
+            if progress is not None:
+                progress('progress', stage='decode', status='finished', duration=round(duration, 2))
+        if vad:
+            with timer.stage('vad'):
+                audio, timeline = compact_speech(audio, min_silence_seconds=app.config['VAD_MIN_SILENCE_SECONDS'])
+            report = timeline.report()
+            logger.info(f"Voice activity detection skipped {report['skipped_seconds']}s of {report['total_seconds']}s")
+            if progress is not None:
+                progress('progress', stage='vad', **report)
+            if len(audio) == 0:
+                # Nothing above the silence floor; there is no speech to detect a language from
+                return {'text': '', 'segments': [], 'language': None, 'vad': report}
+            duration = len(audio) / SAMPLE_RATE
+        processes = parallel_processes(model_size)
+        if (not streaming and app.config['PARALLEL_TRANSCRIPTION']
+                and duration >= app.config['PARALLEL_MIN_SECONDS'] and processes > 1):
+            logger.info(f"Using chunked parallel transcription for {duration:.0f}s of audio")
+            with timer.stage('inference'):
+                result = transcribe_parallel(
+                    audio,
+                    model_size,
+                    processes=processes,
+                    chunk_seconds=app.config['PARALLEL_CHUNK_SECONDS'],
+                    cancel_token=cancel_token,
+                    on_segment=on_segment,
+                    on_progress=on_progress,
+                    pool_charge=charge_chunk_pool(model_size),
+                    **options,
+                )
+        else:
+            with timer.stage('model_load'):
+                model = inference_model(model_size)
+            with timer.stage('inference'):
+                result = transcribe_sequential(
+                    model,
+                    audio,
+                    window_seconds=app.config['STREAM_WINDOW_SECONDS'],
+                    cancel_token=cancel_token,
+                    on_segment=on_segment,
+                    on_progress=on_progress,
+                    **options,
+                )
+        # Streamed audio is only fully known once it has all been transcribed
+        transcribed_seconds = audio.seconds if streaming else duration
+        audio_seconds_total.inc(transcribed_seconds, model_size=model_size)
+        if transcribed_seconds:
+            real_time_factor.observe(timer.seconds['inference'] / transcribed_seconds, model_size=model_size)
+            model_policy.observe_real_time_factor(model_size, timer.seconds['inference'] / transcribed_seconds)
+        if timeline is not None:
+            return {
+                'text': result['text'],
+                'segments': [timeline.remap_segment(segment) for segment in result['segments']],
+                'language': result['language'],
+                'vad': timeline.report(),
+            }
         return {
             'text': result['text'],
             'segments': result['segments'],
             'language': result['language']
         }
+    except TranscriptionCancelled:
+        logger.info("Transcription cancelled")
+        raise
     except Exception as e:
         logger.error(f"Error during transcription: {e}")
         raise
-    finally:
-        cancel_event.clear()
 
-def save_transcript(transcript_data, filename_base):
-    """Save transcript to file."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    transcript_filename = f"{filename_base}_{timestamp}.json"
-    transcript_path = os.path.join(app.config['TRANSCRIPTS_FOLDER'], transcript_filename)
+def transcript_options(vad=False, word_timestamps=False):
+    """Options that change the transcript produced, as used in its cache key."""
+    options = {}
+    if vad:
+        options['vad'] = True
+    if word_timestamps:
+        options['words'] = True
+    return options or None
+
+def transcribe_cached(audio, model_size="base", content_id=None, extra=None, progress=None,
+                      cancel_token=None, vad=False, timer=None, word_timestamps=False):
+    """Transcribe decoded audio, reusing a cached result for identical content.
+
+    ``content_id`` defaults to a hash of the PCM samples. ``extra`` is stored
+    alongside a fresh result (e.g. the video title). Returns
+    ``(transcript, cache_hit)``.
+    """
+    audio_hash = content_id or transcript_cache.hash_audio(audio)
+    key = transcript_cache.make_key(audio_hash, model_size, transcript_options(vad, word_timestamps))
+    cached = transcript_cache_store.get(key)
+    if cached is not None:
+        logger.info(f"Transcript cache hit for {content_id or 'audio content'} ({model_size})")
+        cached['audio_hash'] = audio_hash
+        return cached, True
+    transcript = transcribe_audio(audio, model_size, progress=progress, cancel_token=cancel_token, vad=vad,
+                                  timer=timer, word_timestamps=word_timestamps)
+    # Identifies the audio in the catalog, e.g. to find other transcripts of it
+    transcript['audio_hash'] = audio_hash
+    transcript_cache_store.put(key, dict(transcript, **(extra or {})))
+    return transcript, False
+
+def save_transcript(transcript_data, filename_base, transcript_path=None):
+    """Save transcript to file in the compact transcript format.
+
+    ``transcript_path`` replaces an existing transcript, e.g. a draft,
+    keeping its file name.
+    """
+    if transcript_path is None:
+        # The random suffix keeps transcripts of the same title saved within a second apart
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        transcript_filename = f"{filename_base}_{timestamp}_{uuid.uuid4().hex[:8]}{TRANSCRIPT_EXTENSION}"
+        transcript_path = os.path.join(app.config['TRANSCRIPTS_FOLDER'], transcript_filename)
+    transcript_filename = os.path.basename(transcript_path)
     
-    with open(transcript_path, 'w', encoding='utf-8') as f:
-        json.dump(transcript_data, f, ensure_ascii=False, indent=2)
+    write_transcript(transcript_path, transcript_data)
+    try:
+        transcript_catalog.add(transcript_path, transcript_data)
+    except Exception as e:
+        # The transcript is saved; a later sync will catalog it
+        logger.error(f"Error cataloging transcript {transcript_filename}: {e}")
+    try:
+        search_index.add(transcript_path, transcript_data)
+    except Exception as e:
+        # The transcript is saved; a later sync will index it
+        logger.error(f"Error indexing transcript {transcript_filename}: {e}")
     
     return transcript_path
 
@@ -157,162 +533,975 @@ def index():
     """Main page."""
     return render_template('index.html')
 
+def resolve_model_size(model_size, duration=None, precision=None):
+    """The model key to run for a requested size and precision, applying the policy to "auto"."""
+    if model_size == AUTO_MODEL:
+        queue = job_queue.stats()
+        models = model_registry.stats()
+        model_size, _ = model_policy.choose(
+            duration, queue['queued'], queue['running'], job_queue.workers,
+            loaded_sizes=models['loaded'], load_seconds=models['load_seconds'], precision=precision)
+    return model_key(model_size, precision)
+
+def plan_models(model_size, duration=None, refine=False, precision=None):
+    """Return ``(model_size, refine_size)`` model keys for a request.
+
+    With ``refine`` a fast DRAFT_MODEL pass runs first and its transcript is
+    replaced later by the requested size (AUTO_REFINE_MODEL for "auto");
+    ``refine_size`` is None when there is nothing to refine. Both passes
+    use ``precision``.
+    """
+    if not refine:
+        return resolve_model_size(model_size, duration, precision), None
+    refine_size = app.config['AUTO_REFINE_MODEL'] if model_size == AUTO_MODEL else model_size
+    if refine_size == app.config['DRAFT_MODEL']:
+        return model_key(refine_size, precision), None
+    return model_key(app.config['DRAFT_MODEL'], precision), model_key(refine_size, precision)
+
+def submit_refinement(func, refine_size, kind):
+    """Queue the pass that replaces a draft transcript; returns fields for the draft's result."""
+    try:
+        job = job_queue.submit(func, refine_size, kind=kind)
+    except QueueFullError as e:
+        logger.warning(f"Keeping draft transcript, refinement not queued: {e}")
+        return {'refine_error': str(e)}
+    return {'refine_job_id': job.id, 'refine_model_size': refine_size}
+
+def youtube_cache_key(video_id, model_size, vad=False, word_timestamps=False):
+    return transcript_cache.make_key(f"youtube:{video_id}", model_size, transcript_options(vad, word_timestamps))
+
+def flag_requested(value, default):
+    """Interpret a boolean request field, falling back to ``default`` when absent."""
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def vad_requested(value):
+    """Interpret a request's ``vad`` field, falling back to VAD_ENABLED."""
+    return flag_requested(value, app.config['VAD_ENABLED'])
+
+def word_timestamps_requested(value):
+    """Interpret a request's ``word_timestamps`` field, falling back to WORD_TIMESTAMPS_ENABLED."""
+    return flag_requested(value, app.config['WORD_TIMESTAMPS_ENABLED'])
+
+def precision_requested(value):
+    """A request's ``precision`` field, falling back to INFERENCE_PRECISION; None if unsupported."""
+    precision = value or app.config['INFERENCE_PRECISION']
+    return precision if precision in PRECISIONS else None
+
+def unsupported_precision():
+    return jsonify({'error': f"Unsupported precision; expected one of: {', '.join(PRECISIONS)}"}), 400
+
+def run_youtube_job(job, youtube_url, model_size, fetch=None, vad=False, word_timestamps=False,
+                    refine_size=None, transcript_path=None):
+    """Transcribe a YouTube video inside a worker.
+
+    ``fetch`` is the download already started for this job; without one the
+    download is started here and the worker waits for it. With
+    ``refine_size`` the saved transcript is a draft, and a job re-running the
+    video with that model is queued to replace it at ``transcript_path``.
+    """
+    video_id = youtube_video_id(youtube_url)
+    transcript = None
+    cache_hit = False
+    timer = StageTimer()
+
+    if video_id:
+        # Repeat submissions of the same video skip the download too
+        transcript = transcript_cache_store.get(youtube_cache_key(video_id, model_size, vad, word_timestamps))
+        cache_hit = transcript is not None
+
+    if transcript is not None:
+        if fetch is not None:
+            fetch.abort()
+        video_title = transcript.pop('title', None)
+    else:
+        decoded = pcm_cache.get(f"youtube:{video_id}") if video_id else None
+        if decoded is not None:
+            # Audio decoded for an earlier run, e.g. with another model size
+            if fetch is not None:
+                fetch.abort()
+                fetch = None
+            audio, metadata = decoded
+            video_title = metadata.get('title')
+        else:
+            if fetch is None:
+                fetch = youtube_fetcher.fetch(youtube_url, progress=job.emit, cancel_token=job.cancel_token)
+            fetch.ready.wait()
+            if fetch.error is not None:
+                raise fetch.error
+            video_title = fetch.title
+
+            # Short videos are transcribed while the rest is still downloading;
+            # without a video ID the cache needs the complete audio to hash
+            video_id = video_id or fetch.video_id
+            audio = fetch.buffer if fetch.progressive and video_id and not vad else fetch.buffer.to_array()
+
+        transcript, cache_hit = transcribe_cached(
+            audio, model_size, f"youtube:{video_id}" if video_id else None,
+            extra={'title': video_title}, progress=job.emit, cancel_token=job.cancel_token, vad=vad,
+            timer=timer, word_timestamps=word_timestamps
+        )
+        if fetch is not None:
+            if cache_hit:
+                fetch.abort()
+            elif video_id:
+                if isinstance(audio, AudioBuffer):
+                    audio = audio.to_array()
+                pcm_cache.put(f"youtube:{video_id}", audio, {'title': video_title})
+            if fetch.download_seconds is not None:
+                # Overlaps inference when the video was transcribed while downloading
+                timer.add('download', fetch.download_seconds)
+        transcript.pop('title', None)
+
+    # Add metadata
+    transcript['source'] = 'youtube'
+    transcript['url'] = youtube_url
+    transcript['title'] = video_title
+    transcript['model_size'] = model_size
+    transcript['draft'] = bool(refine_size)
+    transcript['timestamp'] = datetime.now().isoformat()
+    transcript['timings'] = timer.to_dict()
+
+    # Save transcript
+    safe_title = secure_filename(video_title or 'youtube_video')
+    with timer.stage('save'):
+        transcript_path = save_transcript(transcript, safe_title, transcript_path)
+    record_stage_timings(timer)
+
+    result = {
+        'success': True,
+        'transcript': transcript['text'],
+        'language': transcript['language'],
+        'title': video_title,
+        'model_size': model_size,
+        'draft': bool(refine_size),
+        'transcript_file': os.path.basename(transcript_path),
+        'cache_hit': cache_hit,
+        'timings': timer.to_dict()
+    }
+    if refine_size:
+        result.update(submit_refinement(
+            lambda refine_job: run_youtube_job(refine_job, youtube_url, refine_size, vad=vad,
+                                               word_timestamps=word_timestamps, transcript_path=transcript_path),
+            refine_size, 'youtube'))
+    return result
+
+def submit_youtube_job(youtube_url, model_size, vad=False, word_timestamps=False, refine_size=None):
+    """Queue a YouTube job, starting its download straight away.
+
+    The job waits in the queue without holding a worker until enough audio
+    has arrived. Raises QueueFullError like ``job_queue.submit``.
+    """
+    video_id = youtube_video_id(youtube_url)
+    if video_id and (youtube_cache_key(video_id, model_size, vad, word_timestamps) in transcript_cache_store
+                     or f"youtube:{video_id}" in pcm_cache):
+        return job_queue.submit(
+            lambda job: run_youtube_job(job, youtube_url, model_size, vad=vad, word_timestamps=word_timestamps,
+                                        refine_size=refine_size),
+            model_size, kind='youtube'
+        )
+    fetch = Fetch(youtube_url)
+    job = job_queue.submit(
+        lambda job: run_youtube_job(job, youtube_url, model_size, fetch, vad, word_timestamps, refine_size),
+        model_size,
+        kind='youtube', ready=fetch.ready,
+    )
+    youtube_fetcher.start(fetch, progress=job.emit, cancel_token=job.cancel_token)
+    return job
+
+def run_file_job(job, audio_source, filename, model_size, delete_after=True, cache_key=None, vad=False,
+                 timer=None, word_timestamps=False, refine_size=None, transcript_path=None):
+    """Transcribe an uploaded file inside a worker.
+
+    ``audio_source`` is the PCM decoded while the upload streamed in, or the
+    path of a spooled upload that still needs decoding. Set ``delete_after``
+    to False for files that are not ours to remove (batch inputs).
+    ``cache_key`` identifies the file's decoded audio in the PCM cache, and
+    in the transcript cache so the samples need not be hashed. ``timer``
+    may already hold the upload time. With ``refine_size`` the saved
+    transcript is a draft, and a job re-running the decoded audio with that
+    model is queued to replace it at ``transcript_path``.
+    """
+    file_path = audio_source if isinstance(audio_source, str) else None
+    timer = timer or StageTimer()
+    try:
+        if file_path and not delete_after:
+            bytes_processed_total.inc(os.path.getsize(file_path), source='file')
+        audio = decode_audio(file_path, job.emit, job.cancel_token, cache_key, timer) if file_path else audio_source
+
+        # Transcribe the audio
+        transcript, cache_hit = transcribe_cached(
+            audio, model_size, content_id=cache_key, progress=job.emit, cancel_token=job.cancel_token, vad=vad,
+            timer=timer, word_timestamps=word_timestamps
+        )
+
+        # Add metadata
+        transcript['source'] = 'file'
+        transcript['filename'] = filename
+        transcript['model_size'] = model_size
+        transcript['draft'] = bool(refine_size)
+        transcript['timestamp'] = datetime.now().isoformat()
+        transcript['timings'] = timer.to_dict()
+
+        # Save transcript
+        filename_base = os.path.splitext(filename)[0]
+        with timer.stage('save'):
+            transcript_path = save_transcript(transcript, filename_base, transcript_path)
+        record_stage_timings(timer)
+
+        result = {
+            'success': True,
+            'transcript': transcript['text'],
+            'language': transcript['language'],
+            'filename': filename,
+            'model_size': model_size,
+            'draft': bool(refine_size),
+            'transcript_file': os.path.basename(transcript_path),
+            'cache_hit': cache_hit,
+            'timings': timer.to_dict()
+        }
+        if refine_size:
+            # The decoded audio is reused, so the refinement needs no upload or decode
+            result.update(submit_refinement(
+                lambda refine_job: run_file_job(refine_job, audio, filename, model_size=refine_size,
+                                                cache_key=cache_key, vad=vad, word_timestamps=word_timestamps,
+                                                transcript_path=transcript_path),
+                refine_size, 'file'))
+        return result
+
+    finally:
+        # Clean up spooled upload
+        if delete_after and file_path:
+            remove_upload(file_path)
+
+def hold_upload(path):
+    """Keep maintenance from expiring a stored upload until ``remove_upload()``; returns ``path``."""
+    maintenance.active_uploads.add(path)
+    return path
+
+def remove_upload(path):
+    """Delete a stored upload once its job is done with it."""
+    maintenance.active_uploads.discard(path)
+    if os.path.exists(path):
+        os.remove(path)
+
+def discard_upload(path):
+    """Return an ``on_cancel`` callback removing a spooled upload whose job was cancelled before it ran."""
+    def discard(job):
+        remove_upload(path)
+    return discard
+
+def job_accepted(job):
+    """Build the 202 response returned when a job is queued."""
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f"/jobs/{job.id}",
+        'model_size': job.model_size,
+        'queue_depth': job_queue.depth()
+    }), 202
+
+def queue_full(error):
+    """Build the 429 response returned when the queue is saturated."""
+    response = jsonify({'error': str(error), 'queue_depth': error.depth})
+    response.headers['Retry-After'] = '30'
+    return response, 429
+
+def insufficient_storage(error):
+    """Build the 507 response returned when the disk is too full to accept new work."""
+    response = jsonify({'error': str(error), 'free_bytes': error.free_bytes})
+    response.headers['Retry-After'] = str(app.config['MAINTENANCE_INTERVAL_SECONDS'])
+    return response, 507
+
 @app.route('/transcribe_youtube', methods=['POST'])
 def transcribe_youtube():
-    """Transcribe audio from YouTube video."""
+    """Queue transcription of a YouTube video."""
     try:
         data = request.get_json()
         youtube_url = data.get('url')
         model_size = data.get('model_size', 'base')
+        precision = precision_requested(data.get('precision'))
+        vad = vad_requested(data.get('vad'))
+        word_timestamps = word_timestamps_requested(data.get('word_timestamps'))
+        refine = flag_requested(data.get('refine'), False)
         
         if not youtube_url:
             return jsonify({'error': 'YouTube URL is required'}), 400
-        
-        # Create temporary directory for download
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Download audio from YouTube
-            audio_path, video_title = download_youtube_audio(youtube_url, temp_dir)
-            
-            if not audio_path:
-                return jsonify({'error': 'Failed to download audio from YouTube'}), 400
-            
-            # Transcribe the audio
-            transcript = transcribe_audio(audio_path, model_size)
-            
-            # Add metadata
-            transcript['source'] = 'youtube'
-            transcript['url'] = youtube_url
-            transcript['title'] = video_title
-            transcript['timestamp'] = datetime.now().isoformat()
-            
-            # Save transcript
-            safe_title = secure_filename(video_title or 'youtube_video')
-            transcript_path = save_transcript(transcript, safe_title)
-            
-            return jsonify({
-                'success': True,
-                'transcript': transcript['text'],
-                'language': transcript['language'],
-                'title': video_title,
-                'transcript_file': os.path.basename(transcript_path)
-            })
-            
+        if precision is None:
+            return unsupported_precision()
+
+        maintenance.check()
+        model_size, refine_size = plan_models(model_size, refine=refine, precision=precision)
+        job = submit_youtube_job(youtube_url, model_size, vad, word_timestamps, refine_size)
+        return job_accepted(job)
+
+    except QueueFullError as e:
+        return queue_full(e)
+    except InsufficientStorageError as e:
+        return insufficient_storage(e)
     except Exception as e:
         logger.error(f"Error in YouTube transcription: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/transcribe_file', methods=['POST'])
 def transcribe_file():
-    """Transcribe uploaded audio file."""
+    """Queue transcription of an uploaded audio file."""
+    reservation = None
     try:
+        if job_queue.depth() >= job_queue.max_queue_size:
+            # Reject before the upload body is read
+            raise QueueFullError(job_queue.depth())
+        # Likewise when the disk can't take it; the space is held until the body is stored
+        reservation = maintenance.reserve(request.content_length or app.config['MAX_CONTENT_LENGTH'])
+
+        # Parsing the form reads (and decodes) the upload body
+        timer = StageTimer()
+        upload_started = time.perf_counter()
         if 'file' not in request.files:
             return jsonify({'error': 'No file uploaded'}), 400
         
         file = request.files['file']
         model_size = request.form.get('model_size', 'base')
+        precision = precision_requested(request.form.get('precision'))
+        vad = vad_requested(request.form.get('vad'))
+        word_timestamps = word_timestamps_requested(request.form.get('word_timestamps'))
+        refine = flag_requested(request.form.get('refine'), False)
         
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not supported'}), 400
-        
-        # Save uploaded file
+
+        if precision is None:
+            return unsupported_precision()
+
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
+        cache_key = None
+        if isinstance(file.stream, UploadSink):
+            # Decoded PCM, or a unique spool path for formats that can't be piped
+            audio_source = file.stream.finish()
+            cache_key = file.stream.content_id
+            bytes_processed_total.inc(file.stream.bytes_in, source='upload')
+            if isinstance(audio_source, str):
+                hold_upload(audio_source)
+            else:
+                # Held by the job while it waits in the queue (and by a refinement after it);
+                # long recordings come back memory-mapped from the PCM cache's files
+                audio_source = pcm_cache.put(cache_key, audio_source)
+        else:
+            # Save uploaded file under a unique name so concurrent uploads don't collide
+            audio_source = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
+            file.save(audio_source)
+            hold_upload(audio_source)
+            bytes_processed_total.inc(os.path.getsize(audio_source), source='upload')
+        timer.add('upload', time.perf_counter() - upload_started)
+
         try:
-            # Transcribe the audio
-            transcript = transcribe_audio(file_path, model_size)
-            
-            # Add metadata
-            transcript['source'] = 'file'
-            transcript['filename'] = filename
-            transcript['timestamp'] = datetime.now().isoformat()
-            
-            # Save transcript
-            filename_base = os.path.splitext(filename)[0]
-            transcript_path = save_transcript(transcript, filename_base)
-            
-            return jsonify({
-                'success': True,
-                'transcript': transcript['text'],
-                'language': transcript['language'],
-                'filename': filename,
-                'transcript_file': os.path.basename(transcript_path)
-            })
-            
-        finally:
-            # Clean up uploaded file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
+            duration = None if isinstance(audio_source, str) else len(audio_source) / SAMPLE_RATE
+            model_size, refine_size = plan_models(model_size, duration, refine, precision)
+            job = job_queue.submit(
+                lambda job: run_file_job(job, audio_source, filename, model_size, cache_key=cache_key, vad=vad,
+                                         timer=timer, word_timestamps=word_timestamps, refine_size=refine_size),
+                model_size,
+                kind='file',
+                on_cancel=discard_upload(audio_source) if isinstance(audio_source, str) else None,
+            )
+        except Exception:
+            if isinstance(audio_source, str):
+                remove_upload(audio_source)
+            raise
+        return job_accepted(job)
+
+    except QueueFullError as e:
+        return queue_full(e)
+    except InsufficientStorageError as e:
+        return insufficient_storage(e)
     except Exception as e:
         logger.error(f"Error in file transcription: {e}")
         return jsonify({'error': str(e)}), 500
+    finally:
+        if reservation is not None:
+            reservation.release()
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the status, and result once finished, of a transcription job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    data = job.to_dict()
+    data['queue_depth'] = job_queue.depth()
+    return jsonify(data)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's progress as Server-Sent Events until it finishes."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    # Resume after the last event a reconnecting client saw
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    def stream():
+        index = start
+        while True:
+            events, done = job.events_since(index, timeout=15)
+            for event in events:
+                yield f"id: {index}\nevent: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+                index += 1
+            if done:
+                return
+            if not events:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def batch_items(paths, urls, model_size, uploaded=False):
+    """Yield ``(source, kind, func, on_cancel)`` batch items for files, directories and URLs.
+
+    Directories are walked for supported audio files and playlist URLs are
+    expanded lazily, as the batch is being scheduled. ``uploaded`` marks
+    ``paths`` as spooled uploads to delete once transcribed.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    if allowed_file(name):
+                        yield batch_file_item(os.path.join(root, name), name, model_size, uploaded)
+        else:
+            yield batch_file_item(path, os.path.basename(path), model_size, uploaded)
+    for url in urls:
+        for video_url in expand_youtube_url(url):
+            yield video_url, 'youtube', lambda job, video_url=video_url: run_youtube_job(
+                job, video_url, model_size, vad=app.config['VAD_ENABLED'],
+                word_timestamps=app.config['WORD_TIMESTAMPS_ENABLED']), None
+
+def batch_file_item(path, name, model_size, uploaded):
+    filename = secure_filename(name)
+    # Server-side inputs keep their decoded audio for re-runs with other models
+    cache_key = None if uploaded else file_key(path)
+    on_cancel = discard_upload(path) if uploaded else None
+    return path, 'file', lambda job: run_file_job(job, path, filename, model_size, delete_after=uploaded,
+                                                  cache_key=cache_key, vad=app.config['VAD_ENABLED'],
+                                                  word_timestamps=app.config['WORD_TIMESTAMPS_ENABLED']), on_cancel
+
+@app.route('/batch', methods=['POST'])
+def create_batch():
+    """Queue a batch of uploaded files, a server-side directory and/or YouTube URLs or playlists."""
+    reservation = None
+    paths = []
+    batch = None
+    try:
+        # Uploaded files are stored before being queued; hold the space for them
+        reservation = maintenance.reserve(0 if request.is_json else
+                                          request.content_length or app.config['MAX_CONTENT_LENGTH'])
+        if request.is_json:
+            data = request.get_json()
+            if not isinstance(data, dict):
+                return jsonify({'error': 'Expected a JSON object'}), 400
+            urls = data.get('urls', [])
+            directory = data.get('directory')
+            model_size = data.get('model_size', 'base')
+            precision = precision_requested(data.get('precision'))
+        else:
+            urls = request.form.getlist('urls')
+            directory = request.form.get('directory')
+            model_size = request.form.get('model_size', 'base')
+            precision = precision_requested(request.form.get('precision'))
+        if precision is None:
+            return unsupported_precision()
+        # A bare string would otherwise be walked one character at a time
+        if not isinstance(urls, list) or not all(isinstance(url, str) and url.strip() for url in urls):
+            return jsonify({'error': 'urls must be a list of non-empty strings'}), 400
+
+        uploads = request.files.getlist('files')
+        for file in uploads:
+            if not file.filename or not allowed_file(file.filename):
+                return jsonify({'error': f'File type not supported: {file.filename}'}), 400
+
+        if directory:
+            # Only directories under BATCH_INPUT_FOLDER may be read
+            root = os.path.realpath(app.config['BATCH_INPUT_FOLDER'])
+            directory_path = os.path.realpath(os.path.join(root, directory))
+            if os.path.commonpath([root, directory_path]) != root or not os.path.isdir(directory_path):
+                return jsonify({'error': 'Directory not found in batch input folder'}), 400
+
+        if not uploads and not urls and not directory:
+            return jsonify({'error': 'Provide files, urls or a directory'}), 400
+
+        for file in uploads:
+            path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+            file.save(path)
+            # Held until the item's job removes it, however long the batch takes to reach it
+            paths.append(hold_upload(path))
+            bytes_processed_total.inc(os.path.getsize(path), source='upload')
+
+        def items():
+            yield from batch_items(paths, [], model_size, uploaded=True)
+            yield from batch_items([directory_path] if directory else [], urls, model_size)
+
+        # Batches are throughput work; "auto" is decided once for the whole batch
+        model_size = resolve_model_size(model_size, precision=precision)
+        batch = batch_runner.start(items(), model_size)
+        return jsonify({
+            'success': True,
+            'batch_id': batch.id,
+            'status_url': f"/batch/{batch.id}"
+        }), 202
+
+    except InsufficientStorageError as e:
+        return insufficient_storage(e)
+    except Exception as e:
+        logger.error(f"Error creating batch: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if reservation is not None:
+            reservation.release()
+        if batch is None:
+            # The batch never started, so no job will remove the uploads it stored
+            for path in paths:
+                remove_upload(path)
+
+@app.route('/batch/<batch_id>')
+def batch_status(batch_id):
+    """Report a batch's manifest: per-item status, timing and transcript files."""
+    manifest = batch_runner.get(batch_id)
+    if manifest is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(manifest)
+
+def catalog_lookup(filename):
+    """Return ``(transcript_path, entry)`` for a saved transcript, or None.
+
+    Names are resolved through the catalog, so a request can only reach
+    files the service saved (or found in the transcripts folder) and a hit
+    needs no disk access. A file copied into the folder since the last sync
+    is cataloged on first request.
+    """
+    entry = transcript_catalog.get(filename)
+    if entry is None:
+        if secure_filename(filename) != filename or not filename.endswith(TRANSCRIPT_FILE_EXTENSIONS):
+            return None
+        transcript_path = os.path.join(app.config['TRANSCRIPTS_FOLDER'], filename)
+        if not os.path.isfile(transcript_path):
+            return None
+        entry = transcript_catalog.add(transcript_path)
+    return os.path.join(app.config['TRANSCRIPTS_FOLDER'], entry['filename']), entry
+
+def forget_transcript(filename):
+    """Drop a transcript that has gone from disk from the catalog, search index and export cache."""
+    transcript_catalog.remove(filename)
+    search_index.remove(filename)
+    export_cache.remove(filename)
+
+@app.route('/transcripts')
+def list_transcripts():
+    """List saved transcripts, newest first by default, a page at a time.
+
+    Filters: ``source``, ``language``, ``model_size``, ``audio_hash``,
+    ``url``, ``draft``, ``title`` (substring), ``since``/``until`` (ISO
+    dates) and ``min_duration``/``max_duration`` (seconds). ``sort`` is one
+    of created_at, title, duration or bytes and ``order`` asc or desc; pass
+    the returned ``next_cursor`` as ``cursor`` for the next page.
+    """
+    args = request.args
+    filters = {key: args[key] for key in ('source', 'language', 'model_size', 'audio_hash', 'url',
+                                           'title', 'since', 'until') if args.get(key)}
+    if args.get('draft'):
+        filters['draft'] = flag_requested(args['draft'], False)
+    try:
+        for key in ('min_duration', 'max_duration'):
+            if args.get(key):
+                filters[key] = float(args[key])
+        limit = min(200, max(1, int(args.get('limit', 50))))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer; min_duration and max_duration numbers'}), 400
+    try:
+        listing = transcript_catalog.list(
+            filters, sort=args.get('sort', 'created_at'), order=args.get('order', 'desc').lower(),
+            limit=limit, cursor=args.get('cursor'), count=flag_requested(args.get('count'), False))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    for entry in listing['transcripts']:
+        entry.pop('mtime_ns', None)
+        entry['draft'] = bool(entry['draft'])
+        entry['download_url'] = f"/download_transcript/{entry['filename']}"
+    return jsonify(listing)
 
 @app.route('/download_transcript/<filename>')
 def download_transcript(filename):
-    """Download saved transcript file as JSON, TXT, or DOCX."""
+    """Download saved transcript file as JSON, TXT, DOCX, SRT or VTT."""
+    found = None
     try:
-        transcript_path = os.path.join(app.config['TRANSCRIPTS_FOLDER'], filename)
-        if not os.path.exists(transcript_path):
+        found = catalog_lookup(filename)
+        if found is None:
             return jsonify({'error': 'Transcript file not found'}), 404
+        transcript_path, entry = found
+        # send_file resolves relative paths against the application package, not the working directory
+        transcript_path = os.path.abspath(transcript_path)
+        version = (entry['bytes'], entry['mtime_ns'])
 
         # Determine export format from query param
         export_format = request.args.get('format', 'json').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported format. Supported formats: {', '.join(EXPORT_FORMATS)}"}), 400
         base_name = os.path.splitext(filename)[0]
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        download_name = base_name + extension
 
-        # Load transcript data
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            transcript_data = json.load(f)
-
-        if export_format == 'txt':
-            txt_path = os.path.join(app.config['TRANSCRIPTS_FOLDER'], base_name + '.txt')
-            with open(txt_path, 'w', encoding='utf-8') as txt_file:
-                txt_file.write(transcript_data['text'])
-            return send_file(txt_path, as_attachment=True)
-
-        elif export_format == 'docx':
-            docx_path = os.path.join(app.config['TRANSCRIPTS_FOLDER'], base_name + '.docx')
-            doc = Document()
-            doc.add_heading('Transcript', 0)
-            doc.add_paragraph(transcript_data['text'])
-            doc.save(docx_path)
-            return send_file(docx_path, as_attachment=True)
-
-        else:  # Default: JSON
+        if export_format == 'json' and filename.endswith('.json'):
+            # Legacy transcripts already are the JSON export
             return send_file(transcript_path, as_attachment=True)
+
+        cached_path = export_cache.cached(transcript_path, export_format, version)
+        if cached_path:
+            try:
+                return send_file(os.path.abspath(cached_path), mimetype=mimetype, as_attachment=True,
+                                 download_name=download_name)
+            except FileNotFoundError:
+                # Pruned between the check and the send; render it again
+                pass
+
+        if not os.path.isfile(transcript_path):
+            # Rendering reads the file anyway; check before a streamed response has started
+            raise FileNotFoundError(transcript_path)
+
+        if export_format == 'docx':
+            rendered_path = export_cache.render_file(transcript_path, export_format, version)
+            return send_file(os.path.abspath(rendered_path), mimetype=mimetype, as_attachment=True,
+                             download_name=download_name)
+
+        # Text formats are streamed as they are generated and cached once complete
+        return Response(export_cache.stream(transcript_path, export_format, version), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+    except FileNotFoundError as e:
+        if found is not None and os.path.isfile(found[0]):
+            # Something other than the transcript went missing
+            return jsonify({'error': str(e)}), 500
+        # Deleted behind the service's back
+        forget_transcript(filename)
+        return jsonify({'error': 'Transcript file not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/health')
-def health_check():
-    """Health check endpoint."""
+@functools.lru_cache(maxsize=16)
+def load_word_index(transcript_path, mtime_ns):
+    """WordIndex of a transcript, kept for repeated seeks; ``mtime_ns`` invalidates it."""
+    return TranscriptReader(transcript_path).words()
+
+@app.route('/transcripts/<filename>/words')
+def transcript_words(filename):
+    """Map a time to a word, or a word index or character offset to a time.
+
+    Exactly one of ``time`` (seconds), ``char`` (offset into the transcript
+    text) or ``word`` (word index) selects the word; ``context`` adds up to
+    that many neighbouring words either side.
+    """
+    found = catalog_lookup(filename)
+    if found is None:
+        return jsonify({'error': 'Transcript file not found'}), 404
+    transcript_path, entry = found
+    try:
+        words = load_word_index(transcript_path, entry['mtime_ns'])
+    except FileNotFoundError:
+        forget_transcript(filename)
+        return jsonify({'error': 'Transcript file not found'}), 404
+    if words is None or len(words) == 0:
+        return jsonify({'error': 'Transcript has no word timestamps'}), 404
+
+    try:
+        context = min(max(int(request.args.get('context', 0)), 0), 100)
+        if 'time' in request.args:
+            index = words.at_time(float(request.args['time']))
+        elif 'char' in request.args:
+            index = words.at_char(int(request.args['char']))
+        elif 'word' in request.args:
+            index = int(request.args['word'])
+            if not 0 <= index < len(words):
+                return jsonify({'error': f"word must be between 0 and {len(words) - 1}"}), 400
+        else:
+            return jsonify({'error': 'One of time, char or word is required'}), 400
+    except ValueError:
+        return jsonify({'error': 'time must be a number; char, word and context integers'}), 400
+
+    word = words.word(index)
+    response = {'filename': filename, 'word_count': len(words), 'word': word}
+    if 'time' in request.args:
+        response['within'] = word['start'] <= float(request.args['time']) <= word['end']
+    if context:
+        response['context'] = [words.word(i) for i in range(max(0, index - context),
+                                                             min(len(words), index + context + 1))]
+    return jsonify(response)
+
+@app.route('/search')
+def search_transcripts():
+    """Search saved transcripts; quoted text is matched as a phrase."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search query (q) is required'}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(100, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
     try:
-        # Try to load the model to verify everything is working
-        load_whisper_model()
-        return jsonify({'status': 'healthy', 'whisper_loaded': True})
+        return jsonify(search_index.search(query, page=page, per_page=per_page))
     except Exception as e:
-        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+        logger.error(f"Error searching transcripts: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def send_live(ws, message):
+    """Send a JSON message to a live client; False once it has gone away."""
+    try:
+        ws.send(json.dumps(message))
+        return True
+    except ConnectionClosed:
+        return False
+
+def run_live_passes(ws, transcriber, model_size):
+    """Re-transcribe a live buffer as audio arrives, sending the update of each pass.
+
+    Each pass takes a running slot from the job queue, so live sessions
+    share the workers and MODEL_CONCURRENCY limits with queued jobs.
+    """
+    connected = True
+    try:
+        while transcriber.wait_for_audio():
+            with job_queue.slot(model_size):
+                update = transcriber.process()
+            if update is not None and connected:
+                connected = send_live(ws, update)
+    except Exception as e:
+        logger.error(f"Error in live transcription: {e}")
+        transcriber.error = str(e)
+
+def live_transcription(ws):
+    """Transcribe audio streamed over a WebSocket while it is being recorded.
+
+    Query parameters are ``model_size``, ``language``, ``name`` (the base
+    name of the saved transcript) and ``format``: ``pcm`` (the default) for
+    raw 16 kHz mono s16le, anything else, e.g. Opus in Ogg or WebM, is
+    decoded by ffmpeg. Binary messages carry the audio; a ``stop`` text
+    message, closing the socket or LIVE_IDLE_SECONDS without audio ends the
+    stream. The committed words are saved as a transcript when it ends.
+    """
+    if not live_session_slots.acquire(blocking=False):
+        send_live(ws, {'type': 'error', 'error': 'Too many live sessions, please try again later'})
+        return
+    model_size = request.args.get('model_size', 'base')
+    precision = precision_requested(request.args.get('precision'))
+    name = secure_filename(request.args.get('name', '')) or 'live'
+    transcriber = None
+    runner = None
+    decoder = None
+    error = None
+    pinned = None
+    try:
+        if precision is None:
+            raise ValueError(f"Unsupported precision; expected one of: {', '.join(PRECISIONS)}")
+        maintenance.check()
+        model_size = resolve_model_size(model_size, precision=precision)
+        # Kept resident (and within the memory budget) for the whole session
+        model_registry.pin(model_size)
+        pinned = model_size
+        transcriber = LiveTranscriber(
+            inference_model(model_size),
+            step_seconds=app.config['LIVE_STEP_SECONDS'],
+            buffer_seconds=app.config['LIVE_BUFFER_SECONDS'],
+            max_buffer_seconds=app.config['LIVE_MAX_BUFFER_SECONDS'],
+            language=request.args.get('language') or None,
+        )
+        if request.args.get('format', 'pcm') != 'pcm':
+            decoder = PCMStreamDecoder(on_pcm=transcriber.feed)
+        runner = threading.Thread(target=run_live_passes, args=(ws, transcriber, model_size), daemon=True)
+        runner.start()
+        send_live(ws, {'type': 'ready', 'model_size': model_size})
+
+        while runner.is_alive():
+            try:
+                message = ws.receive(timeout=app.config['LIVE_IDLE_SECONDS'])
+            except ConnectionClosed:
+                break
+            if message is None or (isinstance(message, str) and message.strip().lower() == 'stop'):
+                break
+            if isinstance(message, str):
+                continue
+            bytes_processed_total.inc(len(message), source='live')
+            if decoder is not None:
+                decoder.write(message)
+            else:
+                transcriber.feed(message)
+        if decoder is not None:
+            # Flushes the audio ffmpeg still holds into the buffer
+            decoder.finish()
+    except Exception as e:
+        logger.error(f"Error in live transcription: {e}")
+        error = str(e)
+    finally:
+        if decoder is not None:
+            decoder.abort()
+        if runner is not None:
+            transcriber.close()
+            runner.join()
+
+    try:
+        if transcriber is not None:
+            error = error or transcriber.error
+            if error is None:
+                with job_queue.slot(model_size):
+                    final = transcriber.finish()
+                if final is not None:
+                    send_live(ws, final)
+            audio_seconds_total.inc(transcriber.received_seconds, model_size=model_size)
+            transcript = transcriber.result()
+            transcript_file = None
+            if transcript['segments']:
+                transcript['source'] = 'live'
+                transcript['filename'] = name
+                transcript['model_size'] = model_size
+                transcript['duration'] = round(transcriber.received_seconds, 2)
+                transcript['timestamp'] = datetime.now().isoformat()
+                transcript_file = os.path.basename(save_transcript(transcript, name))
+            send_live(ws, {'type': 'final', 'transcript': transcript['text'], 'language': transcript['language'],
+                           'model_size': model_size, 'transcript_file': transcript_file})
+    except Exception as e:
+        logger.error(f"Error saving live transcript: {e}")
+        error = error or str(e)
+    finally:
+        live_session_slots.release()
+        if pinned is not None:
+            model_registry.unpin(pinned)
+        jobs_total.inc(kind='live', status='failed' if error else 'completed')
+    if error:
+        send_live(ws, {'type': 'error', 'error': error})
+
+live_session_slots = threading.BoundedSemaphore(app.config['LIVE_MAX_SESSIONS'])
+if Sock is not None:
+    sock = Sock(app)
+    sock.route('/live')(live_transcription)
+
+@app.route('/health')
+def health_check():
+    """Liveness check; reports in-memory state only, without loading a model or touching the disk."""
+    return jsonify({'status': 'healthy', 'whisper_loaded': bool(model_registry.loaded_sizes()),
+                    'warmup': model_registry.warmup_state(),
+                    'models': model_registry.stats(),
+                    'model_policy': model_policy.stats(),
+                    'inference_batching': inference_engine.stats(),
+                    'queue': job_queue.stats(all_processes=False)})
+
+@app.route('/status')
+def storage_status():
+    """Queue totals across processes and cache, catalog and disk statistics; these query the job store,
+    catalog and disks, so keep probes on /health."""
+    return jsonify({'queue': job_queue.stats(),
+                    'transcript_cache': transcript_cache_store.stats(),
+                    'pcm_cache': pcm_cache.stats(),
+                    'export_cache': export_cache.stats(),
+                    'catalog': transcript_catalog.stats(),
+                    'disk': maintenance.stats()})
+
+@app.route('/ready')
+def readiness_check():
+    """Readiness check; 503 until the preloaded models have finished warming up."""
+    warmup = model_registry.warmup_state()
+    if warmup['status'] == 'loading':
+        return jsonify({'status': 'warming_up', 'warmup': warmup}), 503
+    if warmup['status'] == 'failed':
+        return jsonify({'status': 'unready', 'warmup': warmup}), 503
+    return jsonify({'status': 'ready', 'warmup': warmup})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus-format service metrics."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@metrics.collector
+def collect_metrics():
+    """Copy this process's queue, model, cache and disk statistics into the metrics."""
+    queue = job_queue.stats()
+    queue_depth.set(queue['queued'])
+    jobs_running.set(queue['running'])
+    models = model_registry.stats()
+    models_loaded.set(len(models['loaded']))
+    model_evictions_total.set(models['evictions'])
+    batching = inference_engine.stats()
+    encoder_batches_total.set(batching['batches'])
+    encoder_windows_total.set(batching['windows'])
+    for cache, stats in (('model', models), ('transcript', transcript_cache_store.stats()),
+                         ('pcm', pcm_cache.stats())):
+        cache_requests_total.set(stats['hits'], cache=cache, result='hit')
+        cache_requests_total.set(stats['misses'], cache=cache, result='miss')
+    exports = export_cache.stats()
+    cache_requests_total.set(exports['hits'], cache='export', result='hit')
+    cache_requests_total.set(exports['renders'], cache='export', result='miss')
+    disk = maintenance.stats()
+    for reclaimed in disk['reclaimed']:
+        reclaimed_bytes_total.set(reclaimed['bytes'], area=reclaimed['area'], reason=reclaimed['reason'])
+        reclaimed_files_total.set(reclaimed['files'], area=reclaimed['area'], reason=reclaimed['reason'])
+    storage_rejections_total.set(disk['rejected'])
+    if disk['free_bytes'] is not None:
+        disk_free_bytes.set(disk['free_bytes'])
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running transcription job."""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status,
+                    'message': 'Transcription cancelled.'})
 
 @app.route('/cancel_transcription', methods=['POST'])
 def cancel_transcription():
-    """Cancel the current transcription process safely."""
-    global cancel_event
-    cancel_event.set()
-    return jsonify({'success': True, 'message': 'Transcription cancelled.'})
+    """Cancel a transcription job identified by ``job_id`` in the JSON body."""
+    data = request.get_json(silent=True) or {}
+    job_id = data.get('job_id')
+    if not job_id:
+        return jsonify({'error': 'job_id is required'}), 400
+    return cancel_job(job_id)
+
+@app.cli.command('batch')
+@click.argument('inputs', nargs=-1, required=True)
+@click.option('--model-size', default='base', show_default=True, help='Whisper model size.')
+@click.option('--precision', type=click.Choice(PRECISIONS), default=None,
+              help='Model weights; defaults to INFERENCE_PRECISION.')
+def batch_command(inputs, model_size, precision):
+    """Transcribe files, directories and YouTube videos or playlists without the web server.
+
+    Results are written to the transcripts folder and a manifest with
+    per-item timing and status to the batch manifest folder.
+    """
+    urls = [item for item in inputs if item.startswith(('http://', 'https://'))]
+    paths = [item for item in inputs if item not in urls]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise click.BadParameter(f"Not found: {', '.join(missing)}", param_hint='INPUTS')
+
+    model_size = resolve_model_size(model_size, precision=precision_requested(precision))
+    batch = batch_runner.start(batch_items(paths, urls, model_size), model_size, wait=True)
+    manifest = batch.to_dict()
+    for item in manifest['items']:
+        timing = f"{item['run_seconds']:.1f}s" if item.get('run_seconds') is not None else '-'
+        click.echo(f"[{item['status']}] {item['source']} ({timing}) {item.get('transcript_file') or item.get('error', '')}")
+    click.echo(f"Manifest: {batch.manifest_path}")
+    click.echo(f"Totals: {manifest['counts']} in {manifest['total_seconds']:.1f}s")
 
 if __name__ == '__main__':
     print("Starting Whisper Transcription Service...")
-    print("Loading Whisper model (this may take a moment)...")
-    
-    try:
-        load_whisper_model()
-        print("✓ Whisper model loaded successfully")
-        print("✓ Server starting on http://localhost:5000")
-        app.run(debug=True, host='0.0.0.0', port=5000)
-    except Exception as e:
-        print(f"✗ Error starting server: {e}")
-        print("Please make sure all dependencies are installed (run: pip install -r requirements.txt)")
+    # With the debug reloader the module runs twice; only the serving child warms up
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        print("Warming up Whisper models in the background (see /ready)...")
+        model_registry.start_warmup(app.config['PRELOAD_MODELS'])
+    print("✓ Server starting on http://localhost:5000")
+    app.run(debug=True, host='0.0.0.0', port=5000)
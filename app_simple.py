@@ -4,6 +4,8 @@ Lightweight Whisper AI Transcription Service
 A simple web application for transcribing audio files using OpenAI's Whisper AI.
 """
 
+import gc
+import importlib.util
 import os
 import tempfile
 import shutil
@@ -12,21 +14,16 @@ import logging
 from datetime import datetime
 import json
 from werkzeug.utils import secure_filename
+from model_registry import ModelRegistry
 
-# Try importing whisper - will show helpful error if not installed
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
+# Check for whisper without importing it (and torch) until a model is needed
+WHISPER_AVAILABLE = importlib.util.find_spec('whisper') is not None
+if not WHISPER_AVAILABLE:
     print("WARNING: OpenAI Whisper not available. Please install with: pip install openai-whisper")
 
-# Try importing yt-dlp for YouTube support
-try:
-    import yt_dlp
-    YOUTUBE_AVAILABLE = True
-except ImportError:
-    YOUTUBE_AVAILABLE = False
+# Check for yt-dlp for YouTube support; it is imported on first download
+YOUTUBE_AVAILABLE = importlib.util.find_spec('yt_dlp') is not None
+if not YOUTUBE_AVAILABLE:
     print("INFO: YouTube support not available. Install yt-dlp for YouTube functionality.")
 
 # Configure logging
@@ -37,6 +34,7 @@ app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['TRANSCRIPTS_FOLDER'] = 'transcripts'
+app.config['MODEL_MEMORY_BUDGET_MB'] = 2048  # Memory allowed for resident Whisper models
 
 # Create necessary directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -45,26 +43,31 @@ os.makedirs(app.config['TRANSCRIPTS_FOLDER'], exist_ok=True)
 # Supported file extensions
 ALLOWED_EXTENSIONS = {'mp3', 'mp4', 'wav', 'flac', 'm4a', 'ogg', 'wma', 'aac'}
 
-# Global variable to store the Whisper model
-whisper_model = None
+# Resident Whisper models; switching sizes no longer reloads from disk
+def whisper_loader(model_size):
+    """Load a Whisper model, importing whisper on first use."""
+    import whisper
+
+    return whisper.load_model(model_size)
+
+model_registry = ModelRegistry(
+    whisper_loader,
+    memory_budget_mb=app.config['MODEL_MEMORY_BUDGET_MB'],
+)
+
+def prepare_for_fork():
+    """Load the default model in a pre-forking server's master so workers share it copy-on-write."""
+    if WHISPER_AVAILABLE:
+        model_registry.warm_up(['base'])
+    gc.collect()
+    gc.freeze()
 
 def load_whisper_model(model_size="base"):
     """Load the Whisper model."""
-    global whisper_model
-    
     if not WHISPER_AVAILABLE:
         raise Exception("OpenAI Whisper is not installed. Please run: pip install openai-whisper")
     
-    if whisper_model is None or getattr(whisper_model, '_model_size', None) != model_size:
-        logger.info(f"Loading Whisper model: {model_size}")
-        try:
-            whisper_model = whisper.load_model(model_size)
-            whisper_model._model_size = model_size  # Store model size for reference
-            logger.info("Whisper model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading Whisper model: {e}")
-            raise
-    return whisper_model
+    return model_registry.get(model_size)
 
 def allowed_file(filename):
     """Check if the uploaded file has an allowed extension."""
@@ -76,6 +79,8 @@ def download_youtube_audio(url, output_path):
         raise Exception("YouTube support not available. Please install yt-dlp: pip install yt-dlp")
     
     try:
+        import yt_dlp
+
         ydl_opts = {
             'format': 'bestaudio/best',
             'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
@@ -252,27 +257,22 @@ def download_transcript(filename):
 
 @app.route('/health')
 def health_check():
-    """Health check endpoint."""
-    try:
-        status = {
-            'status': 'healthy',
-            'whisper_available': WHISPER_AVAILABLE,
-            'youtube_available': YOUTUBE_AVAILABLE
-        }
-        
-        if WHISPER_AVAILABLE:
-            # Try to load the model to verify everything is working
-            load_whisper_model()
-            status['whisper_loaded'] = True
-        
-        return jsonify(status)
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy', 
-            'error': str(e),
-            'whisper_available': WHISPER_AVAILABLE,
-            'youtube_available': YOUTUBE_AVAILABLE
-        }), 500
+    """Liveness check; reports state without loading a model."""
+    return jsonify({
+        'status': 'healthy',
+        'whisper_available': WHISPER_AVAILABLE,
+        'youtube_available': YOUTUBE_AVAILABLE,
+        'whisper_loaded': bool(model_registry.loaded_sizes()),
+        'warmup': model_registry.warmup_state(),
+    })
+
+@app.route('/ready')
+def readiness_check():
+    """Readiness check; 503 while the default model is still warming up."""
+    warmup = model_registry.warmup_state()
+    if not WHISPER_AVAILABLE or warmup['status'] in ('loading', 'failed'):
+        return jsonify({'status': 'unready', 'whisper_available': WHISPER_AVAILABLE, 'warmup': warmup}), 503
+    return jsonify({'status': 'ready', 'warmup': warmup})
 
 @app.route('/status')
 def status():
@@ -308,13 +308,10 @@ if __name__ == '__main__':
     
     print("=" * 50)
     
-    if WHISPER_AVAILABLE:
-        print("Loading Whisper model (this may take a moment)...")
-        try:
-            load_whisper_model()
-            print("✅ Whisper model loaded successfully")
-        except Exception as e:
-            print(f"❌ Error loading Whisper model: {e}")
+    # With the debug reloader the module runs twice; only the serving child warms up
+    if WHISPER_AVAILABLE and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        print("Warming up Whisper model in the background (see /ready)...")
+        model_registry.start_warmup(['base'])
     
     print("🚀 Server starting on http://localhost:5000")
     print("📝 Open the URL in your browser to use the transcription service")
@@ -0,0 +1,191 @@
+"""
+Batch transcription.
+A batch is a list of items (local files or YouTube videos) fed through the
+shared job queue, so every item reuses the workers' resident models. Only a
+few batch items wait in the queue at a time, leaving the rest of it to
+interactive requests. Each
+batch writes a JSON manifest recording per-item status and timing.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from jobs import QueueFullError
+
+logger = logging.getLogger(__name__)
+
+
+def _seconds_between(start, end):
+    if not start or not end:
+        return None
+    return round((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds(), 3)
+
+
+class Batch:
+    """A set of transcription items and their outcomes."""
+
+    def __init__(self, model_size, manifest_path):
+        self.id = os.path.splitext(os.path.basename(manifest_path))[0]
+        self.model_size = model_size
+        self.manifest_path = manifest_path
+        self.items = []
+        self.status = 'running'
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        with self._lock:
+            items = [dict(item) for item in self.items]
+        counts = {}
+        for item in items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        return {
+            'batch_id': self.id,
+            'model_size': self.model_size,
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'total_seconds': _seconds_between(self.created_at, self.finished_at),
+            'counts': counts,
+            'items': items,
+        }
+
+    def write_manifest(self):
+        data = self.to_dict()
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class BatchRunner:
+    """Schedules batch items onto a ``JobQueue`` and tracks them.
+
+    Items are ``(source, kind, func, on_cancel)`` tuples where ``func(job)``
+    performs the transcription and returns the job result, and
+    ``on_cancel(job)``, if not None, cleans up for an item cancelled before
+    it started. They may be produced lazily
+    (e.g. while a playlist is being expanded); submission backs off while the
+    queue is full instead of failing the item.
+
+    At most ``max_queued_jobs`` batch items wait in the queue at a time, across
+    all batches, so interactive requests still find room in it. Finished
+    batches beyond ``max_finished_batches`` are only kept as manifests.
+    """
+
+    def __init__(self, job_queue, manifest_folder, max_queued_jobs=10, max_finished_batches=100):
+        self.job_queue = job_queue
+        self.manifest_folder = manifest_folder
+        self.max_queued_jobs = max_queued_jobs
+        self.max_finished_batches = max_finished_batches
+        self._batches = {}
+        # Batch jobs submitted and not yet started
+        self._queued_jobs = []
+        self._lock = threading.Lock()
+        os.makedirs(manifest_folder, exist_ok=True)
+
+    def start(self, items, model_size, wait=False):
+        """Run ``items`` as a new batch; returns the Batch.
+
+        With ``wait=True`` this blocks until every item has finished.
+        """
+        batch_id = datetime.now().strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:8]
+        batch = Batch(model_size, os.path.join(self.manifest_folder, f"{batch_id}.json"))
+        with self._lock:
+            self._batches[batch.id] = batch
+            self._prune_finished()
+        batch.write_manifest()
+        thread = threading.Thread(target=self._run, args=(batch, items), name=f"batch-{batch.id}", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return batch
+
+    def get(self, batch_id):
+        """Return the batch's current state, falling back to its manifest on disk."""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is not None:
+            return batch.to_dict()
+        path = os.path.join(self.manifest_folder, f"{os.path.basename(batch_id)}.json")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return None
+
+    def _submit(self, func, on_cancel, model_size, kind, batch, pending):
+        while True:
+            with self._lock:
+                self._queued_jobs = [job for job in self._queued_jobs if job.status == 'queued']
+                if len(self._queued_jobs) < self.max_queued_jobs:
+                    try:
+                        job = self.job_queue.submit(func, model_size, kind=kind, on_cancel=on_cancel)
+                        self._queued_jobs.append(job)
+                        return job
+                    except QueueFullError:
+                        pass
+            # Record whatever finished while we wait for room in the queue
+            pending[:] = self._collect(batch, pending)
+            time.sleep(1)
+
+    def _prune_finished(self):
+        """Forget the oldest finished batches beyond ``max_finished_batches``; their manifests remain."""
+        finished = [batch_id for batch_id, batch in self._batches.items() if batch.status != 'running']
+        for batch_id in finished[:max(0, len(finished) - self.max_finished_batches)]:
+            del self._batches[batch_id]
+
+    def _collect(self, batch, pending):
+        """Record finished items; returns those still pending."""
+        still_pending = []
+        changed = False
+        for item, job in pending:
+            if not job.finished:
+                still_pending.append((item, job))
+                continue
+            with batch._lock:
+                item['status'] = job.status
+                item['queued_seconds'] = _seconds_between(job.created_at, job.started_at)
+                item['run_seconds'] = _seconds_between(job.started_at, job.finished_at)
+                if job.status == 'completed':
+                    item['transcript_file'] = job.result.get('transcript_file')
+                    item['cache_hit'] = job.result.get('cache_hit', False)
+                elif job.error:
+                    item['error'] = job.error
+            changed = True
+        if changed:
+            batch.write_manifest()
+        return still_pending
+
+    def _run(self, batch, items):
+        pending = []
+        total = 0
+        try:
+            for source, kind, func, on_cancel in items:
+                job = self._submit(func, on_cancel, batch.model_size, kind, batch, pending)
+                item = {'source': source, 'kind': kind, 'job_id': job.id, 'status': 'queued'}
+                with batch._lock:
+                    batch.items.append(item)
+                pending.append((item, job))
+                total += 1
+        except Exception as e:
+            logger.error(f"Error expanding batch {batch.id}: {e}")
+            with batch._lock:
+                batch.items.append({'source': None, 'kind': None, 'status': 'failed', 'error': str(e)})
+        batch.write_manifest()
+
+        while pending:
+            pending[0][1].wait(timeout=1)
+            pending = self._collect(batch, pending)
+
+        batch.finished_at = datetime.now().isoformat()
+        batch.status = 'completed'
+        batch.write_manifest()
+        with self._lock:
+            self._prune_finished()
+        logger.info(f"Batch {batch.id} finished with {total} items")
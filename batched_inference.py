@@ -0,0 +1,278 @@
+"""
+Cross-request batching of the Whisper encoder.
+Jobs transcribing with the same model at the same time each encode one
+30-second mel window per decode step. Their windows are gathered here into
+a single batched encoder pass, bounded by a maximum batch size and a
+maximum wait, and the audio features are handed back to each job, which
+then decodes its own window (with its own prompt) as before.
+
+Only the encoder is shared. Whisper's decoder keeps its key/value cache,
+and word alignment its attention weights, in forward hooks registered on
+the model's own modules, so hooks installed by one thread would fire on
+(and record) another thread's forward passes. Decoder work on a model
+instance is therefore serialized with a lock per instance.
+"""
+
+import logging
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Models may be loaded and evicted at any time; their locks go with them
+_decode_locks = weakref.WeakKeyDictionary()
+_decode_locks_lock = threading.Lock()
+
+
+def decode_lock(model):
+    """The lock serializing decoder passes on ``model``, shared by every thread using it."""
+    with _decode_locks_lock:
+        lock = _decode_locks.get(model)
+        if lock is None:
+            lock = _decode_locks[model] = threading.RLock()
+        return lock
+
+
+class EncoderBatcher:
+    """Runs a model's encoder on windows submitted from many threads.
+
+    A window waits at most ``max_wait_seconds`` for others to join its
+    batch, and not at all once every ``active`` transcription has sent one;
+    windows submitted while a batch is running make up the next one.
+    """
+
+    def __init__(self, encoder, max_batch=8, max_wait_seconds=0.05, name='encoder'):
+        self.encoder = encoder
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self.batches = 0
+        self.windows = 0
+        self.active = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, mel):
+        """Audio features for one ``(n_mels, frames)`` window, computed in a shared batch."""
+        future = Future()
+        with self._lock:
+            queued = not self._closed
+            if queued:
+                self._requests.put((mel, future))
+        if not queued:
+            # Retired while a transcription was still using the model
+            import torch
+
+            with torch.no_grad():
+                return self.encoder(mel.unsqueeze(0))[0]
+        return future.result()
+
+    def add_active(self, count):
+        """Track transcriptions that may contribute windows (``count`` is +1 or -1)."""
+        with self._lock:
+            self.active += count
+
+    def close(self):
+        """Stop after the windows already submitted; later ones are encoded by their caller."""
+        with self._lock:
+            self._closed = True
+            self._requests.put(None)
+
+    def _gather(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < min(self.max_batch, self.active):
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Finish this batch, then stop
+                self._requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        import torch
+
+        while True:
+            first = self._requests.get()
+            if first is None:
+                return
+            batch = self._gather(first)
+            # Windows only stack with others of the same shape and precision
+            groups = {}
+            for mel, future in batch:
+                groups.setdefault((tuple(mel.shape), mel.dtype, mel.device), []).append((mel, future))
+            for group in groups.values():
+                try:
+                    with torch.no_grad():
+                        features = self.encoder(torch.stack([mel for mel, _ in group]))
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+                self.batches += 1
+                self.windows += len(group)
+                for i, (_, future) in enumerate(group):
+                    future.set_result(features[i])
+
+
+class SerializedModel:
+    """A Whisper model that transcribes for one thread at a time.
+
+    Used when encoder batching is off, so jobs sharing a resident model
+    take turns rather than corrupting each other's decoder state.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = decode_lock(model)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def transcribe(self, audio, **options):
+        with self._lock:
+            return self.model.transcribe(audio, **options)
+
+
+class BatchedModel:
+    """A Whisper model whose encoder passes are shared with concurrent jobs.
+
+    Stands in for the model in ``whisper.transcribe()``: ``decode()`` and
+    ``detect_language()`` get their audio features from the batcher, and
+    everything else is delegated to the wrapped model. Decoding holds the
+    model's decode lock, taken after the features are ready so other jobs'
+    windows still join the same encoder batch; with word timestamps the
+    lock is held for the whole transcription, as alignment hooks span
+    several calls into the model.
+    """
+
+    def __init__(self, model, batcher):
+        self.model = model
+        self.batcher = batcher
+        self._lock = decode_lock(model)
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __call__(self, *args, **kwargs):
+        return self.model(*args, **kwargs)
+
+    def _is_encoded(self, mel):
+        return tuple(mel.shape[-2:]) == (self.model.dims.n_audio_ctx, self.model.dims.n_audio_state)
+
+    def _features(self, mel):
+        if self._is_encoded(mel):
+            return mel
+        if mel.ndim == 3:
+            import torch
+
+            return torch.stack([self._features(window) for window in mel])
+        # Temperature fallback decodes the same window again; reuse its features
+        cached = getattr(self._local, 'last', None)
+        if cached is not None and cached[0] is mel:
+            return cached[1]
+        features = self.batcher.encode(mel)
+        self._local.last = (mel, features)
+        return features
+
+    def decode(self, mel, options=None, **kwargs):
+        from whisper.decoding import DecodingOptions, decode
+
+        features = self._features(mel)
+        with self._lock:
+            return decode(self.model, features, options or DecodingOptions(), **kwargs)
+
+    def detect_language(self, mel, tokenizer=None):
+        from whisper.decoding import detect_language
+
+        features = self._features(mel)
+        with self._lock:
+            return detect_language(self.model, features, tokenizer)
+
+    def transcribe(self, audio, **options):
+        import whisper
+
+        self.batcher.add_active(1)
+        try:
+            if options.get('word_timestamps'):
+                with self._lock:
+                    return whisper.transcribe(self, audio, **options)
+            return whisper.transcribe(self, audio, **options)
+        finally:
+            self.batcher.add_active(-1)
+            self._local.last = None
+
+
+class InferenceEngine:
+    """Batches encoder passes per resident model across concurrent jobs."""
+
+    def __init__(self, max_batch=8, max_wait_seconds=0.05):
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self._models = {}
+        self._lock = threading.Lock()
+        # Work done by batchers since retired, so totals never go backwards
+        self._retired_batches = 0
+        self._retired_windows = 0
+
+    def wrap(self, model_size, model):
+        """Return ``model`` wrapped so its encoder passes are batched."""
+        with self._lock:
+            batched = self._models.get(model_size)
+            if batched is not None and batched.model is model:
+                return batched
+            if batched is not None:
+                # The registry reloaded this size; retire the old batcher
+                self._retire(batched)
+            batcher = EncoderBatcher(model.encoder, self.max_batch, self.max_wait_seconds, name=model_size)
+            batched = self._models[model_size] = BatchedModel(model, batcher)
+            return batched
+
+    def retain(self, model_sizes):
+        """Drop the batchers of models no longer in ``model_sizes``, so evicted models can be freed."""
+        with self._lock:
+            for size in list(self._models):
+                if size not in model_sizes:
+                    self._retire(self._models.pop(size))
+
+    def _retire(self, batched):
+        batched.batcher.close()
+        self._retired_batches += batched.batcher.batches
+        self._retired_windows += batched.batcher.windows
+
+    def stats(self):
+        with self._lock:
+            batchers = {size: batched.batcher for size, batched in self._models.items()}
+            batches, windows = self._retired_batches, self._retired_windows
+        models = {}
+        for size, batcher in batchers.items():
+            models[size] = {
+                'batches': batcher.batches,
+                'windows': batcher.windows,
+                'mean_batch_size': round(batcher.windows / batcher.batches, 2) if batcher.batches else None,
+            }
+            batches += batcher.batches
+            windows += batcher.windows
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': round(self.max_wait_seconds * 1000),
+            'batches': batches,
+            'windows': windows,
+            'models': models,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            for size in list(self._models):
+                self._retire(self._models.pop(size))
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmarks.
+Generates synthetic speech-like audio offline, drives the pipeline both
+directly and through the Flask test client, and writes latency percentiles,
+throughput, real-time factor and peak RSS as JSON so runs can be compared.
+``--stub-model`` swaps Whisper for a model that takes time in proportion to
+the audio length, so the suite runs on CI without downloading weights.
+
+Usage:
+    python benchmark.py --stub-model --lengths 30,300 --models tiny,base --output bench.json
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ('transcribe', 'http', 'save', 'load', 'export')
+
+# Seconds of work per second of audio for the stub model, roughly in the
+# proportions of the real model sizes on CPU
+STUB_REAL_TIME_FACTORS = {
+    'tiny': 0.005,
+    'base': 0.01,
+    'small': 0.03,
+    'medium': 0.08,
+    'large': 0.15,
+}
+
+
+def synthetic_audio(seconds, seed=0):
+    """Speech-like test audio: voiced bursts of 0.3-3 s separated by pauses."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    audio = (rng.standard_normal(total) * 0.002).astype(np.float32)
+    position = 0
+    while position < total:
+        length = int(rng.uniform(0.3, 3.0) * SAMPLE_RATE)
+        end = min(position + length, total)
+        t = np.arange(end - position) / SAMPLE_RATE
+        pitch = rng.uniform(90, 250)
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 - 0.5 * np.cos(2 * np.pi * 4 * t)
+        audio[position:end] += (0.15 * voiced * envelope).astype(np.float32)
+        position = end + int(rng.uniform(0.2, 1.5) * SAMPLE_RATE)
+    return np.clip(audio, -1, 1)
+
+
+def wav_bytes(audio):
+    """Encode float32 PCM as a 16-bit mono WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((audio * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+class StubModel:
+    """Stands in for a Whisper model: sleeps for a share of the audio length."""
+
+    def __init__(self, model_size):
+        self.model_size = model_size
+        self.real_time_factor = STUB_REAL_TIME_FACTORS.get(model_size.split('.')[0], 0.01)
+
+    def transcribe(self, audio, **options):
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.real_time_factor)
+        segments = []
+        for i, start in enumerate(np.arange(0, duration, 5.0)):
+            end = min(start + 5.0, duration)
+            segments.append({'id': i, 'seek': 0, 'start': float(start), 'end': float(end),
+                             'text': f" Segment {i} of the benchmark audio.", 'tokens': [50364, 1234, 50614],
+                             'temperature': 0.0, 'avg_logprob': -0.2, 'compression_ratio': 1.2,
+                             'no_speech_prob': 0.01})
+        return {'text': ''.join(s['text'] for s in segments), 'segments': segments,
+                'language': options.get('language') or 'en'}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(values):
+    """Latency summary in seconds."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return {'count': 0}
+    return {
+        'count': int(len(values)),
+        'mean': round(float(values.mean()), 6),
+        'min': round(float(values.min()), 6),
+        'p50': round(float(np.percentile(values, 50)), 6),
+        'p90': round(float(np.percentile(values, 90)), 6),
+        'p99': round(float(np.percentile(values, 99)), 6),
+        'max': round(float(values.max()), 6),
+    }
+
+
+def timed(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_transcribe(service, lengths, models, repeat):
+    """``transcribe_audio()`` on in-memory PCM, per model size and audio length."""
+    results = []
+    for model_size in models:
+        service.load_whisper_model(model_size)
+        for seconds in lengths:
+            audio = synthetic_audio(seconds, seed=int(seconds))
+            latencies = timed(lambda: service.transcribe_audio(audio, model_size), repeat)
+            results.append({
+                'scenario': 'transcribe',
+                'model_size': model_size,
+                'audio_seconds': seconds,
+                'latency': summarize(latencies),
+                'real_time_factor': summarize([latency / seconds for latency in latencies]),
+                'audio_seconds_per_second': round(seconds * repeat / sum(latencies), 3),
+                'peak_rss_mb': peak_rss_mb(),
+            })
+    return results
+
+
+def bench_http(service, client, lengths, models, jobs):
+    """End-to-end uploads through ``POST /transcribe_file`` until each job completes."""
+    results = []
+    for model_size in models:
+        for seconds in lengths:
+            # Distinct audio per job so the transcript cache never answers
+            uploads = [wav_bytes(synthetic_audio(seconds, seed=1000 + i)) for i in range(jobs)]
+            started = time.perf_counter()
+            submitted = []
+            for i, data in enumerate(uploads):
+                requested_at = datetime.now()
+                response = client.post('/transcribe_file', data={
+                    'file': (io.BytesIO(data), f"bench_{i}.wav"),
+                    'model_size': model_size,
+                }, content_type='multipart/form-data')
+                if response.status_code != 202:
+                    raise RuntimeError(f"Upload rejected ({response.status_code}): {response.get_json()}")
+                submitted.append((requested_at, response.get_json()['job_id']))
+            latencies = []
+            for requested_at, job_id in submitted:
+                job = service.job_queue.get(job_id)
+                job.wait()
+                if job.status != 'completed':
+                    raise RuntimeError(f"Job {job_id} {job.status}: {job.error}")
+                # From the start of the upload to the transcript being saved
+                latencies.append((datetime.fromisoformat(job.finished_at) - requested_at).total_seconds())
+            wall = time.perf_counter() - started
+            results.append({
+                'scenario': 'http',
+                'model_size': model_size,
+                'audio_seconds': seconds,
+                'jobs': jobs,
+                'latency': summarize(latencies),
+                'jobs_per_second': round(jobs / wall, 3),
+                'audio_seconds_per_second': round(seconds * jobs / wall, 3),
+                'peak_rss_mb': peak_rss_mb(),
+            })
+    return results
+
+
+def bench_save(service, fixture, repeat):
+    """``save_transcript()`` of the fixture, including search indexing."""
+    with open(fixture, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    latencies = timed(lambda: service.save_transcript(json.loads(json.dumps(data)), 'bench_save'), repeat)
+    return [{
+        'scenario': 'save',
+        'fixture': os.path.basename(fixture),
+        'segments': len(data.get('segments', [])),
+        'latency': summarize(latencies),
+        'peak_rss_mb': peak_rss_mb(),
+    }]
+
+
+def bench_load(fixture, repeat, workdir):
+    """Reading the fixture as legacy JSON and in the compact transcript format."""
+    from transcript_store import TranscriptReader, convert_legacy
+
+    legacy_path = os.path.join(workdir, os.path.basename(fixture))
+    shutil.copy(fixture, legacy_path)
+    compact_path = convert_legacy(legacy_path)
+    operations = {
+        'legacy_to_dict': lambda: TranscriptReader(legacy_path).to_dict(),
+        'metadata': lambda: TranscriptReader(compact_path).metadata(),
+        'text': lambda: TranscriptReader(compact_path).text(),
+        'segments': lambda: TranscriptReader(compact_path).segments(),
+        'to_dict': lambda: TranscriptReader(compact_path).to_dict(),
+    }
+    results = []
+    for operation, func in operations.items():
+        results.append({
+            'scenario': 'load',
+            'operation': operation,
+            'fixture': os.path.basename(fixture),
+            'bytes': os.path.getsize(legacy_path if operation.startswith('legacy') else compact_path),
+            'latency': summarize(timed(func, repeat)),
+        })
+    return results
+
+
+def bench_export(service, client, fixture, repeat):
+    """``GET /download_transcript`` per format, with a cold and a warm export cache."""
+    from exporters import EXPORT_FORMATS
+
+    with open(fixture, 'r', encoding='utf-8') as f:
+        transcript_path = service.save_transcript(json.load(f), 'bench_export')
+    name = os.path.basename(transcript_path)
+    cache_folder = service.export_cache.folder
+
+    def download(export_format):
+        response = client.get(f"/download_transcript/{name}?format={export_format}")
+        body = response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"Export {export_format} failed ({response.status_code})")
+        return body
+
+    def cold(export_format):
+        for entry in os.listdir(cache_folder):
+            os.remove(os.path.join(cache_folder, entry))
+        download(export_format)
+
+    results = []
+    for export_format in EXPORT_FORMATS:
+        size = len(download(export_format))
+        results.append({
+            'scenario': 'export',
+            'format': export_format,
+            'fixture': os.path.basename(fixture),
+            'bytes': size,
+            'cold': summarize(timed(lambda: cold(export_format), repeat)),
+            'warm': summarize(timed(lambda: download(export_format), repeat)),
+        })
+    return results
+
+
+def default_fixture():
+    matches = sorted(glob.glob(os.path.join(REPO_DIR, 'transcripts', 'Funerals*.json')))
+    return matches[0] if matches else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--lengths', default='30,120', help='Synthetic audio lengths in seconds')
+    parser.add_argument('--models', default='base', help='Comma-separated model sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+    parser.add_argument('--jobs', type=int, default=4, help='Concurrent uploads in the http scenario')
+    parser.add_argument('--stub-model', action='store_true', help='Replace Whisper with a timed stub')
+    parser.add_argument('--fixture', default=default_fixture(), help='Large legacy JSON transcript')
+    parser.add_argument('--output', help='Write results to this JSON file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    lengths = [float(s) for s in args.lengths.split(',') if s]
+    models = [m for m in args.models.split(',') if m]
+    fixture = os.path.abspath(args.fixture) if args.fixture else None
+    output = os.path.abspath(args.output) if args.output else None
+
+    # The service creates its folders, caches and index relative to the
+    # working directory, so run it in a scratch directory
+    workdir = tempfile.mkdtemp(prefix='whisper-bench-')
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import app as service
+    from model_registry import ModelRegistry
+
+    # Handlers pass these paths to send_file, which resolves relative paths
+    # against the package rather than the scratch directory
+    for key in ('UPLOAD_FOLDER', 'TRANSCRIPTS_FOLDER'):
+        service.app.config[key] = os.path.abspath(service.app.config[key])
+    service.export_cache.folder = os.path.abspath(service.export_cache.folder)
+
+    if args.stub_model:
+        service.model_registry = ModelRegistry(StubModel)
+        # Chunk workers load real models in their own processes
+        service.app.config['PARALLEL_TRANSCRIPTION'] = False
+        # The stub has no encoder to batch
+        service.app.config['INFERENCE_BATCHING'] = False
+    client = service.app.test_client()
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'stub_model': args.stub_model,
+        'models': models,
+        'lengths': lengths,
+        'repeat': args.repeat,
+        'results': [],
+        'errors': {},
+    }
+    runners = {
+        'transcribe': lambda: bench_transcribe(service, lengths, models, args.repeat),
+        'http': lambda: bench_http(service, client, lengths, models, args.jobs),
+        'save': lambda: bench_save(service, fixture, args.repeat),
+        'load': lambda: bench_load(fixture, args.repeat, workdir),
+        'export': lambda: bench_export(service, client, fixture, args.repeat),
+    }
+    try:
+        for scenario in scenarios:
+            if scenario in ('save', 'load', 'export') and not fixture:
+                report['errors'][scenario] = 'No fixture transcript found; pass --fixture'
+                print(f"{scenario} failed: {report['errors'][scenario]}", file=sys.stderr)
+                continue
+            print(f"Running {scenario}...", file=sys.stderr)
+            try:
+                report['results'].extend(runners[scenario]())
+            except Exception as e:
+                # e.g. ffmpeg missing for uploads; keep the other scenarios
+                report['errors'][scenario] = f"{type(e).__name__}: {e}"
+                print(f"{scenario} failed: {report['errors'][scenario]}", file=sys.stderr)
+    finally:
+        service.job_queue.shutdown(wait=False)
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    # A scenario that failed must fail the run, or CI would compare against empty results
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
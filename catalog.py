@@ -0,0 +1,290 @@
+"""
+Transcript catalog.
+One SQLite row per saved transcript with the metadata needed to list, filter
+and find transcripts (source, URL or file name, title, language, model,
+duration, size, audio hash), so neither listings nor downloads have to scan
+or stat the transcripts folder. Rows are written as transcripts are saved,
+and the catalog can be synced or rebuilt from the folder at any time.
+"""
+
+import base64
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from search_index import TRANSCRIPT_FILE_EXTENSIONS
+from transcript_store import TranscriptReader
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    filename TEXT PRIMARY KEY,
+    source TEXT,
+    url TEXT,
+    original_filename TEXT,
+    title TEXT NOT NULL DEFAULT '',
+    language TEXT,
+    model_size TEXT,
+    draft INTEGER NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    audio_hash TEXT,
+    created_at TEXT NOT NULL DEFAULT '',
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS transcripts_created_at ON transcripts (created_at, filename);
+CREATE INDEX IF NOT EXISTS transcripts_title ON transcripts (title, filename);
+CREATE INDEX IF NOT EXISTS transcripts_duration ON transcripts (duration, filename);
+CREATE INDEX IF NOT EXISTS transcripts_bytes ON transcripts (bytes, filename);
+CREATE INDEX IF NOT EXISTS transcripts_source ON transcripts (source, created_at, filename);
+CREATE INDEX IF NOT EXISTS transcripts_language ON transcripts (language, created_at, filename);
+CREATE INDEX IF NOT EXISTS transcripts_model_size ON transcripts (model_size, created_at, filename);
+CREATE INDEX IF NOT EXISTS transcripts_audio_hash ON transcripts (audio_hash);
+"""
+
+COLUMNS = ('filename', 'source', 'url', 'original_filename', 'title', 'language', 'model_size', 'draft',
+           'duration', 'bytes', 'audio_hash', 'created_at', 'mtime_ns')
+
+# Listing order; each has an index ending in filename, which breaks ties
+SORT_KEYS = ('created_at', 'title', 'duration', 'bytes')
+
+# Filters matched for equality
+EQUALITY_FILTERS = ('source', 'language', 'model_size', 'audio_hash', 'url')
+
+
+def encode_cursor(sort, order, row):
+    """Opaque cursor resuming a listing after ``row``."""
+    payload = json.dumps([sort, order, row[sort], row['filename']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort, order):
+    """The ``(value, filename)`` a cursor resumes after; ValueError if it is invalid or for another order."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, filename = json.loads(payload)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError('Cursor belongs to a listing with a different sort order')
+    return value, filename
+
+
+def catalog_entry(transcript_path, metadata, segments):
+    """The catalog row for a transcript file and its contents."""
+    stat = os.stat(transcript_path)
+    duration = metadata.get('duration')
+    if duration is None:
+        duration = max((segment.get('end') or 0 for segment in segments), default=0)
+        vad = metadata.get('vad')
+        if isinstance(vad, dict) and vad.get('total_seconds'):
+            duration = max(duration, vad['total_seconds'])
+    return {
+        'filename': os.path.basename(transcript_path),
+        'source': metadata.get('source'),
+        'url': metadata.get('url'),
+        'original_filename': metadata.get('filename'),
+        'title': metadata.get('title') or metadata.get('filename') or '',
+        'language': metadata.get('language'),
+        'model_size': metadata.get('model_size'),
+        'draft': int(bool(metadata.get('draft'))),
+        'duration': round(float(duration), 2),
+        'bytes': stat.st_size,
+        'audio_hash': metadata.get('audio_hash'),
+        'created_at': metadata.get('timestamp') or '',
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+class TranscriptCatalog:
+    """Metadata of every saved transcript, stored in SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one operation, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, transcript_path, transcript_data=None):
+        """Record (or update) one transcript file and return its entry.
+
+        ``transcript_data`` may be passed when the caller already holds the
+        transcript in memory, saving a read back from disk.
+        """
+        if transcript_data is None:
+            reader = TranscriptReader(transcript_path)
+            metadata = reader.metadata()
+            segments = reader.segments()
+        else:
+            metadata = transcript_data
+            segments = transcript_data.get('segments') or []
+        entry = catalog_entry(transcript_path, metadata, segments)
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO transcripts ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                [entry[column] for column in COLUMNS],
+            )
+        return entry
+
+    def get(self, filename):
+        """The entry for ``filename``, or None if it is not in the catalog."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM transcripts WHERE filename = ?", (filename,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def remove(self, filename):
+        """Drop a transcript from the catalog."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM transcripts WHERE filename = ?", (filename,))
+
+    def sync_folder(self, folder):
+        """Bring the catalog in line with ``folder``.
+
+        New or modified transcripts are (re)read and entries for deleted files
+        are dropped; unchanged files are skipped, so this is cheap to run at
+        every startup. Returns the number of files added or updated.
+        """
+        with self._connect() as conn:
+            known = {row['filename']: row['mtime_ns']
+                     for row in conn.execute("SELECT filename, mtime_ns FROM transcripts")}
+        present = set()
+        added = 0
+        for entry in os.scandir(folder):
+            if not entry.name.endswith(TRANSCRIPT_FILE_EXTENSIONS) or not entry.is_file():
+                continue
+            try:
+                mtime_ns = entry.stat().st_mtime_ns
+            except FileNotFoundError:
+                # Deleted since the listing; its entry is dropped below
+                continue
+            present.add(entry.name)
+            if known.get(entry.name) == mtime_ns:
+                continue
+            try:
+                self.add(entry.path)
+                added += 1
+            except FileNotFoundError:
+                present.discard(entry.name)
+            except Exception as e:
+                logger.warning(f"Could not catalog {entry.name}: {e}")
+        removed = set(known) - present
+        if removed:
+            with self._write_lock, self._connect() as conn:
+                conn.executemany("DELETE FROM transcripts WHERE filename = ?", [(name,) for name in removed])
+        if added:
+            logger.info(f"Transcript catalog updated with {added} transcripts")
+        return added
+
+    def rebuild(self, folder):
+        """Discard the catalog and rebuild it from ``folder``."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM transcripts")
+        return self.sync_folder(folder)
+
+    def list(self, filters=None, sort='created_at', order='desc', limit=50, cursor=None, count=False):
+        """One page of entries matching ``filters``, in ``sort`` order.
+
+        ``filters`` may hold any of EQUALITY_FILTERS, ``draft`` (bool),
+        ``title`` (substring), ``since``/``until`` (bounds on the saved
+        timestamp, ISO format) and ``min_duration``/``max_duration``
+        (seconds). Pages are keyed on the last row of the previous page,
+        passed back as ``cursor``, so a page costs the same however deep it
+        is. Raises ValueError for an unknown sort key or a bad cursor.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+        if order not in ('asc', 'desc'):
+            raise ValueError('order must be asc or desc')
+        filters = filters or {}
+        clauses, params = [], []
+        for column in EQUALITY_FILTERS:
+            if filters.get(column) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if filters.get('draft') is not None:
+            clauses.append("draft = ?")
+            params.append(int(bool(filters['draft'])))
+        if filters.get('title'):
+            clauses.append("title LIKE ? ESCAPE '\\'")
+            escaped = filters['title'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+        for key, clause in (('since', "created_at >= ?"), ('until', "created_at < ?"),
+                            ('min_duration', "duration >= ?"), ('max_duration', "duration <= ?")):
+            if filters.get(key) is not None:
+                clauses.append(clause)
+                params.append(filters[key])
+
+        total = None
+        with self._connect() as conn:
+            if count:
+                where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+                total = conn.execute(f"SELECT COUNT(*) FROM transcripts {where}", params).fetchone()[0]
+            page_clauses, page_params = list(clauses), list(params)
+            if cursor:
+                value, filename = decode_cursor(cursor, sort, order)
+                page_clauses.append(f"({sort}, filename) {'<' if order == 'desc' else '>'} (?, ?)")
+                page_params += [value, filename]
+            where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ''
+            rows = conn.execute(
+                f"SELECT * FROM transcripts {where} ORDER BY {sort} {order}, filename {order} LIMIT ?",
+                page_params + [limit + 1],
+            ).fetchall()
+
+        entries = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(sort, order, entries[-1]) if len(rows) > limit else None
+        return {'transcripts': entries, 'next_cursor': next_cursor, 'total': total}
+
+    def oldest(self, limit, source=None, before=None):
+        """Up to ``limit`` entries in the order they were saved, optionally of one ``source``
+        or saved before ``before`` (ISO timestamp). Entries without a save time are left out."""
+        clauses, params = ["created_at != ''"], []
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        if before is not None:
+            clauses.append("created_at < ?")
+            params.append(before)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM transcripts WHERE {' AND '.join(clauses)} ORDER BY created_at, filename LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def usage(self):
+        """Bytes of transcripts per source."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT source, SUM(bytes) AS bytes FROM transcripts GROUP BY source").fetchall()
+        return {row['source']: row['bytes'] for row in rows}
+
+    def stats(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*), IFNULL(SUM(bytes), 0) FROM transcripts").fetchone()
+        return {'transcripts': row[0], 'bytes': row[1]}
+
+
+if __name__ == '__main__':
+    # Usage: python catalog.py [transcripts_folder] [catalog_path]
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'transcripts'
+    catalog_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join('cache', 'catalog.sqlite3')
+    count = TranscriptCatalog(catalog_path).rebuild(folder)
+    print(f"Cataloged {count} transcripts from {folder} into {catalog_path}")
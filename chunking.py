@@ -0,0 +1,353 @@
+"""
+Chunked transcription.
+Long audio is split at quiet points into overlapping chunks which are
+transcribed concurrently in a process pool, each process holding its own
+Whisper model, then stitched back together on the original timeline.
+Shorter audio is walked through in pause-aligned windows on the calling
+thread so segments can be reported as soon as each window is decoded; the
+windows can also be cut from audio that is still being downloaded.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+
+# A single pool, reused across jobs so each process only loads its model
+# once; replaced when a job needs another model size or process count
+_pool = None
+_pool_key = None
+_pool_users = 0
+# Called with the pool's process count on creation and with 0 once it is gone
+_pool_charge = None
+_pool_changed = threading.Condition()
+
+# Model held by each pool process
+_worker_model = None
+
+
+def frame_energy(audio, frame_seconds=FRAME_SECONDS):
+    """Return the RMS energy of consecutive non-overlapping frames."""
+    frame = int(SAMPLE_RATE * frame_seconds)
+    usable = len(audio) - len(audio) % frame
+    if usable == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+
+def find_split_points(audio, chunk_seconds=300, search_seconds=30):
+    """Choose chunk boundaries (in samples) at the quietest nearby frame.
+
+    Boundaries are placed roughly every ``chunk_seconds`` and nudged to the
+    lowest-energy frame within ``search_seconds`` either side so that cuts
+    fall in pauses rather than mid-word. The first boundary is 0 and the
+    last is ``len(audio)``.
+    """
+    energy = frame_energy(audio)
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    target_frames = int(chunk_seconds / FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+
+    boundaries = [0]
+    position = target_frames
+    while position < len(energy) - search_frames:
+        lo = max(position - search_frames, boundaries[-1] // frame + 1)
+        hi = min(position + search_frames, len(energy))
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        boundaries.append(quietest * frame)
+        position = quietest + target_frames
+    boundaries.append(len(audio))
+    return boundaries
+
+
+class _ArraySource:
+    """Presents a complete array through the AudioBuffer reading interface."""
+
+    finished = True
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.expected_seconds = len(audio) / SAMPLE_RATE
+
+    def wait_for(self, samples, timeout=None):
+        return len(self.audio)
+
+    def slice(self, start, end):
+        return self.audio[start:end]
+
+
+def iter_windows(source, window_seconds=30, search_seconds=5):
+    """Yield ``(start, end, window_audio)`` for pause-aligned windows of ``source``.
+
+    ``source`` is a PCM array or a growing ``ingest.AudioBuffer``. Each
+    window ends at the quietest frame within ``search_seconds`` of
+    ``window_seconds``, and is cut as soon as that much audio has arrived.
+    """
+    if isinstance(source, np.ndarray):
+        source = _ArraySource(source)
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    window = int(window_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+
+    start = 0
+    while True:
+        needed = start + window + search
+        available = source.wait_for(needed + 1)
+        if available <= needed:
+            # The source has ended; whatever is left is the last window
+            if available > start:
+                yield start, available, source.slice(start, available)
+            return
+        lo = start + window - search
+        end = lo + int(np.argmin(frame_energy(source.slice(lo, needed)))) * frame
+        yield start, end, source.slice(start, end)
+        start = end
+
+
+def make_chunks(audio, boundaries, overlap_seconds=2.0):
+    """Yield ``(index, owned_start, owned_end, chunk_start, chunk_audio)``.
+
+    Each chunk owns the span between two boundaries and additionally
+    includes ``overlap_seconds`` of audio before it for decoder context.
+    """
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    for index, (start, end) in enumerate(zip(boundaries, boundaries[1:])):
+        chunk_start = max(0, start - overlap)
+        yield index, start, end, chunk_start, audio[chunk_start:end]
+
+
+def stitch_segments(chunk_results):
+    """Merge per-chunk results into one transcript on the original timeline.
+
+    ``chunk_results`` is a list of dicts with ``owned_start``/``owned_end``
+    in seconds and ``segments`` already shifted to absolute time. Segments
+    whose midpoint falls in the overlap owned by the previous chunk are
+    dropped, as is a segment repeating the text of the one before it.
+    """
+    segments = []
+    for chunk in sorted(chunk_results, key=lambda c: c['owned_start']):
+        for segment in _owned_segments(chunk['segments'], chunk['owned_start'], chunk['owned_end']):
+            if segments and segment['text'].strip() == segments[-1]['text'].strip():
+                continue
+            segments.append(segment)
+    for i, segment in enumerate(segments):
+        segment['id'] = i
+    return segments
+
+
+def _init_worker(model_size, threads):
+    """Load the model once in each pool process."""
+    global _worker_model
+    import torch
+    from quantization import load_model
+    torch.set_num_threads(threads)
+    _worker_model = load_model(model_size)
+
+
+def shift_segment(segment, offset_seconds):
+    """Return a copy of ``segment`` (and its words) moved ``offset_seconds`` later."""
+    segment = dict(segment)
+    segment['start'] += offset_seconds
+    segment['end'] += offset_seconds
+    segment['seek'] = segment.get('seek', 0) + int(offset_seconds * 100)
+    if segment.get('words'):
+        segment['words'] = [dict(word, start=word['start'] + offset_seconds, end=word['end'] + offset_seconds)
+                            for word in segment['words']]
+    return segment
+
+
+def _transcribe_chunk(chunk_audio, chunk_start_seconds, options):
+    """Transcribe one chunk in a pool process and shift its timestamps."""
+    result = _worker_model.transcribe(chunk_audio, **options)
+    segments = [shift_segment(segment, chunk_start_seconds) for segment in result['segments']]
+    return {'segments': segments, 'language': result['language']}
+
+
+@contextmanager
+def shared_pool(model_size, processes, charge=None):
+    """Use the process pool for ``model_size`` for the duration of the block.
+
+    Only one pool exists at a time, since each of its processes holds a
+    copy of the model. A job needing a different model size or process
+    count waits for the jobs using the current pool to finish, then
+    replaces it. ``charge(processes)`` is called when the pool is created
+    and ``charge(0)`` when it is shut down or replaced, so the memory of
+    its models can be accounted for.
+    """
+    global _pool, _pool_key, _pool_users, _pool_charge
+    key = (model_size, processes)
+    with _pool_changed:
+        _pool_changed.wait_for(lambda: _pool_key == key or _pool_users == 0)
+        if _pool_key != key:
+            if _pool is not None:
+                logger.info(f"Replacing the {_pool_key[0]} chunk worker pool")
+                # Chunks left running by a cancelled job still finish
+                _pool.shutdown(wait=False)
+                _release_pool_charge()
+            if charge is not None:
+                charge(processes)
+            _pool_charge = charge
+            threads = max(1, (os.cpu_count() or 1) // processes)
+            # Spawn rather than fork so torch's thread pools aren't inherited
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_size, threads),
+            )
+            _pool_key = key
+        _pool_users += 1
+        pool = _pool
+    try:
+        yield pool
+    finally:
+        with _pool_changed:
+            _pool_users -= 1
+            _pool_changed.notify_all()
+
+
+def shutdown_pools():
+    """Terminate the chunk worker processes."""
+    global _pool, _pool_key
+    with _pool_changed:
+        pool, _pool, _pool_key = _pool, None, None
+        _release_pool_charge()
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _release_pool_charge():
+    """Report the current pool gone. Must be called with ``_pool_changed`` held."""
+    global _pool_charge
+    if _pool_charge is not None:
+        _pool_charge(0)
+        _pool_charge = None
+
+
+def _owned_segments(segments, owned_start, owned_end):
+    """Segments whose midpoint falls inside the span a chunk owns."""
+    return [s for s in segments if owned_start <= (s['start'] + s['end']) / 2 <= owned_end]
+
+
+def transcribe_sequential(model, audio, window_seconds=30, on_segment=None, on_progress=None,
+                          cancel_token=None, **options):
+    """Transcribe ``audio`` window by window on the calling thread.
+
+    Windows end at pauses near every ``window_seconds`` so each call to
+    ``model.transcribe()`` is short: ``on_segment(segment)`` fires for every
+    segment as soon as its window is decoded and ``cancel_token`` is checked
+    between windows. The tail of the previous window is passed as the
+    prompt to keep context across cuts, and the language detected in the
+    first window is reused for the rest.
+
+    ``audio`` may be an ``AudioBuffer`` still being filled, in which case
+    each window is transcribed as soon as it has arrived and the total
+    passed to ``on_progress`` is the expected length, if known.
+    """
+    duration = len(audio) / SAMPLE_RATE if isinstance(audio, np.ndarray) else audio.expected_seconds
+    segments = []
+    language = options.pop('language', None)
+    prompt = options.pop('initial_prompt', None)
+
+    for start, end, window_audio in iter_windows(audio, window_seconds, min(5, window_seconds / 4)):
+        if cancel_token is not None:
+            cancel_token.check()
+        offset = start / SAMPLE_RATE
+        result = model.transcribe(window_audio, language=language, initial_prompt=prompt, **options)
+        language = language or result['language']
+        for segment in result['segments']:
+            segment = shift_segment(segment, offset)
+            segment['id'] = len(segments)
+            segments.append(segment)
+            if on_segment is not None:
+                on_segment(segment)
+        if result['text'].strip():
+            prompt = result['text'][-200:]
+        if on_progress is not None:
+            on_progress(end / SAMPLE_RATE, duration)
+
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': language,
+    }
+
+
+def transcribe_parallel(audio, model_size="base", processes=None, chunk_seconds=300,
+                        overlap_seconds=2.0, cancel_token=None, on_segment=None,
+                        on_progress=None, pool_charge=None, **options):
+    """Transcribe 16 kHz mono ``audio`` by chunks across a process pool.
+
+    Returns a dict shaped like ``whisper.transcribe()`` output. Chunk
+    languages are detected independently and the most common one wins
+    unless ``language`` is passed in ``options``. ``on_segment`` fires for
+    each segment of a chunk as the chunk completes, so segments may arrive
+    out of order; ``on_progress(done_seconds, total_seconds)`` reports the
+    audio covered by finished chunks. ``pool_charge`` is passed to
+    ``shared_pool()`` as its ``charge``.
+
+    On cancellation the chunks not yet started are dropped and the caller
+    is released at once; chunks already running in a pool process finish
+    in the background, since killing a shared pool process would also
+    abort other jobs' chunks.
+    """
+    processes = processes or os.cpu_count() or 1
+    boundaries = find_split_points(audio, chunk_seconds=chunk_seconds)
+    with shared_pool(model_size, processes, charge=pool_charge) as pool:
+        logger.info(f"Transcribing {len(boundaries) - 1} chunks across {processes} processes")
+        chunk_results = _run_chunks(pool, audio, boundaries, overlap_seconds, cancel_token, on_segment,
+                                    on_progress, options)
+
+    segments = stitch_segments(chunk_results)
+    languages = Counter(chunk['language'] for chunk in chunk_results)
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': options.get('language') or languages.most_common(1)[0][0],
+    }
+
+
+def _run_chunks(pool, audio, boundaries, overlap_seconds, cancel_token, on_segment, on_progress, options):
+    """Submit every chunk to ``pool`` and collect the results as they complete."""
+    futures = {}
+    for index, start, end, chunk_start, chunk_audio in make_chunks(audio, boundaries, overlap_seconds):
+        future = pool.submit(_transcribe_chunk, chunk_audio, chunk_start / SAMPLE_RATE, options)
+        futures[future] = (start / SAMPLE_RATE, end / SAMPLE_RATE)
+
+    duration = len(audio) / SAMPLE_RATE
+    done_seconds = 0.0
+    chunk_results = []
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            if cancel_token is not None:
+                cancel_token.check()
+            for future in done:
+                owned_start, owned_end = futures[future]
+                result = future.result()
+                result['owned_start'] = owned_start
+                result['owned_end'] = owned_end
+                chunk_results.append(result)
+                if on_segment is not None:
+                    for segment in _owned_segments(result['segments'], owned_start, owned_end):
+                        on_segment(segment)
+                done_seconds += owned_end - owned_start
+                if on_progress is not None:
+                    on_progress(done_seconds, duration)
+    finally:
+        for future in pending:
+            future.cancel()
+    return chunk_results
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Accuracy and speed of reduced-precision models.
+Transcribes a local reference set with each model size at every precision
+and reports word error rate, real-time factor, load time and model memory,
+comparing each reduced-precision variant against the same size in fp32.
+
+The reference set is a directory of audio files, each with its reference
+transcript in a .txt file of the same name. Files without one are still
+timed, and the fp32 transcript stands in as their reference when measuring
+how far a quantized model drifts from it (``agreement_wer``).
+
+Usage:
+    python evaluate.py references/ --models base,small --precisions fp32,int8 --output eval.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+
+from chunking import SAMPLE_RATE
+from ingest import decode_file
+from model_registry import model_memory_mb
+from quantization import PRECISIONS, load_model, model_key
+
+AUDIO_EXTENSIONS = ('.mp3', '.mp4', '.wav', '.flac', '.m4a', '.ogg', '.wma', '.aac')
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+
+def normalize_words(text):
+    """Lower-cased words with punctuation removed, as compared for WER."""
+    return _PUNCTUATION.sub(' ', text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Substitutions, deletions and insertions turning ``reference`` into ``hypothesis``."""
+    if not reference:
+        return len(hypothesis)
+    # One row of the edit distance table at a time
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def error_rate(pairs):
+    """Corpus WER over ``(reference_text, hypothesis_text)`` pairs, or None without references."""
+    errors = words = 0
+    for reference, hypothesis in pairs:
+        reference = normalize_words(reference)
+        errors += word_errors(reference, normalize_words(hypothesis))
+        words += len(reference)
+    return round(errors / words, 4) if words else None
+
+
+def load_reference_set(directory):
+    """``(name, audio_path, reference_text or None)`` for each audio file in ``directory``."""
+    samples = []
+    for entry in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(entry)
+        if extension.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference_path = os.path.join(directory, f"{stem}.txt")
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding='utf-8') as f:
+                reference = f.read()
+        samples.append((entry, os.path.join(directory, entry), reference))
+    return samples
+
+
+def evaluate_model(key, samples, options):
+    """Load the model named by ``key`` and transcribe every sample with it."""
+    started = time.perf_counter()
+    model = load_model(key)
+    load_seconds = time.perf_counter() - started
+    files = []
+    for name, audio, reference in samples:
+        started = time.perf_counter()
+        result = model.transcribe(audio, **options)
+        seconds = time.perf_counter() - started
+        files.append({
+            'file': name,
+            'audio_seconds': round(len(audio) / SAMPLE_RATE, 2),
+            'inference_seconds': round(seconds, 3),
+            'real_time_factor': round(seconds / (len(audio) / SAMPLE_RATE), 4),
+            'wer': error_rate([(reference, result['text'])]) if reference is not None else None,
+            'text': result['text'],
+        })
+    audio_seconds = sum(len(audio) for _, audio, _ in samples) / SAMPLE_RATE
+    inference_seconds = sum(f['inference_seconds'] for f in files)
+    memory_mb = model_memory_mb(model)
+    return {
+        'model': key,
+        'load_seconds': round(load_seconds, 2),
+        'memory_mb': round(memory_mb, 1) if memory_mb else None,
+        'real_time_factor': round(inference_seconds / audio_seconds, 4) if audio_seconds else None,
+        'wer': error_rate((reference, f['text']) for (_, _, reference), f in zip(samples, files)
+                          if reference is not None),
+        'files': files,
+    }
+
+
+def compare(result, baseline):
+    """How a reduced-precision result differs from the fp32 one of the same size."""
+    comparison = {
+        'agreement_wer': error_rate((b['text'], f['text']) for b, f in zip(baseline['files'], result['files'])),
+    }
+    if result['real_time_factor'] and baseline['real_time_factor']:
+        comparison['speedup'] = round(baseline['real_time_factor'] / result['real_time_factor'], 2)
+    if result['memory_mb'] and baseline['memory_mb']:
+        comparison['memory_ratio'] = round(result['memory_mb'] / baseline['memory_mb'], 3)
+    if result['wer'] is not None and baseline['wer'] is not None:
+        comparison['wer_delta'] = round(result['wer'] - baseline['wer'], 4)
+    return comparison
+
+
+def summary_line(result):
+    wer = f"{result['wer']:.3f}" if result['wer'] is not None else '-'
+    line = f"{result['model']:<14} WER {wer:<6} RTF {result['real_time_factor']:<7} memory {result['memory_mb']} MB"
+    vs = result.get('vs_fp32')
+    if vs:
+        line += f" | vs fp32: {vs.get('speedup', '-')}x speed, agreement WER {vs['agreement_wer']}"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('reference_dir', help='Directory of audio files with .txt reference transcripts')
+    parser.add_argument('--models', default='base,small', help='Comma-separated model sizes')
+    parser.add_argument('--precisions', default=','.join(PRECISIONS),
+                        help=f"Comma-separated subset of: {', '.join(PRECISIONS)}")
+    parser.add_argument('--language', help='Language of the reference set (default: detect per file)')
+    parser.add_argument('--output', help='Write results to this JSON file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    models = [m for m in args.models.split(',') if m]
+    precisions = [p for p in args.precisions.split(',') if p]
+    unknown = [p for p in precisions if p not in PRECISIONS]
+    if unknown:
+        parser.error(f"Unknown precision: {', '.join(unknown)}")
+    # Comparisons need the fp32 baseline, so run it first
+    if 'fp32' in precisions:
+        precisions = ['fp32'] + [p for p in precisions if p != 'fp32']
+
+    entries = load_reference_set(args.reference_dir)
+    if not entries:
+        parser.error(f"No audio files found in {args.reference_dir}")
+    print(f"Decoding {len(entries)} reference files...", file=sys.stderr)
+    samples = [(name, decode_file(path), reference) for name, path, reference in entries]
+    options = {'language': args.language, 'fp16': False}
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'reference_dir': os.path.abspath(args.reference_dir),
+        'files': len(samples),
+        'with_reference': sum(1 for _, _, reference in samples if reference is not None),
+        'audio_seconds': round(sum(len(audio) for _, audio, _ in samples) / SAMPLE_RATE, 1),
+        'results': [],
+    }
+    for model_size in models:
+        baseline = None
+        for precision in precisions:
+            key = model_key(model_size, precision)
+            print(f"Evaluating {key}...", file=sys.stderr)
+            result = evaluate_model(key, samples, options)
+            if precision == 'fp32':
+                baseline = result
+            elif baseline is not None:
+                result['vs_fp32'] = compare(result, baseline)
+            report['results'].append(result)
+            print(summary_line(result), file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Transcript exporters.
+Renders stored transcripts as TXT, SRT, WebVTT, DOCX or JSON. Text formats
+are generated segment by segment and streamed to the client while a copy is
+written to the export cache; later downloads of the same transcript version
+are served straight from that cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from transcript_store import TranscriptReader
+
+logger = logging.getLogger(__name__)
+
+# Bump when an exporter's output changes so stale renders are not served
+EXPORTER_VERSION = 1
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', '.txt'),
+    'srt': ('application/x-subrip; charset=utf-8', '.srt'),
+    'vtt': ('text/vtt; charset=utf-8', '.vtt'),
+    'json': ('application/json', '.json'),
+    'docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', '.docx'),
+}
+
+
+def format_timestamp(seconds, decimal_marker=','):
+    """Format seconds as ``HH:MM:SS,mmm`` (SRT) or ``HH:MM:SS.mmm`` (VTT)."""
+    milliseconds = int(round(max(seconds, 0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def iter_txt(reader):
+    yield reader.text()
+
+
+def iter_srt(reader):
+    for index, segment in enumerate(reader.segments(), start=1):
+        yield (f"{index}\n{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}\n"
+               f"{segment['text'].strip()}\n\n")
+
+
+def iter_vtt(reader):
+    yield "WEBVTT\n\n"
+    for segment in reader.segments():
+        yield (f"{format_timestamp(segment['start'], '.')} --> {format_timestamp(segment['end'], '.')}\n"
+               f"{segment['text'].strip()}\n\n")
+
+
+def iter_json(reader):
+    yield json.dumps(reader.to_dict(), ensure_ascii=False, indent=2)
+
+
+STREAMING_EXPORTERS = {
+    'txt': iter_txt,
+    'srt': iter_srt,
+    'vtt': iter_vtt,
+    'json': iter_json,
+}
+
+
+def render_docx(reader, path):
+    """Build the DOCX export at ``path``."""
+    # python-docx is only needed for this format, so import it on first use
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading('Transcript', 0)
+    doc.add_paragraph(reader.text())
+    doc.save(path)
+
+
+class ExportCache:
+    """Rendered exports keyed on the source transcript's version.
+
+    The cache file name combines a hash of the transcript's name with a hash
+    of its size, mtime and the exporter version, so rewriting a transcript
+    invalidates its renders. Older renders of the same transcript are removed
+    when a new version is written.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.hits = 0
+        self.renders = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _prefix(self, transcript_path):
+        return hashlib.sha1(os.path.basename(transcript_path).encode('utf-8')).hexdigest()[:16]
+
+    def cache_path(self, transcript_path, export_format, version=None):
+        """Where the render of the transcript's current version is stored.
+
+        ``version`` is the transcript's ``(size, mtime_ns)`` when the caller
+        already knows it, saving a stat.
+        """
+        if version is None:
+            stat = os.stat(transcript_path)
+            version = (stat.st_size, stat.st_mtime_ns)
+        size, mtime_ns = version
+        version = hashlib.sha1(
+            f"{size}:{mtime_ns}:{EXPORTER_VERSION}".encode('utf-8')
+        ).hexdigest()[:16]
+        extension = EXPORT_FORMATS[export_format][1]
+        return os.path.join(self.folder, f"{self._prefix(transcript_path)}_{version}{extension}")
+
+    def cached(self, transcript_path, export_format, version=None):
+        """Return the cached render path if it is up to date, else None."""
+        path = self.cache_path(transcript_path, export_format, version)
+        if os.path.exists(path):
+            with self._lock:
+                self.hits += 1
+            return path
+        return None
+
+    def _publish(self, tmp_path, path):
+        """Move a finished render into place and drop older versions."""
+        os.replace(tmp_path, path)
+        prefix = os.path.basename(path).split('_', 1)[0] + '_'
+        extension = os.path.splitext(path)[1]
+        for name in os.listdir(self.folder):
+            if name.startswith(prefix) and name.endswith(extension) and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self.renders += 1
+
+    def stream(self, transcript_path, export_format, version=None):
+        """Yield the export piece by piece, caching it once fully sent."""
+        path = self.cache_path(transcript_path, export_format, version)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        reader = TranscriptReader(transcript_path)
+        completed = False
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for piece in STREAMING_EXPORTERS[export_format](reader):
+                    f.write(piece)
+                    yield piece
+            self._publish(tmp_path, path)
+            completed = True
+        finally:
+            # Client disconnected or rendering failed part way through
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def render_file(self, transcript_path, export_format, version=None):
+        """Render a non-streamable export (DOCX) into the cache and return its path."""
+        path = self.cache_path(transcript_path, export_format, version)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            render_docx(TranscriptReader(transcript_path), tmp_path)
+            self._publish(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def remove(self, transcript_path):
+        """Drop every render of a transcript; returns ``(files, bytes)`` removed."""
+        prefix = self._prefix(transcript_path) + '_'
+        return self._remove_entries(entry for entry in self._entries() if entry[1].startswith(prefix))
+
+    def remove_orphans(self, transcript_filenames):
+        """Drop renders of transcripts not in ``transcript_filenames``; returns ``(files, bytes)`` removed."""
+        prefixes = {self._prefix(filename) for filename in transcript_filenames}
+        return self._remove_entries(entry for entry in self._entries()
+                                    if entry[1].split('_', 1)[0] not in prefixes)
+
+    def prune(self, max_age_seconds=None, max_bytes=None, free_bytes=0):
+        """Drop renders older than ``max_age_seconds``, then the oldest beyond ``max_bytes``,
+        then more of the oldest until ``free_bytes`` have been freed.
+
+        Returns ``(files, bytes)`` removed. Renders are cheap to recreate, so
+        these go first when disk space runs short.
+        """
+        entries = sorted(self._entries())
+        expired = []
+        if max_age_seconds is not None:
+            cutoff = time.time() - max_age_seconds
+            while entries and entries[0][0] < cutoff:
+                expired.append(entries.pop(0))
+        files, freed = self._remove_entries(expired)
+        total = sum(size for _, _, size in entries)
+        excess = max(total - max_bytes if max_bytes is not None else 0, free_bytes - freed)
+        oldest = []
+        for entry in entries:
+            if excess <= 0:
+                break
+            oldest.append(entry)
+            excess -= entry[2]
+        more_files, more_freed = self._remove_entries(oldest)
+        return files + more_files, freed + more_freed
+
+    def _entries(self):
+        """``(mtime, name, size)`` of every finished render."""
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        return entries
+
+    def _remove_entries(self, entries):
+        files = freed = 0
+        for _, name, size in entries:
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            files += 1
+            freed += size
+        return files, freed
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'renders': self.renders}
@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master process, which loads the models in
+PRELOAD_MODELS before forking the worker processes, so every worker shares
+the same model weights copy-on-write instead of loading its own copy. The
+port is only opened once they are loaded. Job
+state lives in an SQLite file so that any worker can report on, stream or
+cancel a job running in another.
+
+Settings can be overridden with environment variables: WEB_CONCURRENCY
+(worker processes), GUNICORN_THREADS (request threads per worker), BIND and
+JOB_STORE_PATH.
+"""
+
+import os
+import sys
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads keep SSE streams and slow uploads from tying up a whole process
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Import the app (and load models) in the master so the workers share them
+preload_app = True
+timeout = 120
+graceful_timeout = 60
+
+# Must be set before the app module is imported by preload_app
+os.environ.setdefault('JOB_STORE_PATH', os.path.join('cache', 'jobs.sqlite3'))
+
+
+def on_starting(server):
+    """Warm the preloaded app up in the master, before the listening socket is bound.
+
+    Until the models are loaded the port refuses connections, so probes
+    fail fast instead of hanging on a socket nothing answers yet.
+    """
+    flask_app = server.app.wsgi()
+    module = sys.modules.get(flask_app.import_name)
+    prepare = getattr(module, 'prepare_for_fork', None)
+    if prepare is not None:
+        server.log.info("Loading models before forking workers")
+        prepare()
@@ -0,0 +1,315 @@
+"""
+Streaming audio ingestion.
+Uploaded audio is piped into ffmpeg while the request body is still arriving,
+producing 16 kHz mono PCM without first landing the whole file in uploads/.
+Containers ffmpeg cannot decode from a pipe are spooled to a unique per-upload
+file instead. Remote streams are decoded progressively into an AudioBuffer
+that consumers can start reading before the download completes.
+"""
+
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+import uuid
+
+import numpy as np
+from flask import Request, current_app
+from werkzeug.utils import secure_filename
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Formats whose index may sit at the end of the file (MP4/M4A moov atom) or
+# that ffmpeg cannot reliably probe from a non-seekable pipe
+SPOOLED_EXTENSIONS = {'mp4', 'm4a', 'wma'}
+
+
+def decode_file(path, cancel_token=None, sample_rate=SAMPLE_RATE):
+    """Decode an audio file to mono float32 PCM, killing ffmpeg on cancellation."""
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+        '-i', path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+        'pipe:1',
+    ]
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise Exception("FFmpeg is required to decode audio but was not found. Please install FFmpeg and make sure it is on your PATH.")
+    unregister = cancel_token.on_cancel(process.kill) if cancel_token is not None else None
+    try:
+        out, err = process.communicate()
+    finally:
+        if unregister is not None:
+            unregister()
+    if cancel_token is not None:
+        cancel_token.check()
+    if process.returncode != 0:
+        raise Exception(f"Failed to decode audio: {err.decode(errors='replace').strip()}")
+    return np.frombuffer(out, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class AudioBuffer:
+    """16 kHz mono PCM that grows while a decoder is still running.
+
+    Readers call ``wait_for()`` to block until enough samples have arrived
+    (or decoding ended) and ``slice()`` to read them as float32.
+    ``expected_seconds`` is the total length when known up front.
+    """
+
+    def __init__(self, expected_seconds=None):
+        self.expected_seconds = expected_seconds
+        self.finished = False
+        self.error = None
+        self._data = bytearray()
+        self._changed = threading.Condition()
+
+    @property
+    def samples(self):
+        with self._changed:
+            return len(self._data) // 2
+
+    @property
+    def seconds(self):
+        return self.samples / SAMPLE_RATE
+
+    def append(self, chunk):
+        with self._changed:
+            self._data += chunk
+            self._changed.notify_all()
+
+    def finish(self, error=None):
+        with self._changed:
+            self.finished = True
+            self.error = error
+            self._changed.notify_all()
+
+    def wait_for(self, samples, timeout=None):
+        """Wait until ``samples`` are available or decoding ends; returns the count available."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.finished or len(self._data) // 2 >= samples, timeout)
+            if self.error is not None:
+                raise self.error
+            return len(self._data) // 2
+
+    def slice(self, start, end):
+        """Samples ``start:end`` as float32 in [-1, 1]."""
+        with self._changed:
+            pcm = np.frombuffer(bytes(self._data[start * 2:end * 2]), dtype=np.int16)
+        return pcm.astype(np.float32) / 32768.0
+
+    def to_array(self):
+        """Wait for decoding to finish and return all samples."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.finished)
+        return self.slice(0, self.wait_for(0))
+
+
+def stream_decode(source, buffer, headers=None, cancel_token=None, on_chunk=None,
+                  sample_rate=SAMPLE_RATE):
+    """Decode ``source`` (a path or URL ffmpeg can open) into ``buffer`` as it arrives.
+
+    ``on_chunk(buffer)`` is called after every block of samples. The buffer
+    is always finished on return, carrying the error if decoding failed.
+    """
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0']
+    if headers:
+        cmd += ['-headers', ''.join(f"{key}: {value}\r\n" for key, value in headers.items())]
+    cmd += ['-i', source, '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), 'pipe:1']
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        error = Exception("FFmpeg is required to decode audio but was not found. Please install FFmpeg and make sure it is on your PATH.")
+        buffer.finish(error)
+        raise error
+    unregister = cancel_token.on_cancel(process.kill) if cancel_token is not None else None
+    stderr = []
+    stderr_reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    try:
+        for chunk in iter(lambda: process.stdout.read(1 << 16), b''):
+            buffer.append(chunk)
+            if on_chunk is not None:
+                on_chunk(buffer)
+        process.wait()
+        stderr_reader.join()
+        if cancel_token is not None:
+            cancel_token.check()
+        if process.returncode != 0:
+            raise Exception(f"Failed to decode audio: {b''.join(stderr).decode(errors='replace').strip()}")
+        buffer.finish()
+    except Exception as e:
+        if process.poll() is None:
+            process.kill()
+        buffer.finish(e)
+        raise
+    finally:
+        if unregister is not None:
+            unregister()
+
+
+class PCMStreamDecoder:
+    """Feed encoded audio to an ffmpeg process and collect 16 kHz mono PCM.
+
+    With ``on_pcm`` the s16le output is passed to ``on_pcm(data)`` as soon
+    as ffmpeg produces it instead of being collected for ``finish()``.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, on_pcm=None):
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+            '-i', 'pipe:0',
+            '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+            'pipe:1',
+        ]
+        try:
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise Exception("FFmpeg is required to decode uploads but was not found. Please install FFmpeg and make sure it is on your PATH.")
+        self.bytes_in = 0
+        self.on_pcm = on_pcm
+        self._chunks = []
+        self._stderr = b''
+        # Drain both output pipes concurrently so ffmpeg never blocks on a full pipe
+        self._stdout_reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stdout_reader.start()
+        self._stderr_reader.start()
+
+    def _read_stdout(self):
+        read = self.process.stdout.read1 if self.on_pcm is not None else self.process.stdout.read
+        for chunk in iter(lambda: read(1 << 16), b''):
+            if self.on_pcm is not None:
+                self.on_pcm(chunk)
+            else:
+                self._chunks.append(chunk)
+
+    def _read_stderr(self):
+        self._stderr = self.process.stderr.read()
+
+    def write(self, data):
+        try:
+            self.process.stdin.write(data)
+            if self.on_pcm is not None:
+                # Live input arrives in small packets; don't hold them back
+                self.process.stdin.flush()
+        except BrokenPipeError:
+            # ffmpeg exited early; the error surfaces in finish()
+            pass
+        self.bytes_in += len(data)
+
+    def finish(self):
+        """Close the input and return the decoded audio as float32 in [-1, 1]."""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._stdout_reader.join()
+        self._stderr_reader.join()
+        if self.process.wait() != 0:
+            raise Exception(f"Failed to decode audio: {self._stderr.decode(errors='replace').strip()}")
+        pcm = np.frombuffer(b''.join(self._chunks), dtype=np.int16)
+        self._chunks = []
+        return pcm.astype(np.float32) / 32768.0
+
+    def abort(self):
+        """Kill ffmpeg, e.g. when the upload is rejected part way through."""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class UploadSink:
+    """File-like target for a multipart upload part.
+
+    Werkzeug writes the part into this object as it parses the request body.
+    Bytes go straight into a ``PCMStreamDecoder`` when the format can be
+    decoded from a pipe, otherwise into a uniquely named spool file. Either
+    way the hash of the uploaded bytes is kept as ``content_id``.
+    """
+
+    def __init__(self, filename, spool_folder):
+        self.filename = filename
+        self.extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        self.spool_path = None
+        self.decoder = None
+        self.finished = False
+        self.bytes_in = 0
+        self.content_id = None
+        self._spool = None
+        self._digest = hashlib.sha256()
+        if self.extension in SPOOLED_EXTENSIONS:
+            self.spool_path = os.path.join(spool_folder, f"{uuid.uuid4().hex}_{secure_filename(filename)}")
+            self._spool = open(self.spool_path, 'wb')
+        else:
+            self.decoder = PCMStreamDecoder()
+
+    def write(self, data):
+        self.bytes_in += len(data)
+        self._digest.update(data)
+        if self.decoder is not None:
+            self.decoder.write(data)
+        else:
+            self._spool.write(data)
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        # Werkzeug rewinds the container once the part is complete; the data
+        # has already been consumed, so there is nothing to rewind
+        return 0
+
+    def tell(self):
+        return 0
+
+    def read(self, size=-1):
+        return b''
+
+    def finish(self):
+        """Complete ingestion.
+
+        Returns the decoded PCM array for piped uploads, or the spool file
+        path for uploads that must be decoded from disk.
+        """
+        self.finished = True
+        self.content_id = 'upload:' + self._digest.hexdigest()
+        if self.decoder is not None:
+            return self.decoder.finish()
+        self._spool.close()
+        return self.spool_path
+
+    def close(self):
+        """Release resources if the upload was never finished.
+
+        Werkzeug closes every file part when the request ends, so this must
+        leave a finished upload's spool file alone for the job to consume.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if self.decoder is not None:
+            self.decoder.abort()
+        elif self._spool is not None:
+            self._spool.close()
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+
+
+class StreamingUploadRequest(Request):
+    """Request class that streams file parts of upload endpoints into ffmpeg."""
+
+    streaming_endpoints = {'transcribe_file'}
+    # Extensions worth starting a decoder for; anything else is buffered as
+    # usual and left for the view to reject
+    allowed_extensions = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+        if (self.endpoint in self.streaming_endpoints and filename
+                and (self.allowed_extensions is None or extension in self.allowed_extensions)):
+            return UploadSink(filename, current_app.config['UPLOAD_FOLDER'])
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
@@ -0,0 +1,309 @@
+"""
+Shared job state.
+When the service runs as several worker processes, a job executes in the
+process that accepted it, but its status, progress events and cancellation
+requests are kept in SQLite so that any process can answer for it. Each
+process's metric values are kept there too, so a scrape of any process
+reports the totals of all of them.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT,
+    model_size TEXT,
+    status TEXT NOT NULL,
+    pid INTEGER,
+    created_at TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS metric_values (
+    process TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (process, name, labels)
+);
+"""
+
+# Process holding the totals of worker processes that have exited
+RETIRED_PROCESS = 'retired'
+
+
+def combine_metric(kind, a, b):
+    """Sum two values of a counter or histogram (``[bucket_counts, sum]``)."""
+    if a is None:
+        return b
+    if kind == 'histogram':
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+    return a + b
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class StoredJob:
+    """A job owned by another worker process, read back from the store.
+
+    Offers the parts of the ``Job`` interface the status, events and cancel
+    endpoints use.
+    """
+
+    def __init__(self, store, row):
+        self.store = store
+        self.id = row['id']
+        self.kind = row['kind']
+        self.model_size = row['model_size']
+        self.status = row['status']
+        self.pid = row['pid']
+        self.created_at = row['created_at']
+        self.started_at = row['started_at']
+        self.finished_at = row['finished_at']
+        self.result = json.loads(row['result']) if row['result'] else None
+        self.error = row['error']
+        if not self.finished and not _process_alive(self.pid):
+            # The owning worker died (or was recycled) with the job unfinished
+            self.status = 'failed'
+            self.error = 'The worker process running this job exited.'
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def events_since(self, index, timeout=None):
+        """Return events from ``index`` onwards, polling up to ``timeout`` for new ones."""
+        deadline = time.monotonic() + (timeout or 0)
+        job = self
+        while True:
+            events = self.store.events(self.id, index)
+            if events or job.finished or time.monotonic() >= deadline:
+                break
+            time.sleep(self.store.poll_seconds)
+            job = self.store.get(self.id) or job
+        if job is not self:
+            self.status, self.finished_at = job.status, job.finished_at
+            self.result, self.error = job.result, job.error
+        done = job.finished and index + len(events) >= self.store.event_count(self.id)
+        return events, done
+
+    def to_dict(self):
+        """Serialise the job for the status endpoint."""
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'model_size': self.model_size,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == 'completed':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobStore:
+    """Job snapshots and event logs in an SQLite file shared by worker processes."""
+
+    def __init__(self, path, poll_seconds=0.5):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one operation, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Job state is transient; losing the last writes on power loss is fine
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def publish(self, job, seq, event, data):
+        """Record event ``seq`` of ``job`` together with a snapshot of its state."""
+        result = json.dumps(job.result, ensure_ascii=False) if job.result is not None else None
+        with self._connect() as conn:
+            # Finished states are terminal, so a late write from another
+            # thread of the owning process cannot roll the status back
+            conn.execute(
+                """INSERT INTO jobs (id, kind, model_size, status, pid, created_at, started_at,
+                                     finished_at, result, error)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (id) DO UPDATE SET
+                       status = excluded.status, started_at = excluded.started_at,
+                       finished_at = excluded.finished_at, result = excluded.result,
+                       error = excluded.error
+                   WHERE jobs.status NOT IN ('completed', 'failed', 'cancelled')""",
+                (job.id, job.kind, job.model_size, job.status, os.getpid(), job.created_at,
+                 job.started_at, job.finished_at, result, job.error),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)",
+                (job.id, seq, event, json.dumps(data, ensure_ascii=False)),
+            )
+
+    def get(self, job_id):
+        """Return the StoredJob for ``job_id``, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return StoredJob(self, row) if row is not None else None
+
+    def events(self, job_id, start=0):
+        """Events of ``job_id`` from ``start``, stopping at the first not yet written."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq",
+                (job_id, start),
+            ).fetchall()
+        events = []
+        for expected, row in enumerate(rows, start):
+            if row['seq'] != expected:
+                break
+            events.append({'event': row['event'], 'data': json.loads(row['data'])})
+        return events
+
+    def event_count(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM job_events WHERE job_id = ?",
+                               (job_id,)).fetchone()
+        return row[0]
+
+    def request_cancel(self, job_id):
+        """Flag ``job_id`` for cancellation by its owning process."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+
+    def cancel_requests(self, job_ids):
+        """Those of ``job_ids`` another process has asked to cancel."""
+        if not job_ids:
+            return []
+        job_ids = list(job_ids)
+        placeholders = ','.join('?' * len(job_ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({placeholders})",
+                job_ids,
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def counts(self):
+        """Queued and running jobs across all worker processes."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, pid FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+        counts = {'queued': 0, 'running': 0}
+        alive = {}
+        for row in rows:
+            if row['pid'] not in alive:
+                alive[row['pid']] = _process_alive(row['pid'])
+            if alive[row['pid']]:
+                counts[row['status']] += 1
+        return counts
+
+    def publish_metrics(self, process, rows):
+        """Replace the metric values of ``process``; ``rows`` are ``(name, kind, labels, value)``."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM metric_values WHERE process = ?", (process,))
+            conn.executemany(
+                "INSERT INTO metric_values (process, pid, name, kind, labels, value) VALUES (?, ?, ?, ?, ?, ?)",
+                [(process, os.getpid(), name, kind, json.dumps(labels), json.dumps(value))
+                 for name, kind, labels, value in rows],
+            )
+
+    def metric_values(self):
+        """``(process, name, kind, labels, value)`` of every live process, and the retired totals.
+
+        Counters and histograms of processes that have exited are first
+        folded into the retired totals, so totals never go backwards when a
+        worker is replaced; their gauges are dropped.
+        """
+        with self._connect() as conn:
+            # Take the write lock before reading, so two processes can't fold the same values
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT * FROM metric_values").fetchall()
+            dead = {row['process'] for row in rows
+                    if row['process'] != RETIRED_PROCESS and not _process_alive(row['pid'])}
+            if dead:
+                retired = {}
+                for row in rows:
+                    if row['kind'] != 'gauge' and (row['process'] == RETIRED_PROCESS or row['process'] in dead):
+                        key = (row['name'], row['kind'], row['labels'])
+                        retired[key] = combine_metric(row['kind'], retired.get(key), json.loads(row['value']))
+                stale = list(dead) + [RETIRED_PROCESS]
+                conn.execute(f"DELETE FROM metric_values WHERE process IN ({','.join('?' * len(stale))})", stale)
+                conn.executemany(
+                    "INSERT INTO metric_values (process, pid, name, kind, labels, value) VALUES (?, 0, ?, ?, ?, ?)",
+                    [(RETIRED_PROCESS, name, kind, labels, json.dumps(value))
+                     for (name, kind, labels), value in retired.items()],
+                )
+                rows = conn.execute("SELECT * FROM metric_values").fetchall()
+        return [(row['process'], row['name'], row['kind'], tuple(json.loads(row['labels'])), json.loads(row['value']))
+                for row in rows]
+
+    def prune(self, max_finished_jobs):
+        """Fail jobs orphaned by dead processes and forget the oldest finished ones.
+
+        At most ``max_finished_jobs`` finished jobs are kept.
+        """
+        with self._connect() as conn:
+            orphaned = [row['id'] for row in conn.execute(
+                "SELECT id, pid FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall() if not _process_alive(row['pid'])]
+            for job_id in orphaned:
+                conn.execute(
+                    """UPDATE jobs SET status = 'failed', finished_at = ?,
+                                       error = 'The worker process running this job exited.'
+                       WHERE id = ?""",
+                    (datetime.now().isoformat(), job_id),
+                )
+            old = [row['id'] for row in conn.execute(
+                """SELECT id FROM jobs WHERE status IN ('completed', 'failed', 'cancelled')
+                   ORDER BY finished_at DESC LIMIT -1 OFFSET ?""",
+                (max_finished_jobs,),
+            ).fetchall()]
+            for job_id in old:
+                conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
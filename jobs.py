@@ -0,0 +1,430 @@
+"""
+Background transcription jobs.
+Routes enqueue work here and return a job ID immediately; a bounded pool of
+worker threads drains the queue while honouring per-model concurrency limits.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, depth):
+        super().__init__(f"Transcription queue is full ({depth} jobs waiting)")
+        self.depth = depth
+
+
+class TranscriptionCancelled(Exception):
+    """Raised inside a job once its cancel token has been triggered."""
+
+    def __init__(self, message="Transcription cancelled by user."):
+        super().__init__(message)
+
+
+class CancelToken:
+    """Per-job cancellation flag.
+
+    Long-running steps poll ``check()`` between units of work, and steps that
+    block on a subprocess register a callback with ``on_cancel()`` (e.g.
+    ``process.kill``) so cancelling frees the CPU straight away.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancel callback failed: {e}")
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise TranscriptionCancelled if the job has been cancelled."""
+        if self._event.is_set():
+            raise TranscriptionCancelled()
+
+    def on_cancel(self, callback):
+        """Run ``callback`` on cancellation; returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def unregister():
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+                return unregister
+        callback()
+        return lambda: None
+
+
+class Job:
+    """A single unit of transcription work and its outcome.
+
+    ``ready`` is an optional ``threading.Event`` the job waits on before a
+    worker picks it up, e.g. until enough of a download has arrived. Events
+    are also published to ``store`` (a JobStore), when given, for other
+    worker processes to read. ``on_cancel(job)`` releases what ``func``
+    would have cleaned up, for a job cancelled before it started.
+    """
+
+    def __init__(self, func, model_size, kind=None, ready=None, store=None, on_cancel=None):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.model_size = model_size
+        self.kind = kind
+        self.ready = ready
+        self.on_cancel = on_cancel
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.error_type = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_token = CancelToken()
+        self.store = store
+        self._events = []
+        self._events_changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def emit(self, event, **data):
+        """Record a progress event for clients following the job."""
+        with self._events_changed:
+            seq = len(self._events)
+            self._events.append({'event': event, 'data': data})
+            self._events_changed.notify_all()
+        self._publish(seq, event, data)
+
+    def finish(self, status, event, **data):
+        """Mark the job finished and publish its final event atomically."""
+        with self._events_changed:
+            self.finished_at = datetime.now().isoformat()
+            self.status = status
+            seq = len(self._events)
+            self._events.append({'event': event, 'data': data})
+            self._events_changed.notify_all()
+        self._publish(seq, event, data)
+
+    def _publish(self, seq, event, data):
+        if self.store is None:
+            return
+        try:
+            self.store.publish(self, seq, event, data)
+        except Exception as e:
+            logger.warning(f"Could not publish event {seq} of job {self.id}: {e}")
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns True if it did within ``timeout``."""
+        with self._events_changed:
+            return self._events_changed.wait_for(lambda: self.finished, timeout)
+
+    def events_since(self, index, timeout=None):
+        """Return events from ``index`` onwards, waiting up to ``timeout`` for new ones.
+
+        The second value is True once the job has finished and every event
+        has been returned.
+        """
+        with self._events_changed:
+            if index >= len(self._events) and not self.finished:
+                self._events_changed.wait(timeout)
+            events = self._events[index:]
+            return events, self.finished and index + len(events) >= len(self._events)
+
+    def to_dict(self):
+        """Serialise the job for the status endpoint."""
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'model_size': self.model_size,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == 'completed':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded FIFO of jobs drained by a fixed pool of worker threads.
+
+    ``model_concurrency`` maps a model size to the maximum number of jobs for
+    that size allowed to run at once; sizes not listed are only limited by the
+    worker count. Workers skip over queued jobs whose model is saturated, so a
+    burst of ``large`` requests cannot block ``tiny`` ones behind it. Jobs
+    whose ``ready`` event is not yet set are skipped the same way; call
+    ``wake()`` when it is set. ``on_finish(job)`` is called after every job
+    finishes, whatever its outcome, including jobs cancelled while queued.
+
+    With a shared ``store`` (a JobStore), jobs still run in the process that
+    submitted them, but ``get()`` and ``cancel()`` also reach jobs owned by
+    other worker processes.
+    """
+
+    def __init__(self, workers=2, max_queue_size=50, model_concurrency=None,
+                 max_finished_jobs=1000, on_finish=None, store=None):
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.model_concurrency = dict(model_concurrency or {})
+        self.max_finished_jobs = max_finished_jobs
+        self.on_finish = on_finish
+        self.store = store
+        self._pending = deque()
+        self._jobs = OrderedDict()
+        self._running = {}
+        # Model sizes of callers waiting in slot(), by count
+        self._slot_waiters = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        """Start the worker threads if they are not already running."""
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"transcriber-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.store is not None:
+                thread = threading.Thread(target=self._watch_store, name="job-store-watcher", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.workers} transcription workers")
+
+    def shutdown(self, wait=True):
+        """Stop accepting work and let the workers exit once idle."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def submit(self, func, model_size, kind=None, ready=None, on_cancel=None):
+        """Queue ``func(job)`` for execution and return the new job.
+
+        The job is not started before ``ready`` (an Event) is set. If it is
+        cancelled before starting, ``on_cancel(job)`` runs instead of
+        ``func``, e.g. to remove its input. Raises QueueFullError when
+        ``max_queue_size`` jobs are already waiting.
+        """
+        self.start()
+        job = Job(func, model_size, kind=kind, ready=ready, store=self.store, on_cancel=on_cancel)
+        with self._condition:
+            if len(self._pending) >= self.max_queue_size:
+                raise QueueFullError(len(self._pending))
+            # Only an accepted job is published, and before a worker can pick it up and report 'running'
+            job.emit('status', status='queued')
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            self._prune_finished()
+            self._condition.notify()
+        logger.info(f"Queued {kind or 'transcription'} job {job.id} (model: {model_size})")
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job, or None if unknown.
+
+        A queued job is removed from the queue at once. A running job has its
+        cancel token triggered and stops at its next checkpoint.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                if self.store is None:
+                    return None
+                # Owned by another worker process, which picks the request up
+                self.store.request_cancel(job_id)
+                return self.store.get(job_id)
+            was_queued = job in self._pending
+            if was_queued:
+                self._pending.remove(job)
+        if not job.finished:
+            job.cancel_token.cancel()
+            if was_queued:
+                job.finish('cancelled', 'cancelled')
+                # func never runs, so nothing else releases the job's input
+                job.func = None
+                self._call(job.on_cancel, job, 'Job cancel callback')
+                self._call(self.on_finish, job, 'Job finish callback')
+            logger.info(f"Cancelled job {job.id}")
+        return job
+
+    def wake(self):
+        """Re-check queued jobs, e.g. after a job's ``ready`` event was set."""
+        with self._condition:
+            self._condition.notify_all()
+
+    def get(self, job_id):
+        """Return the job with the given ID, or None."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            return self.store.get(job_id)
+        return job
+
+    def depth(self):
+        """Number of jobs waiting to start."""
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self, all_processes=True):
+        """Snapshot of queue occupancy, plus totals across processes read from a shared store
+        unless ``all_processes`` is False."""
+        with self._condition:
+            stats = {
+                'queued': len(self._pending),
+                'running': sum(self._running.values()),
+                'workers': self.workers,
+                'max_queue_size': self.max_queue_size,
+            }
+        if self.store is not None and all_processes:
+            try:
+                stats['all_processes'] = self.store.counts()
+            except Exception as e:
+                logger.warning(f"Could not read shared job counts: {e}")
+        return stats
+
+    @contextmanager
+    def slot(self, model_size):
+        """Hold a running slot for ``model_size`` while doing work outside a job.
+
+        For short inference run on a caller's own thread, such as a live
+        transcription pass, so it counts against the worker count and
+        ``model_concurrency`` like a job. Waiting callers go ahead of queued
+        jobs.
+        """
+        with self._condition:
+            self._slot_waiters[model_size] = self._slot_waiters.get(model_size, 0) + 1
+            try:
+                self._condition.wait_for(lambda: self._stopping or self._has_capacity(model_size))
+            finally:
+                self._slot_waiters[model_size] -= 1
+                if not self._slot_waiters[model_size]:
+                    del self._slot_waiters[model_size]
+                # Queued jobs held back for this caller may run now
+                self._condition.notify_all()
+            self._running[model_size] = self._running.get(model_size, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running[model_size] -= 1
+                self._condition.notify_all()
+
+    def _has_model_capacity(self, model_size):
+        limit = self.model_concurrency.get(model_size)
+        return limit is None or self._running.get(model_size, 0) < limit
+
+    def _has_capacity(self, model_size):
+        return sum(self._running.values()) < self.workers and self._has_model_capacity(model_size)
+
+    def _next_runnable(self):
+        """Pop the oldest ready pending job whose model has spare capacity."""
+        if any(self._has_model_capacity(size) for size in self._slot_waiters):
+            # A slot() caller only waits for a free worker; let it have the next one
+            return None
+        for job in self._pending:
+            if (job.ready is None or job.ready.is_set()) and self._has_capacity(job.model_size):
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _prune_finished(self):
+        """Forget the oldest finished jobs beyond ``max_finished_jobs``."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _watch_store(self):
+        """Apply cancellations requested through other processes and prune the store."""
+        last_pruned = 0
+        while not self._stopping:
+            time.sleep(self.store.poll_seconds)
+            with self._condition:
+                unfinished = [job_id for job_id, job in self._jobs.items() if not job.finished]
+            try:
+                for job_id in self.store.cancel_requests(unfinished):
+                    self.cancel(job_id)
+                if time.monotonic() - last_pruned >= 60:
+                    self.store.prune(self.max_finished_jobs)
+                    last_pruned = time.monotonic()
+            except Exception as e:
+                logger.warning(f"Job store watcher failed: {e}")
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = None
+                while not self._stopping:
+                    job = self._next_runnable()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+                if job is None:
+                    return
+                self._running[job.model_size] = self._running.get(job.model_size, 0) + 1
+                job.status = 'running'
+                job.started_at = datetime.now().isoformat()
+            job.emit('status', status='running')
+
+            try:
+                result = job.func(job)
+                job.result = result
+                job.finish('completed', 'completed', **result)
+            except TranscriptionCancelled:
+                logger.info(f"Job {job.id} stopped after cancellation")
+                job.finish('cancelled', 'cancelled')
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.error_type = type(e).__name__
+                job.finish('failed', 'failed', error=str(e))
+            finally:
+                # Finished jobs are kept for status queries; don't keep their input alive with them
+                job.func = None
+                with self._condition:
+                    self._running[job.model_size] -= 1
+                    # A model slot was freed, so a skipped job may now be runnable
+                    self._condition.notify_all()
+            self._call(self.on_finish, job, 'Job finish callback')
+
+    @staticmethod
+    def _call(callback, job, description):
+        if callback is None:
+            return
+        try:
+            callback(job)
+        except Exception as e:
+            logger.warning(f"{description} failed: {e}")
@@ -0,0 +1,219 @@
+"""
+Live transcription.
+Audio arriving while it is being recorded is kept in a rolling buffer that
+is re-transcribed every time enough new audio has come in. Words that two
+consecutive passes agree on are committed and never change again (the
+local agreement policy); the rest of the latest pass is reported as
+tentative text. Audio behind the last committed word is trimmed from the
+front of the buffer, so each pass only re-decodes the unstable tail.
+"""
+
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+from chunking import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Word texts compare equal across passes regardless of case and punctuation
+_NORMALIZE = re.compile(r"[^\w']+")
+
+
+def _normalize(word):
+    return _NORMALIZE.sub('', word['word']).lower()
+
+
+def _text(words):
+    return ''.join(word['word'] for word in words)
+
+
+class LiveTranscriber:
+    """Incremental transcription of a growing 16 kHz mono stream.
+
+    ``feed()`` appends s16le PCM from any thread; ``process()`` runs one
+    pass over the buffer and returns the update to send, and ``finish()``
+    runs the last one once the stream has ended, committing everything.
+
+    A pass runs once ``step_seconds`` of new audio have arrived. The buffer
+    is trimmed back to the last committed word once it is longer than
+    ``buffer_seconds``; if it still reaches ``max_buffer_seconds`` because
+    passes keep disagreeing, the words of the latest pass are committed
+    regardless, which bounds both the decode cost of a pass and how long a
+    word can stay tentative.
+    """
+
+    def __init__(self, model, step_seconds=1.0, buffer_seconds=15, max_buffer_seconds=25, language=None,
+                 **options):
+        self.model = model
+        self.step_seconds = step_seconds
+        self.buffer_seconds = buffer_seconds
+        self.max_buffer_seconds = max_buffer_seconds
+        self.language = language
+        self.options = options
+        self.committed = []
+        self.passes = 0
+        self.closed = False
+        # Set by the thread running the passes if one fails
+        self.error = None
+        self._tentative = []
+        self._audio = np.zeros(0, dtype=np.float32)
+        # Start of the buffer, in seconds from the start of the stream
+        self._offset = 0.0
+        self._received = 0
+        self._processed = 0
+        self._carry = b''
+        self._changed = threading.Condition()
+
+    @property
+    def received_seconds(self):
+        with self._changed:
+            return self._received / SAMPLE_RATE
+
+    def feed(self, data):
+        """Append s16le PCM bytes; a sample split across calls is kept for the next."""
+        with self._changed:
+            data = self._carry + data
+            usable = len(data) - len(data) % 2
+            self._carry = data[usable:]
+            pcm = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+            self._audio = np.concatenate([self._audio, pcm])
+            self._received += len(pcm)
+            self._changed.notify_all()
+
+    def close(self):
+        """Mark the end of the stream."""
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    def wait_for_audio(self, timeout=None):
+        """Wait until a pass is due; returns False once the stream has ended."""
+        step = int(self.step_seconds * SAMPLE_RATE)
+        with self._changed:
+            self._changed.wait_for(lambda: self.closed or self._received - self._processed >= step, timeout)
+            return not self.closed
+
+    def process(self, final=False):
+        """Re-transcribe the buffer and return ``{'committed', 'tentative', ...}``."""
+        with self._changed:
+            audio, offset, received = self._audio, self._offset, self._received
+        if not len(audio):
+            return None
+        started = time.monotonic()
+        result = self.model.transcribe(audio, language=self.language, initial_prompt=self._prompt(offset),
+                                       word_timestamps=True, **self.options)
+        self.language = self.language or result['language']
+        self.passes += 1
+        end = offset + len(audio) / SAMPLE_RATE
+
+        hypothesis = self._new_words(result['segments'], offset)
+        if final:
+            agreed = hypothesis
+        else:
+            agreed = []
+            for previous, word in zip(self._tentative, hypothesis):
+                if _normalize(previous) != _normalize(word):
+                    break
+                agreed.append(word)
+            if not agreed and end - offset >= self.max_buffer_seconds:
+                # Passes keep disagreeing; commit what the latest one heard
+                # well before the end of the buffer rather than wait longer
+                agreed = [word for word in hypothesis if word['end'] <= end - self.step_seconds] or hypothesis
+        self.committed.extend(agreed)
+        self._tentative = hypothesis[len(agreed):]
+        self._trim(end, bool(hypothesis))
+        with self._changed:
+            self._processed = received
+
+        return {
+            'type': 'update',
+            'committed': _text(agreed),
+            'committed_start': round(agreed[0]['start'], 2) if agreed else None,
+            'committed_end': round(agreed[-1]['end'], 2) if agreed else None,
+            'tentative': _text(self._tentative),
+            'audio_seconds': round(end, 2),
+            'lag_seconds': round(self.received_seconds - end, 2),
+            'decode_seconds': round(time.monotonic() - started, 3),
+        }
+
+    def finish(self):
+        """Run the last pass after ``close()``, committing all the words it returns."""
+        update = self.process(final=True)
+        self._tentative = []
+        return update
+
+    def _prompt(self, offset):
+        """Committed text from before the buffer, as context for the next pass."""
+        text = _text(word for word in self.committed if word['end'] <= offset)
+        return text[-200:] or None
+
+    def _new_words(self, segments, offset):
+        """Words of a pass on the stream timeline, minus those already committed."""
+        words = [dict(word, start=word['start'] + offset, end=word['end'] + offset)
+                 for segment in segments for word in segment.get('words') or []]
+        if not self.committed:
+            return words
+        last = self.committed[-1]['end']
+        words = [word for word in words if (word['start'] + word['end']) / 2 > last]
+        # Word timings drift between passes; drop a repeat of the committed tail
+        for n in range(min(5, len(self.committed), len(words)), 0, -1):
+            if [_normalize(w) for w in self.committed[-n:]] == [_normalize(w) for w in words[:n]]:
+                return words[n:]
+        return words
+
+    def _trim(self, end, heard_speech):
+        """Drop audio from the front of the buffer once it is long enough."""
+        if end - self._offset <= self.buffer_seconds:
+            return
+        if self.committed and self.committed[-1]['end'] > self._offset:
+            cut = self.committed[-1]['end']
+        elif not heard_speech and end - self._offset >= self.max_buffer_seconds:
+            # Nothing but silence; keep only enough to catch the next word's onset
+            cut = end - self.step_seconds
+        else:
+            return
+        with self._changed:
+            drop = min(int((cut - self._offset) * SAMPLE_RATE), len(self._audio))
+            self._audio = self._audio[drop:]
+            self._offset += drop / SAMPLE_RATE
+
+    def result(self, pause_seconds=1.0, max_segment_seconds=15):
+        """The committed words as a dict shaped like ``whisper.transcribe()`` output.
+
+        Segments end after a sentence, at a pause of ``pause_seconds`` or
+        once ``max_segment_seconds`` long.
+        """
+        groups = []
+        current = []
+        for word in self.committed:
+            if current and (word['start'] - current[-1]['end'] >= pause_seconds
+                            or word['end'] - current[0]['start'] > max_segment_seconds):
+                groups.append(current)
+                current = []
+            current.append(word)
+            if word['word'].rstrip().endswith(('.', '?', '!')):
+                groups.append(current)
+                current = []
+        if current:
+            groups.append(current)
+
+        segments = []
+        for words in groups:
+            segments.append({
+                'id': len(segments),
+                'seek': int(words[0]['start'] * 100),
+                'start': round(words[0]['start'], 3),
+                'end': round(words[-1]['end'], 3),
+                'text': _text(words),
+                'words': [{'word': word['word'], 'start': round(word['start'], 3), 'end': round(word['end'], 3),
+                           'probability': round(word.get('probability', 0.0), 3)} for word in words],
+            })
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': self.language,
+        }
@@ -0,0 +1,357 @@
+"""
+Disk maintenance.
+Keeps the service's folders within their retention policies and the disk
+from filling up. A background thread periodically removes uploads left
+behind, expired exports and, when configured, transcripts past their age,
+total size or per-source quota; when free space runs low it evicts cache
+entries, cheapest to recreate first. New work is refused while free space
+stays below a floor, and leftovers of a process that died mid-job are swept
+at startup.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Transcript renders written next to the transcripts by older versions
+LEGACY_EXPORT_EXTENSIONS = ('.txt', '.srt', '.vtt', '.docx')
+
+
+class InsufficientStorageError(Exception):
+    """Raised when new work would leave less than the minimum free disk space."""
+
+    def __init__(self, free_bytes, needed_bytes):
+        super().__init__(f"Not enough free disk space ({free_bytes // 2**20} MB free, "
+                         f"{needed_bytes // 2**20} MB needed)")
+        self.free_bytes = free_bytes
+        self.needed_bytes = needed_bytes
+
+
+class Reservation:
+    """Disk space held for an upload while it is being received."""
+
+    def __init__(self, maintenance, nbytes):
+        self._maintenance = maintenance
+        self.nbytes = nbytes
+
+    def release(self):
+        if self.nbytes:
+            self._maintenance._release(self.nbytes)
+            self.nbytes = 0
+
+
+class ActivePaths:
+    """Files in use by queued or running work, which retention must leave alone."""
+
+    def __init__(self):
+        self._paths = set()
+        self._lock = threading.Lock()
+
+    def add(self, path):
+        with self._lock:
+            self._paths.add(os.path.abspath(path))
+
+    def discard(self, path):
+        with self._lock:
+            self._paths.discard(os.path.abspath(path))
+
+    def __contains__(self, path):
+        with self._lock:
+            return os.path.abspath(path) in self._paths
+
+    def __len__(self):
+        with self._lock:
+            return len(self._paths)
+
+
+class Maintenance:
+    """Retention and disk-pressure reclamation for the service's folders.
+
+    ``caches`` are ``(area, cache)`` pairs of caches with a
+    ``shrink(nbytes)`` method, in the order they should give up space.
+    ``on_transcript_removed(filename)`` is called after a transcript is
+    deleted so indexes can forget it. Limits left as None are not enforced.
+    Uploads added to ``active_uploads`` are kept whatever their age until
+    they are discarded from it.
+    """
+
+    def __init__(self, uploads_folder, transcripts_folder, export_cache, caches=(), catalog=None,
+                 on_transcript_removed=None, temp_folders=(), interval_seconds=600,
+                 min_free_bytes=1024**3, reclaim_free_bytes=2 * 1024**3, upload_max_age_seconds=24 * 3600,
+                 export_max_age_seconds=7 * 24 * 3600, export_max_bytes=None, transcript_max_age_seconds=None,
+                 transcripts_max_bytes=None, source_quotas=None, orphan_grace_seconds=300):
+        self.uploads_folder = uploads_folder
+        self.transcripts_folder = transcripts_folder
+        self.export_cache = export_cache
+        self.caches = list(caches)
+        self.catalog = catalog
+        self.on_transcript_removed = on_transcript_removed
+        self.temp_folders = [transcripts_folder, export_cache.folder] + list(temp_folders)
+        self.interval_seconds = interval_seconds
+        self.min_free_bytes = min_free_bytes
+        self.reclaim_free_bytes = reclaim_free_bytes
+        self.upload_max_age_seconds = upload_max_age_seconds
+        self.export_max_age_seconds = export_max_age_seconds
+        self.export_max_bytes = export_max_bytes
+        self.transcript_max_age_seconds = transcript_max_age_seconds
+        self.transcripts_max_bytes = transcripts_max_bytes
+        self.source_quotas = dict(source_quotas or {})
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.active_uploads = ActivePaths()
+        self.runs = 0
+        self.last_run = None
+        self.rejected = 0
+        # (area, reason) -> [files, bytes]
+        self.reclaimed = {}
+        self._reserved = 0
+        self._lock = threading.Lock()
+        # Serializes removals, so a reclaim for an upload and a scheduled run don't overlap
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the background thread if it is not already running in this process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+        logger.info(f"Disk maintenance running every {self.interval_seconds}s")
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Disk maintenance failed: {e}")
+
+    def run_once(self):
+        """Apply the retention policies, then free cache space if the disk is getting full."""
+        with self._run_lock:
+            self._sweep_temp_files()
+            self._remove_old_uploads(self.upload_max_age_seconds, 'age')
+            self._prune_exports()
+            self._apply_transcript_retention()
+            free = self.free_bytes()
+            if free < self.reclaim_free_bytes:
+                self._reclaim(self.reclaim_free_bytes - free)
+        with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+
+    def sweep_orphans(self):
+        """Remove what a process that died mid-job left behind.
+
+        Run at startup: uploads and partial writes older than
+        ``orphan_grace_seconds`` belong to no live job, and renders of
+        transcripts that no longer exist can never be served.
+        """
+        with self._run_lock:
+            self._sweep_temp_files()
+            self._remove_old_uploads(self.orphan_grace_seconds, 'orphan')
+            if self.catalog is not None:
+                filenames = [entry['filename'] for entry in self._catalog_entries()]
+                self._record('exports', 'orphan', self.export_cache.remove_orphans(filenames))
+
+    def free_bytes(self):
+        """Free space on the fullest disk holding the service's folders, less space reserved for uploads."""
+        free = min(shutil.disk_usage(folder).free for folder in (self.uploads_folder, self.transcripts_folder,
+                                                                  self.export_cache.folder))
+        with self._lock:
+            return free - self._reserved
+
+    def check(self, incoming_bytes=0):
+        """Make sure ``incoming_bytes`` can be written while keeping ``min_free_bytes`` free.
+
+        Frees cache space if needed; raises InsufficientStorageError if that
+        is not enough.
+        """
+        needed = incoming_bytes + self.min_free_bytes
+        free = self.free_bytes()
+        if free < needed:
+            with self._run_lock:
+                free = self.free_bytes()
+                if free < needed:
+                    self._reclaim(needed - free)
+                    free = self.free_bytes()
+        if free < needed:
+            with self._lock:
+                self.rejected += 1
+            raise InsufficientStorageError(max(free, 0), needed)
+
+    def reserve(self, nbytes):
+        """Check for and hold ``nbytes`` of disk space; call ``release()`` on the result once written.
+
+        Holding the space keeps concurrent uploads from each being admitted
+        against the same free space.
+        """
+        with self._lock:
+            self._reserved += nbytes
+        try:
+            self.check()
+        except InsufficientStorageError:
+            self._release(nbytes)
+            raise
+        return Reservation(self, nbytes)
+
+    def _release(self, nbytes):
+        with self._lock:
+            self._reserved -= nbytes
+
+    def _reclaim(self, nbytes):
+        """Free ``nbytes`` from the caches: renders first, then each cache in order."""
+        files, freed = self.export_cache.prune(free_bytes=nbytes)
+        self._record('exports', 'disk_pressure', (files, freed))
+        for area, cache in self.caches:
+            if freed >= nbytes:
+                break
+            removed = cache.shrink(nbytes - freed)
+            self._record(area, 'disk_pressure', removed)
+            freed += removed[1]
+        if freed < nbytes:
+            logger.warning(f"Disk space low: freed {freed // 2**20} MB of the {nbytes // 2**20} MB wanted")
+        return freed
+
+    def _sweep_temp_files(self):
+        """Remove partial writes (``*.tmp``) abandoned for longer than the grace period."""
+        cutoff = time.time() - self.orphan_grace_seconds
+        for folder in self.temp_folders:
+            self._record('temp', 'orphan', self._remove_files(folder, lambda name: name.endswith('.tmp'), cutoff))
+
+    def _remove_old_uploads(self, max_age_seconds, reason):
+        if max_age_seconds is None:
+            return
+        cutoff = time.time() - max_age_seconds
+        # A batch item or queued job may wait longer than the age limit for its upload
+        self._record('uploads', reason, self._remove_files(
+            self.uploads_folder, lambda name: os.path.join(self.uploads_folder, name) not in self.active_uploads,
+            cutoff))
+
+    def _prune_exports(self):
+        self._record('exports', 'age', self.export_cache.prune(max_age_seconds=self.export_max_age_seconds))
+        self._record('exports', 'size', self.export_cache.prune(max_bytes=self.export_max_bytes))
+        if self.export_max_age_seconds is not None:
+            cutoff = time.time() - self.export_max_age_seconds
+            self._record('exports', 'age', self._remove_files(
+                self.transcripts_folder, lambda name: name.endswith(LEGACY_EXPORT_EXTENSIONS), cutoff))
+
+    def _apply_transcript_retention(self):
+        if self.catalog is None:
+            return
+        if self.transcript_max_age_seconds is not None:
+            cutoff = (datetime.now() - timedelta(seconds=self.transcript_max_age_seconds)).isoformat()
+            while True:
+                entries = self.catalog.oldest(100, before=cutoff)
+                if not entries:
+                    break
+                for entry in entries:
+                    self._remove_transcript(entry, 'age')
+        for source, quota in self.source_quotas.items():
+            self._trim_transcripts(self.catalog.usage().get(source, 0) - quota, 'quota', source)
+        if self.transcripts_max_bytes is not None:
+            total = sum(size or 0 for size in self.catalog.usage().values())
+            self._trim_transcripts(total - self.transcripts_max_bytes, 'size')
+
+    def _trim_transcripts(self, excess, reason, source=None):
+        """Remove the oldest transcripts (of ``source``) until ``excess`` bytes are gone."""
+        while excess > 0:
+            entries = self.catalog.oldest(100, source=source)
+            if not entries:
+                break
+            for entry in entries:
+                self._remove_transcript(entry, reason)
+                excess -= entry['bytes']
+                if excess <= 0:
+                    break
+
+    def _remove_transcript(self, entry, reason):
+        filename = entry['filename']
+        path = os.path.join(self.transcripts_folder, filename)
+        removed = (0, 0)
+        try:
+            os.remove(path)
+            removed = (1, entry['bytes'])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove transcript {filename}: {e}")
+        # Dropped from the catalog regardless, or the same entry would come back
+        self.catalog.remove(filename)
+        self._record('transcripts', reason, removed)
+        self._record('exports', reason, self.export_cache.remove(path))
+        if self.on_transcript_removed is not None:
+            try:
+                self.on_transcript_removed(filename)
+            except Exception as e:
+                logger.warning(f"Could not unindex transcript {filename}: {e}")
+
+    def _catalog_entries(self):
+        cursor = None
+        while True:
+            page = self.catalog.list(limit=500, cursor=cursor)
+            yield from page['transcripts']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _remove_files(folder, match, cutoff):
+        """Remove files in ``folder`` whose names ``match`` and were last modified before ``cutoff``."""
+        files = freed = 0
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            return 0, 0
+        for entry in entries:
+            if not match(entry.name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if stat.st_mtime >= cutoff:
+                    continue
+                os.remove(entry.path)
+            except OSError:
+                continue
+            files += 1
+            freed += stat.st_size
+        return files, freed
+
+    def _record(self, area, reason, removed):
+        files, freed = removed
+        if not files:
+            return
+        logger.info(f"Reclaimed {freed // 1024} KB in {files} files from {area} ({reason})")
+        with self._lock:
+            totals = self.reclaimed.setdefault((area, reason), [0, 0])
+            totals[0] += files
+            totals[1] += freed
+
+    def stats(self):
+        try:
+            free = self.free_bytes()
+        except OSError:
+            free = None
+        with self._lock:
+            return {
+                'free_bytes': free,
+                'min_free_bytes': self.min_free_bytes,
+                'reserved_bytes': self._reserved,
+                'active_uploads': len(self.active_uploads),
+                'runs': self.runs,
+                'last_run': self.last_run,
+                'rejected': self.rejected,
+                'reclaimed': [{'area': area, 'reason': reason, 'files': files, 'bytes': freed}
+                              for (area, reason), (files, freed) in sorted(self.reclaimed.items())],
+            }
@@ -0,0 +1,259 @@
+"""
+Service metrics.
+Per-job stage timers and a small set of counters, gauges and histograms
+rendered in the Prometheus text exposition format, without requiring the
+prometheus_client package. With a shared store, every worker process
+publishes its values there and a scrape of any process renders the totals
+across all of them.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+RATIO_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        """Current values by label values, as JSON-serializable data."""
+        with self._lock:
+            return dict(self._values)
+
+    def combine(self, a, b):
+        """Merge the values of one series from two processes."""
+        return b if a is None else a + b
+
+    def render(self, values=None):
+        """Exposition lines for ``values`` (as from ``snapshot()``), by default this process's own."""
+        if values is None:
+            values = self.snapshot()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Publish a running total kept elsewhere (e.g. a cache's hit count)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    """A value that can go up and down.
+
+    Across processes the values are summed, or with ``aggregate='max'``
+    the largest is reported, for readings every process takes of the same
+    thing (such as free disk space).
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), aggregate='sum'):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+
+    def combine(self, a, b):
+        if a is None:
+            return b
+        return max(a, b) if self.aggregate == 'max' else a + b
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._values.items()}
+
+    def combine(self, a, b):
+        if a is None:
+            return b
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+
+    def render(self, values=None):
+        if values is None:
+            values = self.snapshot()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the service's metrics and renders them for scraping.
+
+    ``collector`` functions run before the values are read, to copy in
+    totals kept elsewhere (cache hit counts, queue depth). With a ``store``
+    (a JobStore), ``render()`` reports the totals of every process that
+    publishes to it; each process publishes on every scrape it answers and
+    every ``publish_seconds`` from a background thread.
+    """
+
+    def __init__(self, store=None, publish_seconds=5):
+        self._metrics = []
+        self._collectors = []
+        self.store = store
+        self.publish_seconds = publish_seconds
+        self._process = None
+        self._publisher = None
+        self._publisher_lock = threading.Lock()
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), aggregate='sum'):
+        return self._add(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, func):
+        """Register ``func`` to run before metrics are read; usable as a decorator."""
+        self._collectors.append(func)
+        return func
+
+    def collect(self):
+        for func in self._collectors:
+            try:
+                func()
+            except Exception as e:
+                logger.warning(f"Metrics collector {func.__name__} failed: {e}")
+
+    def _process_id(self):
+        # A forked worker gets its own ID rather than sharing its parent's
+        if self._process is None or self._process[0] != os.getpid():
+            self._process = (os.getpid(), f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        return self._process[1]
+
+    def publish(self):
+        """Write this process's values to the shared store."""
+        self.collect()
+        rows = [(metric.name, metric.type_name, list(key), value)
+                for metric in self._metrics for key, value in metric.snapshot().items()]
+        self.store.publish_metrics(self._process_id(), rows)
+
+    def start_publishing(self):
+        """Start publishing in the background if there is a store and this process isn't yet."""
+        if self.store is None:
+            return
+        with self._publisher_lock:
+            if self._publisher is not None and self._publisher.is_alive():
+                return
+            self._publisher = threading.Thread(target=self._publish_periodically, name='metrics-publisher',
+                                               daemon=True)
+            self._publisher.start()
+
+    def _publish_periodically(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                logger.warning(f"Could not publish metrics: {e}")
+            time.sleep(self.publish_seconds)
+
+    def render(self):
+        if self.store is None:
+            self.collect()
+            values = {metric.name: None for metric in self._metrics}
+        else:
+            self.publish()
+            by_name = {metric.name: metric for metric in self._metrics}
+            values = {name: {} for name in by_name}
+            for _, name, _, key, value in self.store.metric_values():
+                metric = by_name.get(name)
+                if metric is not None:
+                    values[name][key] = metric.combine(values[name].get(key), value)
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(values[metric.name]))
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Wall-clock seconds spent in each pipeline stage of one job."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        return {name: round(seconds, 3) for name, seconds in self.seconds.items()}
@@ -0,0 +1,121 @@
+"""
+Automatic model-size selection.
+Picks the largest Whisper model expected to finish a job within a target
+time, given the length of its audio and the work already queued ahead of
+it. Speed estimates start from rough CPU figures and follow the real-time
+factors and job times observed while the service runs.
+"""
+
+import logging
+import threading
+
+from model_registry import estimated_model_mb
+from quantization import PRECISIONS, model_key, split_model_key
+
+logger = logging.getLogger(__name__)
+
+AUTO_MODEL = 'auto'
+
+# Rough CPU inference seconds per second of audio, replaced by observed values
+DEFAULT_REAL_TIME_FACTORS = {
+    'tiny': 0.05,
+    'base': 0.1,
+    'small': 0.3,
+    'medium': 0.8,
+    'turbo': 0.5,
+    'large': 1.6,
+}
+
+# Disk read and initialisation speed assumed for a model not loaded before
+LOAD_MB_PER_SECOND = 200
+
+
+class ModelPolicy:
+    """Chooses a model size for ``model_size="auto"`` requests.
+
+    ``sizes`` are the candidates from fastest to most accurate. A job's
+    completion time is estimated as the wait for a free worker, plus
+    loading the model if it is not resident, plus the audio duration times
+    the model's real-time factor; the most accurate size within
+    ``target_seconds`` wins, or the fastest if none fits. Audio of unknown
+    length counts as ``assumed_seconds`` long. Speeds are tracked per model
+    key, so int8 variants learn their own real-time factors.
+    """
+
+    def __init__(self, sizes=('tiny', 'base', 'small', 'medium'), target_seconds=300, assumed_seconds=600,
+                 smoothing=0.2):
+        self.sizes = list(sizes)
+        self.target_seconds = target_seconds
+        self.assumed_seconds = assumed_seconds
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._real_time_factors = {
+            model_key(size, precision): DEFAULT_REAL_TIME_FACTORS.get(split_model_key(size)[0].split('.')[0], 1.0)
+            for size in sizes for precision in PRECISIONS}
+        self._job_seconds = None
+
+    def observe_real_time_factor(self, model_size, real_time_factor):
+        """Fold a finished transcription's inference speed into the estimates."""
+        with self._lock:
+            if model_size in self._real_time_factors:
+                self._real_time_factors[model_size] += self.smoothing * (
+                    real_time_factor - self._real_time_factors[model_size])
+
+    def observe_job(self, seconds):
+        """Fold a finished job's run time into the expected wait per queued job."""
+        with self._lock:
+            if self._job_seconds is None:
+                self._job_seconds = seconds
+            else:
+                self._job_seconds += self.smoothing * (seconds - self._job_seconds)
+
+    def queue_wait_seconds(self, queued, running, workers):
+        """Expected wait before a newly submitted job starts."""
+        ahead = queued + running - workers + 1
+        if ahead <= 0:
+            return 0.0
+        with self._lock:
+            job_seconds = self._job_seconds
+        if job_seconds is None:
+            job_seconds = self.assumed_seconds * self._real_time_factors[self.sizes[0]]
+        return ahead * job_seconds / workers
+
+    def estimate_seconds(self, model_size, duration, wait_seconds=0.0, load_seconds=0.0):
+        with self._lock:
+            real_time_factor = self._real_time_factors[model_size]
+        return wait_seconds + load_seconds + (duration or self.assumed_seconds) * real_time_factor
+
+    def choose(self, duration, queued, running, workers, loaded_sizes=(), load_seconds=None, precision=None):
+        """Return ``(model_size, details)`` for a job of ``duration`` seconds (None if unknown).
+
+        Sizes are judged by their variant at ``precision``. ``loaded_sizes``
+        are the resident model keys; ``load_seconds`` maps model keys to
+        measured load times for the rest.
+        """
+        wait_seconds = self.queue_wait_seconds(queued, running, workers)
+        load_seconds = load_seconds or {}
+        estimates = {}
+        for size in self.sizes:
+            key = model_key(size, precision)
+            load = 0.0 if key in loaded_sizes else load_seconds.get(
+                key, estimated_model_mb(key) / LOAD_MB_PER_SECOND)
+            estimates[size] = self.estimate_seconds(key, duration, wait_seconds, load)
+        fitting = [size for size in self.sizes if estimates[size] <= self.target_seconds]
+        chosen = fitting[-1] if fitting else self.sizes[0]
+        details = {
+            'duration_seconds': round(duration, 1) if duration else None,
+            'queue_wait_seconds': round(wait_seconds, 1),
+            'estimated_seconds': round(estimates[chosen], 1),
+            'target_seconds': self.target_seconds,
+        }
+        logger.info(f"Auto model policy chose {chosen} ({details})")
+        return chosen, details
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sizes': list(self.sizes),
+                'target_seconds': self.target_seconds,
+                'real_time_factors': {size: round(value, 3) for size, value in self._real_time_factors.items()},
+                'job_seconds': round(self._job_seconds, 1) if self._job_seconds is not None else None,
+            }
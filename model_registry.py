@@ -0,0 +1,253 @@
+"""
+Whisper model registry.
+Keeps several model sizes resident under a memory budget, evicting the least
+recently used model when a new one would not fit.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from quantization import MEMORY_RATIO, split_model_key
+
+logger = logging.getLogger(__name__)
+
+# Approximate fp32 footprint of each model size, used before a model is loaded
+ESTIMATED_MODEL_MB = {
+    'tiny': 150,
+    'tiny.en': 150,
+    'base': 290,
+    'base.en': 290,
+    'small': 970,
+    'small.en': 970,
+    'medium': 3060,
+    'medium.en': 3060,
+    'large': 6180,
+    'large-v1': 6180,
+    'large-v2': 6180,
+    'large-v3': 6180,
+    'turbo': 3240,
+}
+
+
+def estimated_model_mb(model_key):
+    """Approximate footprint of a model size or key before it is loaded."""
+    model_size, precision = split_model_key(model_key)
+    return ESTIMATED_MODEL_MB.get(model_size, 0) * MEMORY_RATIO.get(precision, 1.0)
+
+
+def model_memory_mb(model):
+    """Measure the parameter and buffer memory of a loaded model."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+        # Dynamically quantized layers keep their packed weights outside parameters()
+        for value in model.state_dict().values():
+            if isinstance(value, tuple):
+                tensors.extend(t for t in value if hasattr(t, 'element_size'))
+        return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """Thread-safe LRU cache of loaded Whisper models.
+
+    ``loader`` is called as ``loader(model_size)`` and must return a model.
+    Concurrent requests for the same size share a single load; requests for
+    different sizes load in parallel.
+    """
+
+    def __init__(self, loader, memory_budget_mb=4096):
+        self.loader = loader
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()
+        self._sizes_mb = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        # Sizes held by long-lived users, which eviction leaves alone
+        self._pins = {}
+        # Memory held outside the registry on its behalf, by name
+        self._charges = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+        self._warmup = {'status': 'idle', 'models': [], 'error': None,
+                        'started_at': None, 'finished_at': None}
+
+    def get(self, model_size="base"):
+        """Return the model for ``model_size``, loading it on first use."""
+        with self._lock:
+            model = self._models.get(model_size)
+            if model is not None:
+                self._models.move_to_end(model_size)
+                self.hits += 1
+                return model
+            load_lock = self._load_locks.setdefault(model_size, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                model = self._models.get(model_size)
+                if model is not None:
+                    self._models.move_to_end(model_size)
+                    self.hits += 1
+                    return model
+                self.misses += 1
+                self._make_room(estimated_model_mb(model_size))
+
+            logger.info(f"Loading Whisper model: {model_size}")
+            started = time.perf_counter()
+            try:
+                model = self.loader(model_size)
+            except Exception as e:
+                logger.error(f"Error loading Whisper model: {e}")
+                raise
+            elapsed = time.perf_counter() - started
+            logger.info(f"Whisper model {model_size} loaded in {elapsed:.1f}s")
+
+            size_mb = model_memory_mb(model) or estimated_model_mb(model_size)
+            with self._lock:
+                self.load_seconds[model_size] = elapsed
+                self._make_room(size_mb)
+                self._models[model_size] = model
+                self._sizes_mb[model_size] = size_mb
+            return model
+
+    def pin(self, model_size):
+        """Load ``model_size`` and keep it resident until ``unpin()``; returns the model.
+
+        For users that hold on to a model across many calls, such as live
+        sessions: were it evicted, they would keep it in memory regardless,
+        outside the budget, while a second copy was loaded for everyone else.
+        """
+        with self._lock:
+            self._pins[model_size] = self._pins.get(model_size, 0) + 1
+        try:
+            return self.get(model_size)
+        except Exception:
+            self.unpin(model_size)
+            raise
+
+    def unpin(self, model_size):
+        with self._lock:
+            self._pins[model_size] -= 1
+            if not self._pins[model_size]:
+                del self._pins[model_size]
+
+    def charge(self, name, memory_mb):
+        """Count ``memory_mb`` held elsewhere under ``name`` against the budget; 0 releases it.
+
+        For model copies the registry doesn't hold itself, such as those in
+        chunk worker processes. Resident models are evicted to make room.
+        """
+        with self._lock:
+            self._charges.pop(name, None)
+            if memory_mb:
+                self._make_room(memory_mb)
+                self._charges[name] = memory_mb
+
+    def unpinned_budget_mb(self, excluding_charge=None):
+        """Budget left for a new charge once every unpinned model is evicted.
+
+        Pinned models, loaded or still loading, and the other charges stay;
+        ``excluding_charge`` names a charge the new one would replace.
+        """
+        with self._lock:
+            pinned_mb = sum(self._sizes_mb.get(size) or estimated_model_mb(size) for size in self._pins)
+            charged_mb = sum(mb for name, mb in self._charges.items() if name != excluding_charge)
+            return max(0, self.memory_budget_mb - pinned_mb - charged_mb)
+
+    def preload(self, model_sizes):
+        """Load each of ``model_sizes`` so the first requests don't pay for it."""
+        for model_size in model_sizes:
+            self.get(model_size)
+
+    def start_warmup(self, model_sizes):
+        """Preload ``model_sizes`` on a background thread and return immediately.
+
+        Progress is reported by ``warmup_state()``; a failed load leaves the
+        registry usable, with models then loading on first request.
+        """
+        with self._lock:
+            if self._warmup['status'] == 'loading':
+                return
+            self._warmup_started(model_sizes)
+        thread = threading.Thread(target=self._run_warmup, args=(list(model_sizes),),
+                                  name='model-warmup', daemon=True)
+        thread.start()
+
+    def warm_up(self, model_sizes):
+        """Preload ``model_sizes`` in the calling thread, recording it as the warm-up."""
+        with self._lock:
+            self._warmup_started(model_sizes)
+        self._run_warmup(list(model_sizes))
+
+    def _warmup_started(self, model_sizes):
+        self._warmup = {'status': 'loading', 'models': list(model_sizes), 'error': None,
+                        'started_at': time.time(), 'finished_at': None}
+
+    def _run_warmup(self, model_sizes):
+        status, error = 'ready', None
+        try:
+            self.preload(model_sizes)
+        except Exception as e:
+            status, error = 'failed', str(e)
+        with self._lock:
+            self._warmup.update(status=status, error=error, finished_at=time.time())
+
+    def warmup_state(self):
+        """Status of the background warm-up: idle, loading, ready or failed."""
+        with self._lock:
+            return dict(self._warmup, models=list(self._warmup['models']))
+
+    def is_loaded(self, model_size):
+        with self._lock:
+            return model_size in self._models
+
+    def loaded_sizes(self):
+        with self._lock:
+            return list(self._models)
+
+    def evict(self, model_size):
+        """Drop ``model_size`` from the cache if it is resident and not pinned."""
+        with self._lock:
+            if model_size in self._pins:
+                logger.info(f"Not evicting pinned Whisper model: {model_size}")
+                return
+            if self._models.pop(model_size, None) is not None:
+                self._sizes_mb.pop(model_size, None)
+                self.evictions += 1
+                logger.info(f"Evicted Whisper model: {model_size}")
+
+    def stats(self):
+        """Counters and residency for monitoring."""
+        with self._lock:
+            return {
+                'loaded': list(self._models),
+                'pinned': dict(self._pins),
+                'memory_mb': round(sum(self._sizes_mb.values()), 1),
+                'charged_mb': dict(self._charges),
+                'memory_budget_mb': self.memory_budget_mb,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'load_seconds': dict(self.load_seconds),
+            }
+
+    def _make_room(self, needed_mb):
+        """Evict least recently used models until ``needed_mb`` fits the budget.
+
+        Must be called with ``self._lock`` held. Pinned models are never
+        evicted. A model larger than the budget is still allowed once
+        everything else that can go has been evicted.
+        """
+        while sum(self._sizes_mb.values()) + sum(self._charges.values()) + needed_mb > self.memory_budget_mb:
+            model_size = next((size for size in self._models if size not in self._pins), None)
+            if model_size is None:
+                break
+            del self._models[model_size]
+            self._sizes_mb.pop(model_size, None)
+            self.evictions += 1
+            logger.info(f"Evicted Whisper model: {model_size}")
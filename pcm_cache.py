@@ -0,0 +1,196 @@
+"""
+Decoded audio cache.
+Audio decoded to 16 kHz float32 PCM is kept so that re-transcribing the same
+source (a retry, another model size) skips ffmpeg, and for YouTube the
+download as well. Short recordings stay in memory; long ones are written as
+``.npy`` files and memory-mapped on use, so they cost page cache rather than
+process memory.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+def file_key(path):
+    """Cache key for a file on disk, invalidated when it is modified."""
+    stat = os.stat(path)
+    return f"file:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class PCMCache:
+    """Two-tier LRU cache of decoded audio arrays.
+
+    Arrays shorter than ``mmap_min_seconds`` are held in memory within
+    ``memory_max_bytes``; longer ones are stored on disk within
+    ``disk_max_bytes`` and returned as read-only memory maps. Each entry can
+    carry a small JSON-serialisable ``metadata`` dict (e.g. a video title).
+    """
+
+    def __init__(self, folder, disk_max_bytes=2 * 1024 ** 3, memory_max_bytes=256 * 1024 ** 2,
+                 mmap_min_seconds=300):
+        self.folder = folder
+        self.disk_max_bytes = disk_max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.mmap_min_seconds = mmap_min_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        os.makedirs(folder, exist_ok=True)
+        self._load_index()
+
+    def _name(self, key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _path(self, name, extension):
+        return os.path.join(self.folder, name + extension)
+
+    def _load_index(self):
+        entries = []
+        for filename in os.listdir(self.folder):
+            if not filename.endswith('.npy'):
+                continue
+            stat = os.stat(os.path.join(self.folder, filename))
+            entries.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+
+    def _adopt(self, name):
+        """Index a file another worker process wrote since the index was built.
+
+        Must be called with ``self._lock`` held; returns whether it is on disk.
+        """
+        if name in self._disk:
+            return True
+        try:
+            self._disk[name] = os.path.getsize(self._path(name, '.npy'))
+        except OSError:
+            return False
+        return True
+
+    def __contains__(self, key):
+        name = self._name(key)
+        with self._lock:
+            return name in self._memory or self._adopt(name)
+
+    def get(self, key):
+        """Return ``(audio, metadata)`` for ``key``, or None."""
+        name = self._name(key)
+        with self._lock:
+            if name in self._memory:
+                self._memory.move_to_end(name)
+                self.hits += 1
+                audio, metadata = self._memory[name]
+                return audio, metadata
+            if not self._adopt(name):
+                self.misses += 1
+                return None
+            try:
+                audio = np.load(self._path(name, '.npy'), mmap_mode='r')
+                metadata_path = self._path(name, '.json')
+                metadata = {}
+                if os.path.exists(metadata_path):
+                    with open(metadata_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                os.utime(self._path(name, '.npy'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable decoded audio {name}: {e}")
+                self._disk.pop(name, None)
+                self.misses += 1
+                return None
+            self._disk.move_to_end(name)
+            self.hits += 1
+            return audio, metadata
+
+    def put(self, key, audio, metadata=None):
+        """Cache ``audio`` under ``key`` and return the array callers should use.
+
+        Long recordings come back as a memory map of the cached file, so the
+        decoded copy can be released.
+        """
+        name = self._name(key)
+        metadata = metadata or {}
+        if len(audio) < self.mmap_min_seconds * SAMPLE_RATE:
+            with self._lock:
+                self._memory[name] = (audio, metadata)
+                self._memory.move_to_end(name)
+                self._evict_memory()
+            return audio
+
+        path = self._path(name, '.npy')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(audio, dtype=np.float32), allow_pickle=False)
+        if metadata:
+            with open(self._path(name, '.json'), 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk[name] = os.path.getsize(path)
+            self._disk.move_to_end(name)
+            self._evict_disk(keep=name)
+        return np.load(path, mmap_mode='r')
+
+    def _evict_memory(self):
+        total = sum(audio.nbytes for audio, _ in self._memory.values())
+        while total > self.memory_max_bytes and len(self._memory) > 1:
+            _, (audio, _) = self._memory.popitem(last=False)
+            total -= audio.nbytes
+
+    def _evict_disk(self, keep):
+        total = sum(self._disk.values())
+        for name in list(self._disk):
+            if total <= self.disk_max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._disk.pop(name)
+            for extension in ('.npy', '.json'):
+                try:
+                    os.remove(self._path(name, extension))
+                except OSError:
+                    # Still mapped by a running job on platforms that forbid it
+                    pass
+
+    def shrink(self, nbytes):
+        """Evict least recently used files until ``nbytes`` are freed; returns ``(files, bytes)`` removed."""
+        files = freed = 0
+        with self._lock:
+            for name in list(self._disk):
+                if freed >= nbytes:
+                    break
+                size = self._disk.pop(name)
+                try:
+                    os.remove(self._path(name, '.npy'))
+                except OSError:
+                    # Still mapped by a running job on platforms that forbid it
+                    continue
+                try:
+                    os.remove(self._path(name, '.json'))
+                except OSError:
+                    pass
+                files += 1
+                freed += size
+        return files, freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': sum(audio.nbytes for audio, _ in self._memory.values()),
+                'disk_entries': len(self._disk),
+                'disk_bytes': sum(self._disk.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,57 @@
+"""
+Reduced-precision Whisper models.
+A model key such as ``small:int8`` names the ``small`` model with its linear
+layers dynamically quantized: their weights are stored as int8 and
+activations are quantized on the fly, so on CPU the model needs well under
+half the memory and spends less time in the matrix multiplies that dominate
+inference. Everything that takes a model size (the registry, the job queue,
+the transcript cache, chunk worker processes) accepts a model key.
+"""
+
+PRECISIONS = ('fp32', 'int8')
+
+# Share of the fp32 footprint left after quantizing; the token embedding
+# and convolutions stay fp32
+MEMORY_RATIO = {'fp32': 1.0, 'int8': 0.4}
+
+
+def model_key(model_size, precision=None):
+    """The key for ``model_size`` at ``precision``; fp32 keeps the plain size."""
+    if precision in (None, '', 'fp32'):
+        return model_size
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'; expected one of: {', '.join(PRECISIONS)}")
+    return f"{model_size}:{precision}"
+
+
+def split_model_key(key):
+    """Return ``(model_size, precision)`` for a model key."""
+    model_size, _, precision = key.partition(':')
+    return model_size, precision or 'fp32'
+
+
+def quantize_int8(model):
+    """Quantize the linear layers of a Whisper model to int8, in place."""
+    import torch
+    from whisper.model import Linear
+
+    model = model.cpu().float()
+    for module in model.modules():
+        # Whisper's Linear only adds a dtype cast to nn.Linear, but the
+        # quantizer matches module types exactly
+        if type(module) is Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_model(key):
+    """Load the Whisper model named by ``key``."""
+    import whisper
+
+    model_size, precision = split_model_key(key)
+    if precision == 'int8':
+        # Quantized kernels only run on the CPU
+        return quantize_int8(whisper.load_model(model_size, device='cpu'))
+    if precision != 'fp32':
+        raise ValueError(f"Unknown precision '{precision}'; expected one of: {', '.join(PRECISIONS)}")
+    return whisper.load_model(model_size)
@@ -0,0 +1,242 @@
+"""
+Transcript search index.
+Segment text from every stored transcript is kept in an SQLite FTS5 inverted
+index. Transcripts are added as they are saved, and the index can be synced
+or rebuilt from the transcripts folder at any time.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from transcript_store import TRANSCRIPT_EXTENSION, TranscriptReader
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_FILE_EXTENSIONS = (TRANSCRIPT_EXTENSION, '.json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    filename TEXT UNIQUE NOT NULL,
+    title TEXT,
+    source TEXT,
+    language TEXT,
+    timestamp TEXT,
+    mtime_ns INTEGER,
+    first_rowid INTEGER,
+    segment_count INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text,
+    transcript_id UNINDEXED,
+    segment_id UNINDEXED,
+    start UNINDEXED,
+    end UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def build_match_query(query):
+    """Turn user input into an FTS5 MATCH expression.
+
+    ``"quoted text"`` is matched as a phrase and remaining words must all
+    appear; everything is quoted so FTS5 operators in the input are treated
+    as plain text.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        term = (phrase or word).replace('"', '').strip()
+        if term:
+            terms.append('"' + term + '"')
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """Inverted index over transcript segments stored in SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one operation, committing on success."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, transcript_path, transcript_data=None):
+        """Index (or re-index) one transcript file.
+
+        ``transcript_data`` may be passed when the caller already holds the
+        transcript in memory, saving a read back from disk.
+        """
+        filename = os.path.basename(transcript_path)
+        if transcript_data is None:
+            reader = TranscriptReader(transcript_path)
+            metadata = reader.metadata()
+            segments = reader.segments()
+        else:
+            metadata = transcript_data
+            segments = transcript_data.get('segments') or []
+        mtime_ns = os.stat(transcript_path).st_mtime_ns
+
+        with self._write_lock, self._connect() as conn:
+            # Take SQLite's write lock before reading MAX(rowid), so another
+            # process indexing at the same time can't claim the same range
+            conn.execute("BEGIN IMMEDIATE")
+            self._remove(conn, filename)
+            # Segments get a contiguous rowid range so a transcript can be
+            # removed without scanning the FTS table
+            first_rowid = conn.execute("SELECT IFNULL(MAX(rowid), 0) + 1 FROM segments_fts").fetchone()[0]
+            cursor = conn.execute(
+                "INSERT INTO transcripts (filename, title, source, language, timestamp, mtime_ns, "
+                "first_rowid, segment_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (filename, metadata.get('title') or metadata.get('filename'), metadata.get('source'),
+                 metadata.get('language'), metadata.get('timestamp'), mtime_ns, first_rowid, len(segments)),
+            )
+            transcript_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO segments_fts (rowid, text, transcript_id, segment_id, start, end) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(first_rowid + i, segment.get('text', ''), transcript_id, segment.get('id', i),
+                  segment.get('start'), segment.get('end'))
+                 for i, segment in enumerate(segments)],
+            )
+
+    def _remove(self, conn, filename):
+        row = conn.execute(
+            "SELECT id, first_rowid, segment_count FROM transcripts WHERE filename = ?", (filename,)
+        ).fetchone()
+        if row is not None:
+            if row['segment_count']:
+                conn.execute("DELETE FROM segments_fts WHERE rowid BETWEEN ? AND ?",
+                             (row['first_rowid'], row['first_rowid'] + row['segment_count'] - 1))
+            conn.execute("DELETE FROM transcripts WHERE id = ?", (row['id'],))
+
+    def remove(self, filename):
+        """Drop a transcript from the index."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._remove(conn, filename)
+
+    def sync_folder(self, folder):
+        """Bring the index in line with ``folder``.
+
+        New or modified transcripts are (re)indexed and entries for deleted
+        files are dropped; unchanged files are skipped, so this is cheap to
+        run at every startup. Returns the number of files indexed.
+        """
+        with self._connect() as conn:
+            known = {row['filename']: row['mtime_ns']
+                     for row in conn.execute("SELECT filename, mtime_ns FROM transcripts")}
+        present = set()
+        indexed = 0
+        for name in os.listdir(folder):
+            if not name.endswith(TRANSCRIPT_FILE_EXTENSIONS):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                # Deleted since the listing; its entry is dropped below
+                continue
+            present.add(name)
+            if known.get(name) == mtime_ns:
+                continue
+            try:
+                self.add(path)
+                indexed += 1
+            except FileNotFoundError:
+                present.discard(name)
+            except Exception as e:
+                logger.warning(f"Could not index {name}: {e}")
+        for name in set(known) - present:
+            self.remove(name)
+        if indexed:
+            logger.info(f"Search index updated with {indexed} transcripts")
+        return indexed
+
+    def rebuild(self, folder):
+        """Discard the index and rebuild it from ``folder``."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM segments_fts")
+            conn.execute("DELETE FROM transcripts")
+        return self.sync_folder(folder)
+
+    def search(self, query, page=1, per_page=20, hits_per_transcript=5):
+        """Find transcripts matching ``query``, best first, with their matching segments."""
+        match = build_match_query(query)
+        if not match:
+            return {'query': query, 'total': 0, 'page': page, 'per_page': per_page, 'results': []}
+
+        with self._connect() as conn:
+            total = conn.execute(
+                "SELECT COUNT(DISTINCT transcript_id) FROM segments_fts WHERE segments_fts MATCH ?", (match,)
+            ).fetchone()[0]
+            # bm25() can't be used inside an aggregate, so score segments in a
+            # materialized CTE first and group those rows per transcript
+            ranked = conn.execute(
+                "WITH matches AS MATERIALIZED ("
+                "SELECT transcript_id, bm25(segments_fts) AS score FROM segments_fts WHERE segments_fts MATCH ?"
+                ") SELECT transcript_id, COUNT(*) AS hits, MIN(score) AS score FROM matches "
+                "GROUP BY transcript_id ORDER BY score LIMIT ? OFFSET ?",
+                (match, per_page, (page - 1) * per_page),
+            ).fetchall()
+
+            ids = [row['transcript_id'] for row in ranked]
+            placeholders = ','.join('?' * len(ids))
+            transcripts = {
+                row['id']: row for row in conn.execute(
+                    f"SELECT id, filename, title, source, language, timestamp FROM transcripts "
+                    f"WHERE id IN ({placeholders})", ids)
+            }
+            # One pass over the matches for the whole page, grouped per transcript
+            segments = {transcript_id: [] for transcript_id in ids}
+            for segment in conn.execute(
+                    f"SELECT transcript_id, segment_id, start, end, text, "
+                    f"highlight(segments_fts, 0, '<mark>', '</mark>') AS highlighted "
+                    f"FROM segments_fts WHERE segments_fts MATCH ? AND transcript_id IN ({placeholders}) "
+                    f"ORDER BY transcript_id, start", [match] + ids):
+                hits = segments[segment['transcript_id']]
+                if len(hits) < hits_per_transcript:
+                    hits.append({key: segment[key] for key in ('segment_id', 'start', 'end', 'text', 'highlighted')})
+
+            results = []
+            for row in ranked:
+                transcript = transcripts.get(row['transcript_id'])
+                if transcript is None:
+                    continue
+                results.append({
+                    'transcript_file': transcript['filename'],
+                    'title': transcript['title'],
+                    'source': transcript['source'],
+                    'language': transcript['language'],
+                    'timestamp': transcript['timestamp'],
+                    'hits': row['hits'],
+                    'segments': segments[row['transcript_id']],
+                })
+
+        return {'query': query, 'total': total, 'page': page, 'per_page': per_page, 'results': results}
+
+
+if __name__ == '__main__':
+    # Usage: python search_index.py [transcripts_folder] [index_path]
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'transcripts'
+    index_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join('cache', 'search.sqlite3')
+    count = SearchIndex(index_path).rebuild(folder)
+    print(f"Indexed {count} transcripts from {folder} into {index_path}")
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# The service's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_transcript(text_words=('Hello', 'there.', 'How', 'are', 'you?'), seconds_per_word=0.5, **metadata):
+    """A transcript dict shaped like a saved Whisper result, with word timestamps."""
+    segments = []
+    words = []
+    for i, word in enumerate(text_words):
+        words.append({'word': ' ' + word, 'start': i * seconds_per_word, 'end': (i + 1) * seconds_per_word - 0.1,
+                      'probability': 0.9})
+        if word.endswith(('.', '?')):
+            segments.append({
+                'id': len(segments),
+                'start': words[0]['start'],
+                'end': words[-1]['end'],
+                'text': ''.join(w['word'] for w in words),
+                'tokens': list(range(len(segments) * 10, len(segments) * 10 + len(words))),
+                'words': words,
+            })
+            words = []
+    data = {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': 'en',
+        'source': 'file',
+        'filename': 'hello.wav',
+        'timestamp': '2025-01-01T00:00:00',
+    }
+    data.update(metadata)
+    return data
+
+
+@pytest.fixture
+def transcript():
+    return make_transcript()
@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+
+import pytest
+
+from batch import BatchRunner
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=1)
+    yield queue
+    queue.shutdown(wait=False)
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+
+def item(source, result=None, error=None):
+    def func(job):
+        if error:
+            raise RuntimeError(error)
+        return result or {'transcript_file': f"{source}.transcript"}
+    return source, 'file', func, None
+
+
+def test_manifest_records_every_item(queue, tmp_path):
+    runner = BatchRunner(queue, str(tmp_path))
+
+    def items():
+        yield item('a')
+        yield item('b', error='unreadable audio')
+        raise OSError('playlist unavailable')
+    batch = runner.start(items(), 'base', wait=True)
+
+    with open(batch.manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest == runner.get(batch.id)
+    assert manifest['status'] == 'completed'
+    assert manifest['counts'] == {'completed': 1, 'failed': 2}
+    a, b, expansion = manifest['items']
+    assert (a['source'], a['status'], a['transcript_file']) == ('a', 'completed', 'a.transcript')
+    assert (b['status'], b['error']) == ('failed', 'unreadable audio')
+    assert expansion == {'source': None, 'kind': None, 'status': 'failed', 'error': 'playlist unavailable'}
+    assert a['run_seconds'] is not None
+
+
+def test_only_a_few_items_wait_in_the_queue(queue, tmp_path):
+    release = threading.Event()
+    started = []
+
+    def blocking(job):
+        started.append(job)
+        release.wait(5)
+        return {}
+    runner = BatchRunner(queue, str(tmp_path), max_queued_jobs=1)
+    batch = runner.start([(str(i), 'file', blocking, None) for i in range(4)], 'base')
+    wait_until(lambda: len(batch.items) == 2)
+    time.sleep(1.5)
+    # One item runs and one waits; the rest are held back until the queued one starts
+    assert (len(started), queue.depth(), len(batch.items)) == (1, 1, 2)
+    release.set()
+    wait_until(lambda: batch.status == 'completed')
+    assert batch.to_dict()['counts'] == {'completed': 4}
+
+
+def test_finished_batches_are_forgotten_but_keep_their_manifests(queue, tmp_path):
+    runner = BatchRunner(queue, str(tmp_path), max_finished_batches=1)
+    first = runner.start([item('a')], 'base', wait=True)
+    runner.start([item('b')], 'base', wait=True)
+    third = runner.start([item('c')], 'base', wait=True)
+    assert list(runner._batches) == [third.id]
+    assert runner.get(first.id)['items'][0]['source'] == 'a'
+    assert runner.get('missing') is None
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from catalog import TranscriptCatalog
+from conftest import make_transcript
+from transcript_store import TRANSCRIPT_EXTENSION, write_transcript
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / 'transcripts'
+    folder.mkdir()
+    return folder
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return TranscriptCatalog(str(tmp_path / 'catalog.sqlite3'))
+
+
+def save(folder, name, **metadata):
+    return write_transcript(str(folder / f"{name}{TRANSCRIPT_EXTENSION}"), make_transcript(**metadata))
+
+
+def test_add_records_metadata(folder, catalog):
+    path = save(folder, 'a', source='youtube', url='https://youtu.be/x', title='Talk', model_size='base')
+    entry = catalog.add(path)
+    assert entry == catalog.get(f"a{TRANSCRIPT_EXTENSION}")
+    assert entry['source'] == 'youtube'
+    assert entry['title'] == 'Talk'
+    assert entry['duration'] == 2.4
+    assert entry['bytes'] == os.path.getsize(path)
+
+
+def test_list_filters_and_pages(folder, catalog):
+    for i in range(5):
+        catalog.add(save(folder, f"t{i}", source='youtube' if i % 2 else 'file',
+                         timestamp=f"2025-01-0{i + 1}T00:00:00"))
+
+    page = catalog.list(limit=2, count=True)
+    assert page['total'] == 5
+    assert [entry['filename'] for entry in page['transcripts']] == [f"t4{TRANSCRIPT_EXTENSION}",
+                                                                     f"t3{TRANSCRIPT_EXTENSION}"]
+    names = [entry['filename'] for entry in page['transcripts']]
+    while page['next_cursor']:
+        page = catalog.list(limit=2, cursor=page['next_cursor'])
+        names += [entry['filename'] for entry in page['transcripts']]
+    assert names == [f"t{i}{TRANSCRIPT_EXTENSION}" for i in reversed(range(5))]
+
+    youtube = catalog.list(filters={'source': 'youtube'}, sort='created_at', order='asc')
+    assert [entry['filename'] for entry in youtube['transcripts']] == [f"t1{TRANSCRIPT_EXTENSION}",
+                                                                        f"t3{TRANSCRIPT_EXTENSION}"]
+    assert catalog.list(filters={'since': '2025-01-04'}, count=True)['total'] == 2
+
+
+def test_list_rejects_bad_arguments(catalog):
+    with pytest.raises(ValueError):
+        catalog.list(sort='filename')
+    with pytest.raises(ValueError):
+        catalog.list(cursor='not-a-cursor')
+    cursor_by_title = catalog.list(sort='title')['next_cursor']
+    assert cursor_by_title is None
+
+
+def test_title_filter_escapes_wildcards(folder, catalog):
+    catalog.add(save(folder, 'a', title='100% sure'))
+    catalog.add(save(folder, 'b', title='1000 sure'))
+    titles = [entry['title'] for entry in catalog.list(filters={'title': '0%'})['transcripts']]
+    assert titles == ['100% sure']
+
+
+def test_oldest_and_usage(folder, catalog):
+    catalog.add(save(folder, 'new', source='file', timestamp='2025-02-01T00:00:00'))
+    catalog.add(save(folder, 'old', source='youtube', timestamp='2025-01-01T00:00:00'))
+    assert [entry['filename'] for entry in catalog.oldest(1)] == [f"old{TRANSCRIPT_EXTENSION}"]
+    assert catalog.oldest(10, before='2025-01-15') == catalog.oldest(1)
+    usage = catalog.usage()
+    assert set(usage) == {'file', 'youtube'}
+    assert catalog.stats() == {'transcripts': 2, 'bytes': sum(usage.values())}
+
+
+def test_sync_folder_follows_the_folder(folder, catalog):
+    save(folder, 'a')
+    path_b = save(folder, 'b')
+    (folder / 'notes.txt').write_text('not a transcript')
+    assert catalog.sync_folder(str(folder)) == 2
+    # Unchanged files are skipped
+    assert catalog.sync_folder(str(folder)) == 0
+
+    os.remove(path_b)
+    save(folder, 'c')
+    assert catalog.sync_folder(str(folder)) == 1
+    assert sorted(entry['filename'] for entry in catalog.list()['transcripts']) == [
+        f"a{TRANSCRIPT_EXTENSION}", f"c{TRANSCRIPT_EXTENSION}"]
@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+import pytest
+
+import chunking
+from chunking import SAMPLE_RATE, find_split_points, make_chunks, shared_pool, shutdown_pools, stitch_segments
+
+
+def tone_with_pauses(seconds, pauses):
+    """A tone of ``seconds`` that is silent for each ``(start, end)`` in ``pauses``."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    for start, end in pauses:
+        audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0
+    return audio
+
+
+def segment(start, end, text):
+    return {'start': start, 'end': end, 'text': text}
+
+
+@pytest.fixture
+def charges():
+    """The charges reported by the pool, newest last; no pool is left behind."""
+    charges = []
+    yield charges
+    shutdown_pools()
+
+
+def test_pool_is_charged_while_it_exists(charges):
+    with shared_pool('tiny', 2, charge=charges.append) as pool:
+        with shared_pool('tiny', 2, charge=charges.append) as same:
+            assert same is pool
+    assert charges == [2]
+    shutdown_pools()
+    assert charges == [2, 0]
+    shutdown_pools()
+    assert charges == [2, 0]
+
+
+def test_replacing_the_pool_releases_its_charge(charges):
+    with shared_pool('tiny', 2, charge=charges.append):
+        pass
+    with shared_pool('base', 1, charge=charges.append):
+        assert charges == [2, 0, 1]
+
+
+def test_pool_is_not_charged_until_its_users_are_done(charges):
+    replaced = []
+
+    def replace():
+        with shared_pool('base', 1, charge=charges.append):
+            replaced.append(list(charges))
+
+    with shared_pool('tiny', 2, charge=charges.append):
+        thread = threading.Thread(target=replace)
+        thread.start()
+        thread.join(0.2)
+        # The new pool's charge waits for the old pool, still in use, to go
+        assert thread.is_alive()
+        assert charges == [2]
+    thread.join(5)
+    assert replaced == [[2, 0, 1]]
+    assert chunking._pool_key == ('base', 1)
+
+
+def test_split_points_fall_in_the_nearest_pause():
+    audio = tone_with_pauses(100, [(27.0, 27.5), (59.0, 59.5)])
+    boundaries = find_split_points(audio, chunk_seconds=30, search_seconds=5)
+    assert boundaries[0] == 0 and boundaries[-1] == len(audio)
+    seconds = [b / SAMPLE_RATE for b in boundaries[1:-1]]
+    # Each cut moves to a pause, and the next target counts from the cut
+    assert seconds[:2] == [27.0, 59.0]
+    assert len(seconds) == 3 and 84.0 <= seconds[2] < 94.0
+
+
+def test_short_audio_is_one_chunk():
+    audio = tone_with_pauses(20, [])
+    assert find_split_points(audio, chunk_seconds=30) == [0, len(audio)]
+
+
+def test_chunks_start_early_by_the_overlap():
+    audio = np.zeros(10 * SAMPLE_RATE, dtype=np.float32)
+    chunks = list(make_chunks(audio, [0, 4 * SAMPLE_RATE, len(audio)], overlap_seconds=1.0))
+    assert [(index, start, end, chunk_start) for index, start, end, chunk_start, _ in chunks] == [
+        (0, 0, 4 * SAMPLE_RATE, 0), (1, 4 * SAMPLE_RATE, len(audio), 3 * SAMPLE_RATE)]
+    assert len(chunks[1][4]) == 7 * SAMPLE_RATE
+
+
+def test_stitching_keeps_each_segment_once_in_order():
+    chunk_results = [
+        # Listed out of order, as chunks complete
+        {'owned_start': 30.0, 'owned_end': 60.0, 'segments': [
+            segment(28.0, 29.5, ' overlap heard again'), segment(29.5, 31.0, ' said across the cut'),
+            segment(31.0, 40.0, ' said across the cut'), segment(40.0, 58.0, ' second')]},
+        {'owned_start': 0.0, 'owned_end': 30.0, 'segments': [
+            segment(0.0, 20.0, ' first'), segment(20.0, 29.5, ' overlap heard again')]},
+    ]
+    segments = stitch_segments(chunk_results)
+    assert [s['text'] for s in segments] == [' first', ' overlap heard again', ' said across the cut', ' second']
+    assert [s['id'] for s in segments] == [0, 1, 2, 3]
+    assert [s['start'] for s in segments] == [0.0, 20.0, 29.5, 40.0]
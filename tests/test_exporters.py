@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+
+from exporters import ExportCache, format_timestamp
+from transcript_store import TRANSCRIPT_EXTENSION, write_transcript
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExportCache(str(tmp_path / 'exports'))
+
+
+@pytest.fixture
+def transcript_path(tmp_path, transcript):
+    return write_transcript(str(tmp_path / f"a{TRANSCRIPT_EXTENSION}"), transcript)
+
+
+def export(cache, transcript_path, export_format):
+    return ''.join(cache.stream(transcript_path, export_format))
+
+
+def test_timestamps():
+    assert format_timestamp(0) == '00:00:00,000'
+    assert format_timestamp(3723.4567) == '01:02:03,457'
+    assert format_timestamp(59.9996, '.') == '00:01:00.000'
+    assert format_timestamp(-0.5) == '00:00:00,000'
+
+
+def test_srt_and_vtt(cache, transcript_path):
+    assert export(cache, transcript_path, 'srt') == (
+        "1\n00:00:00,000 --> 00:00:00,900\nHello there.\n\n"
+        "2\n00:00:01,000 --> 00:00:02,400\nHow are you?\n\n")
+    assert export(cache, transcript_path, 'vtt') == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:00.900\nHello there.\n\n"
+        "00:00:01.000 --> 00:00:02.400\nHow are you?\n\n")
+
+
+def test_streamed_render_is_served_from_the_cache(cache, transcript_path):
+    assert cache.cached(transcript_path, 'txt') is None
+    text = export(cache, transcript_path, 'txt')
+    path = cache.cached(transcript_path, 'txt')
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == text == ' Hello there. How are you?'
+    assert cache.stats() == {'hits': 1, 'renders': 1}
+
+
+def test_abandoned_stream_is_not_cached(cache, transcript_path):
+    pieces = cache.stream(transcript_path, 'srt')
+    next(pieces)
+    pieces.close()
+    assert cache.cached(transcript_path, 'srt') is None
+    assert os.listdir(cache.folder) == []
+
+
+def test_rewriting_the_transcript_invalidates_and_replaces_its_renders(cache, transcript_path, transcript):
+    export(cache, transcript_path, 'txt')
+    old = cache.cached(transcript_path, 'txt')
+    transcript['text'] = ' Rewritten.'
+    write_transcript(transcript_path, transcript)
+    stat = os.stat(transcript_path)
+    os.utime(transcript_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert cache.cached(transcript_path, 'txt') is None
+    assert export(cache, transcript_path, 'txt') == ' Rewritten.'
+    assert not os.path.exists(old)
+    assert len(os.listdir(cache.folder)) == 1
+
+
+def test_remove_and_remove_orphans(cache, tmp_path, transcript, transcript_path):
+    other_path = write_transcript(str(tmp_path / f"b{TRANSCRIPT_EXTENSION}"), transcript)
+    for path in (transcript_path, other_path):
+        export(cache, path, 'txt')
+        export(cache, path, 'srt')
+    assert cache.remove_orphans([os.path.basename(transcript_path)])[0] == 2
+    assert cache.cached(other_path, 'txt') is None
+    assert cache.remove(transcript_path)[0] == 2
+    assert os.listdir(cache.folder) == []
+
+
+def test_prune_by_age_then_size_then_free_space(cache, tmp_path, transcript):
+    paths = []
+    for i, name in enumerate('abcd'):
+        transcript_path = write_transcript(str(tmp_path / f"{name}{TRANSCRIPT_EXTENSION}"), transcript)
+        export(cache, transcript_path, 'txt')
+        render = cache.cached(transcript_path, 'txt')
+        then = time.time() - (4 - i) * 3600
+        os.utime(render, (then, then))
+        paths.append(render)
+    size = os.path.getsize(paths[0])
+
+    # Renders a to d are four to one hours old
+    assert cache.prune(max_age_seconds=2.5 * 3600) == (2, 2 * size)
+    assert cache.prune(max_bytes=size) == (1, size)
+    assert [os.path.exists(path) for path in paths] == [False, False, False, True]
+    assert cache.prune(free_bytes=1) == (1, size)
+    assert cache.prune(free_bytes=1) == (0, 0)
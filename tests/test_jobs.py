@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+
+from job_store import JobStore
+from jobs import CancelToken, JobQueue, QueueFullError, TranscriptionCancelled
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=1, max_queue_size=2)
+    yield queue
+    queue.shutdown(wait=False)
+
+
+def blocking_job():
+    """A job function that runs until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def func(job):
+        started.set()
+        release.wait(5)
+        return {'done': True}
+    return func, started, release
+
+
+def test_job_runs_and_reports_its_events(queue):
+    job = queue.submit(lambda job: {'text': 'hi'}, 'base', kind='file')
+    assert job.wait(5)
+    assert job.status == 'completed'
+    assert job.result == {'text': 'hi'}
+    events, finished = job.events_since(0)
+    assert finished
+    assert [event['event'] for event in events] == ['status', 'status', 'completed']
+    assert job.to_dict()['result'] == {'text': 'hi'}
+    # The audio captured by the function is not kept alive by the finished job
+    assert job.func is None
+
+
+def test_failed_job_records_the_error(queue):
+    def fail(job):
+        raise ValueError('bad audio')
+    job = queue.submit(fail, 'base')
+    assert job.wait(5)
+    assert job.status == 'failed'
+    assert job.error == 'bad audio'
+    assert job.error_type == 'ValueError'
+
+
+def test_full_queue_rejects_without_publishing(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    queue = JobQueue(workers=1, max_queue_size=1, store=store)
+    func, started, release = blocking_job()
+    try:
+        queue.submit(func, 'base')
+        assert started.wait(5)
+        queue.submit(lambda job: {}, 'base')
+        with pytest.raises(QueueFullError) as error:
+            queue.submit(lambda job: {}, 'base')
+        assert error.value.depth == 1
+        assert store.counts() == {'queued': 1, 'running': 1}
+    finally:
+        release.set()
+        queue.shutdown(wait=False)
+
+
+def test_saturated_model_does_not_block_other_models():
+    queue = JobQueue(workers=2, model_concurrency={'large': 1})
+    func, started, release = blocking_job()
+    try:
+        queue.submit(func, 'large')
+        assert started.wait(5)
+        waiting = queue.submit(lambda job: {}, 'large')
+        other = queue.submit(lambda job: {}, 'tiny')
+        assert other.wait(5)
+        assert waiting.status == 'queued'
+        release.set()
+        assert waiting.wait(5)
+    finally:
+        release.set()
+        queue.shutdown(wait=False)
+
+
+def test_job_waits_for_its_ready_event(queue):
+    ready = threading.Event()
+    job = queue.submit(lambda job: {}, 'base', ready=ready)
+    time.sleep(0.1)
+    assert job.status == 'queued'
+    ready.set()
+    queue.wake()
+    assert job.wait(5)
+
+
+
+def test_cancelling_a_queued_job_runs_its_cleanup():
+    finished = []
+    queue = JobQueue(workers=1, on_finish=finished.append)
+    func, started, release = blocking_job()
+    cleaned = []
+    try:
+        queue.submit(func, 'base')
+        assert started.wait(5)
+        ran = []
+        job = queue.submit(lambda job: ran.append(job), 'base', on_cancel=cleaned.append)
+        assert queue.cancel(job.id) is job
+        assert job.status == 'cancelled'
+        assert cleaned == [job]
+        assert finished == [job]
+        assert queue.depth() == 0
+        release.set()
+        time.sleep(0.1)
+        assert ran == []
+    finally:
+        release.set()
+        queue.shutdown(wait=False)
+
+
+def test_cancelling_a_running_job_trips_its_token(queue):
+    cleaned = []
+
+    def func(job):
+        while True:
+            job.cancel_token.check()
+            time.sleep(0.01)
+    job = queue.submit(func, 'base', on_cancel=cleaned.append)
+    while job.status != 'running':
+        time.sleep(0.01)
+    queue.cancel(job.id)
+    assert job.wait(5)
+    assert job.status == 'cancelled'
+    # A running job cleans up after itself
+    assert cleaned == []
+
+
+
+def test_cancel_token_callbacks():
+    token = CancelToken()
+    calls = []
+    unregister = token.on_cancel(lambda: calls.append('kept'))
+    token.on_cancel(lambda: calls.append('dropped'))()
+    token.cancel()
+    token.cancel()
+    assert calls == ['kept']
+    unregister()
+    # Registering after cancellation runs the callback at once
+    token.on_cancel(lambda: calls.append('late'))
+    assert calls == ['kept', 'late']
+    with pytest.raises(TranscriptionCancelled):
+        token.check()
+
+
+def test_slot_callers_go_ahead_of_queued_jobs(queue):
+    func, started, release = blocking_job()
+    queue.submit(func, 'base')
+    assert started.wait(5)
+    order = []
+    queued = queue.submit(lambda job: order.append('job') or {}, 'base')
+
+    def live_pass():
+        with queue.slot('base'):
+            order.append('slot')
+            time.sleep(0.05)
+    thread = threading.Thread(target=live_pass)
+    thread.start()
+    time.sleep(0.1)
+    release.set()
+    thread.join(5)
+    assert queued.wait(5)
+    assert order == ['slot', 'job']
+    assert queue.stats()['running'] == 0
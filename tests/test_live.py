@@ -0,0 +1,122 @@
+import threading
+
+import numpy as np
+
+from chunking import SAMPLE_RATE
+from live import LiveTranscriber
+
+
+class ScriptedModel:
+    """Stands in for Whisper: hears the scripted words that lie fully inside the audio it is given.
+
+    ``script`` holds ``(word, start, end)`` on the stream timeline. The
+    stream position of the audio is worked out from how much has been fed,
+    since the transcriber only passes the tail of the stream.
+    """
+
+    def __init__(self, script, language='en'):
+        self.script = script
+        self.language = language
+        self.fed_seconds = 0.0
+        self.calls = []
+
+    def transcribe(self, audio, language=None, initial_prompt=None, word_timestamps=False, **options):
+        end = self.fed_seconds
+        offset = end - len(audio) / SAMPLE_RATE
+        self.calls.append({'seconds': len(audio) / SAMPLE_RATE, 'language': language, 'prompt': initial_prompt})
+        words = [{'word': word, 'start': start - offset, 'end': stop - offset, 'probability': 0.9}
+                 for word, start, stop in self.script if start >= offset - 0.05 and stop <= end]
+        return {'language': self.language, 'segments': [{'words': words}]}
+
+
+def feed_seconds(transcriber, model, seconds):
+    pcm = (np.full(int(seconds * SAMPLE_RATE), 1000, dtype=np.int16)).tobytes()
+    transcriber.feed(pcm)
+    model.fed_seconds += seconds
+
+
+SCRIPT = [(' One', 0.2, 0.6), (' two', 0.8, 1.2), (' three.', 1.4, 1.9), (' Four', 3.2, 3.6), (' five.', 3.8, 4.3)]
+
+
+def test_words_are_committed_once_two_passes_agree():
+    model = ScriptedModel(SCRIPT)
+    transcriber = LiveTranscriber(model, step_seconds=1.0)
+
+    feed_seconds(transcriber, model, 1.0)
+    update = transcriber.process()
+    assert update['committed'] == ''
+    assert update['tentative'] == ' One'
+
+    feed_seconds(transcriber, model, 1.0)
+    update = transcriber.process()
+    assert update['committed'] == ' One'
+    assert update['tentative'] == ' two three.'
+
+    feed_seconds(transcriber, model, 3.0)
+    transcriber.close()
+    update = transcriber.finish()
+    assert update['committed'] == ' two three. Four five.'
+    assert update['tentative'] == ''
+    # The first pass learned the language and later passes are told it
+    assert [call['language'] for call in model.calls] == [None, 'en', 'en']
+
+    result = transcriber.result()
+    assert result['language'] == 'en'
+    assert result['text'] == ' One two three. Four five.'
+    assert [segment['text'] for segment in result['segments']] == [' One two three.', ' Four five.']
+    assert result['segments'][1]['start'] == 3.2
+
+
+def test_buffer_is_trimmed_behind_committed_words():
+    script = [(f" w{i}", i + 0.1, i + 0.6) for i in range(30)]
+    model = ScriptedModel(script)
+    transcriber = LiveTranscriber(model, step_seconds=1.0, buffer_seconds=5, max_buffer_seconds=8)
+    for _ in range(20):
+        feed_seconds(transcriber, model, 1.0)
+        transcriber.process()
+    assert max(call['seconds'] for call in model.calls) <= 8
+    assert len(transcriber.committed) >= 15
+    # Committed text from before the buffer is passed as the prompt
+    assert model.calls[-1]['prompt'].startswith(' w0 w1')
+
+
+def test_disagreeing_passes_are_committed_when_the_buffer_is_full():
+    class FlakyModel(ScriptedModel):
+        def transcribe(self, audio, **kwargs):
+            result = super().transcribe(audio, **kwargs)
+            # Each pass hears the first word differently, so no two passes agree
+            for segment in result['segments']:
+                if segment['words']:
+                    segment['words'][0]['word'] = f" guess{len(self.calls)}"
+            return result
+
+    model = FlakyModel([(f" w{i}", i + 0.1, i + 0.6) for i in range(10)])
+    transcriber = LiveTranscriber(model, step_seconds=1.0, buffer_seconds=3, max_buffer_seconds=4)
+    for _ in range(4):
+        feed_seconds(transcriber, model, 1.0)
+        update = transcriber.process()
+    assert update['committed'] != ''
+    assert len(transcriber.committed) >= 2
+
+
+def test_feed_keeps_a_sample_split_across_chunks():
+    transcriber = LiveTranscriber(ScriptedModel([]))
+    pcm = np.arange(4, dtype=np.int16).tobytes()
+    transcriber.feed(pcm[:3])
+    transcriber.feed(pcm[3:])
+    assert transcriber.received_seconds == 4 / SAMPLE_RATE
+
+
+def test_wait_for_audio_returns_false_once_closed():
+    model = ScriptedModel([])
+    transcriber = LiveTranscriber(model, step_seconds=1.0)
+    feed_seconds(transcriber, model, 1.0)
+    assert transcriber.wait_for_audio(timeout=0)
+    transcriber.process()
+    # No pass is due until more audio arrives; closing the stream ends the wait
+    threading.Timer(0.05, transcriber.close).start()
+    assert not transcriber.wait_for_audio(timeout=5)
+
+
+def test_nothing_to_process_without_audio():
+    assert LiveTranscriber(ScriptedModel([])).process() is None
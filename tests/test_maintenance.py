@@ -0,0 +1,153 @@
+import os
+import time
+from collections import namedtuple
+
+import pytest
+
+import maintenance as maintenance_module
+from catalog import TranscriptCatalog
+from conftest import make_transcript
+from exporters import ExportCache
+from maintenance import InsufficientStorageError, Maintenance
+from transcript_store import TRANSCRIPT_EXTENSION, write_transcript
+
+DiskUsage = namedtuple('DiskUsage', 'total used free')
+
+
+class FakeDisk:
+    """Free space reported for every folder, as ``shutil.disk_usage`` would."""
+
+    def __init__(self, free):
+        self.free = free
+
+    def usage(self, folder):
+        return DiskUsage(10**6, 10**6 - self.free, self.free)
+
+
+class ShrinkableCache:
+    """A cache on ``disk`` that gives up space on request and records what was asked of it."""
+
+    def __init__(self, disk, nbytes):
+        self.disk = disk
+        self.nbytes = nbytes
+        self.requests = []
+
+    def shrink(self, nbytes):
+        self.requests.append(nbytes)
+        freed = min(nbytes, self.nbytes)
+        self.nbytes -= freed
+        self.disk.free += freed
+        return (1 if freed else 0), freed
+
+
+@pytest.fixture
+def folders(tmp_path):
+    paths = {name: tmp_path / name for name in ('uploads', 'transcripts', 'exports')}
+    for path in paths.values():
+        path.mkdir()
+    return paths
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return TranscriptCatalog(str(tmp_path / 'catalog.sqlite3'))
+
+
+def make_maintenance(folders, **options):
+    return Maintenance(str(folders['uploads']), str(folders['transcripts']), ExportCache(str(folders['exports'])),
+                       **options)
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_old_uploads_and_abandoned_partial_writes_are_removed(folders):
+    old_upload = folders['uploads'] / 'old.wav'
+    new_upload = folders['uploads'] / 'new.wav'
+    partial = folders['transcripts'] / 'a.transcript.tmp'
+    for path in (old_upload, new_upload, partial):
+        path.write_bytes(b'x' * 100)
+    age(old_upload, 2 * 3600)
+    age(partial, 3600)
+
+    maintenance = make_maintenance(folders, upload_max_age_seconds=3600, orphan_grace_seconds=300)
+    maintenance.run_once()
+    assert not old_upload.exists() and not partial.exists()
+    assert new_upload.exists()
+    reclaimed = {(entry['area'], entry['reason']): entry['files'] for entry in maintenance.stats()['reclaimed']}
+    assert reclaimed == {('uploads', 'age'): 1, ('temp', 'orphan'): 1}
+
+
+def test_transcripts_past_their_age_are_removed(folders, catalog):
+    removed = []
+    for name, timestamp in (('old', '2000-01-01T00:00:00'), ('new', '2999-01-01T00:00:00')):
+        path = write_transcript(str(folders['transcripts'] / f"{name}{TRANSCRIPT_EXTENSION}"),
+                                make_transcript(timestamp=timestamp))
+        catalog.add(path)
+    maintenance = make_maintenance(folders, catalog=catalog, transcript_max_age_seconds=24 * 3600,
+                                   on_transcript_removed=removed.append)
+    maintenance.run_once()
+    assert removed == [f"old{TRANSCRIPT_EXTENSION}"]
+    assert not (folders['transcripts'] / f"old{TRANSCRIPT_EXTENSION}").exists()
+    assert catalog.get(f"old{TRANSCRIPT_EXTENSION}") is None
+    assert catalog.get(f"new{TRANSCRIPT_EXTENSION}") is not None
+
+
+def test_source_quota_removes_oldest_first(folders, catalog):
+    for i in range(3):
+        path = write_transcript(str(folders['transcripts'] / f"t{i}{TRANSCRIPT_EXTENSION}"),
+                                make_transcript(source='youtube', timestamp=f"2025-01-0{i + 1}T00:00:00"))
+        catalog.add(path)
+    quota = sum(catalog.get(f"t{i}{TRANSCRIPT_EXTENSION}")['bytes'] for i in (1, 2))
+    maintenance = make_maintenance(folders, catalog=catalog, source_quotas={'youtube': quota})
+    maintenance.run_once()
+    assert [entry['filename'] for entry in catalog.list(sort='created_at', order='asc')['transcripts']] == [
+        f"t1{TRANSCRIPT_EXTENSION}", f"t2{TRANSCRIPT_EXTENSION}"]
+
+
+def test_check_reclaims_cache_space_before_refusing(folders, monkeypatch):
+    disk = FakeDisk(1000)
+    monkeypatch.setattr(maintenance_module.shutil, 'disk_usage', disk.usage)
+    cache = ShrinkableCache(disk, 500)
+    maintenance = make_maintenance(folders, caches=[('pcm', cache)], min_free_bytes=1000)
+    maintenance.check(300)
+    assert cache.requests == [300]
+
+    with pytest.raises(InsufficientStorageError) as error:
+        maintenance.check(10_000)
+    assert error.value.needed_bytes == 11_000
+    assert maintenance.stats()['rejected'] == 1
+
+
+def test_reservations_count_against_free_space(folders, monkeypatch):
+    monkeypatch.setattr(maintenance_module.shutil, 'disk_usage', FakeDisk(3000).usage)
+    maintenance = make_maintenance(folders, min_free_bytes=1000)
+    reservation = maintenance.reserve(1500)
+    with pytest.raises(InsufficientStorageError):
+        maintenance.reserve(1000)
+    reservation.release()
+    reservation.release()
+    maintenance.reserve(1000).release()
+    assert maintenance.stats()['reserved_bytes'] == 0
+
+
+def test_uploads_in_use_are_kept_whatever_their_age(folders):
+    held = folders['uploads'] / 'queued.wav'
+    released = folders['uploads'] / 'done.wav'
+    for path in (held, released):
+        path.write_bytes(b'x' * 100)
+        age(path, 2 * 3600)
+    maintenance = make_maintenance(folders, upload_max_age_seconds=3600, orphan_grace_seconds=300)
+    maintenance.active_uploads.add(str(held))
+    maintenance.active_uploads.add(str(released))
+    maintenance.active_uploads.discard(str(released))
+    maintenance.run_once()
+    maintenance.sweep_orphans()
+    assert held.exists() and not released.exists()
+    assert maintenance.stats()['active_uploads'] == 1
+
+    maintenance.active_uploads.discard(str(held))
+    maintenance.run_once()
+    assert not held.exists()
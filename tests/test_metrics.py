@@ -0,0 +1,114 @@
+import subprocess
+import sys
+
+import pytest
+
+from job_store import RETIRED_PROCESS, JobStore
+from metrics import MetricsRegistry, StageTimer
+
+
+def define(registry):
+    jobs = registry.counter('jobs_total', 'Jobs finished.', ['status'])
+    free = registry.gauge('disk_free_bytes', 'Free disk space.', aggregate='max')
+    workers = registry.gauge('busy_workers', 'Busy workers.')
+    seconds = registry.histogram('job_seconds', 'Job duration.', buckets=(1, 10))
+    return jobs, free, workers, seconds
+
+
+def test_rendering():
+    registry = MetricsRegistry()
+    jobs, free, workers, seconds = define(registry)
+    jobs.inc(status='completed')
+    jobs.inc(2, status='failed "badly"')
+    workers.set(3)
+    seconds.observe(0.5)
+    seconds.observe(5)
+    # Collectors copy in values kept elsewhere just before rendering
+    registry.collector(lambda: free.set(2.5e9))
+    assert registry.render().splitlines() == [
+        '# HELP jobs_total Jobs finished.',
+        '# TYPE jobs_total counter',
+        'jobs_total{status="completed"} 1',
+        'jobs_total{status="failed \\"badly\\""} 2',
+        '# HELP disk_free_bytes Free disk space.',
+        '# TYPE disk_free_bytes gauge',
+        'disk_free_bytes 2500000000.0',
+        '# HELP busy_workers Busy workers.',
+        '# TYPE busy_workers gauge',
+        'busy_workers 3',
+        '# HELP job_seconds Job duration.',
+        '# TYPE job_seconds histogram',
+        'job_seconds_bucket{le="1"} 1',
+        'job_seconds_bucket{le="10"} 2',
+        'job_seconds_bucket{le="+Inf"} 2',
+        'job_seconds_sum 5.5',
+        'job_seconds_count 2',
+    ]
+
+
+def test_failing_collector_does_not_break_the_scrape():
+    registry = MetricsRegistry()
+    jobs = registry.counter('jobs_total', 'Jobs finished.')
+
+    @registry.collector
+    def broken():
+        raise RuntimeError('stats unavailable')
+    jobs.inc()
+    assert 'jobs_total 1' in registry.render().splitlines()
+
+
+def test_stage_timer():
+    timer = StageTimer()
+    with timer.stage('decode'):
+        pass
+    timer.add('decode', 1.0)
+    timer.add('upload', 0.25)
+    assert timer.to_dict()['upload'] == 0.25
+    assert 1.0 <= timer.to_dict()['decode'] < 1.1
+    with pytest.raises(ValueError):
+        with timer.stage('inference'):
+            raise ValueError
+    assert 'inference' in timer.seconds
+
+
+def exited_pid():
+    """The ID of a process that has already exited."""
+    return int(subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True, check=True).stdout)
+
+
+def test_values_are_aggregated_across_processes_through_the_store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    workers = [MetricsRegistry(store=store), MetricsRegistry(store=store)]
+    for registry, (done, free_bytes, busy, job_seconds) in zip(workers, ((1, 100, 1, 0.5), (2, 300, 2, 5))):
+        jobs, free, busy_workers, seconds = define(registry)
+        jobs.inc(done, status='completed')
+        free.set(free_bytes)
+        busy_workers.set(busy)
+        seconds.observe(job_seconds)
+        registry.publish()
+
+    lines = workers[0].render().splitlines()
+    assert 'jobs_total{status="completed"} 3' in lines
+    # Every process sees the same disk, so its free space is the largest reading, not the sum
+    assert 'disk_free_bytes 300' in lines
+    assert 'busy_workers 3' in lines
+    assert 'job_seconds_count 2' in lines and 'job_seconds_sum 5.5' in lines
+
+
+def test_totals_of_exited_processes_are_kept(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    registry = MetricsRegistry(store=store)
+    jobs, free, busy_workers, seconds = define(registry)
+    jobs.inc(status='completed')
+    # An exited worker's counters are folded into the retired totals; its gauges are dropped
+    with store._connect() as conn:
+        conn.executemany(
+            "INSERT INTO metric_values (process, pid, name, kind, labels, value) VALUES (?, ?, ?, ?, ?, ?)",
+            [('gone', exited_pid(), 'jobs_total', 'counter', '["completed"]', '4'),
+             ('gone', exited_pid(), 'busy_workers', 'gauge', '[]', '7')])
+    for _ in range(2):
+        lines = registry.render().splitlines()
+        assert 'jobs_total{status="completed"} 5' in lines
+        assert not any(line.startswith('busy_workers ') for line in lines)
+    assert {row[0] for row in store.metric_values()} == {RETIRED_PROCESS, registry._process_id()}
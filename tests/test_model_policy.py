@@ -0,0 +1,64 @@
+from model_policy import ModelPolicy
+
+
+def test_int8_variants_learn_their_own_speed():
+    policy = ModelPolicy(sizes=('tiny', 'small'))
+    policy.observe_real_time_factor('small:int8', 0.1)
+    factors = policy.stats()['real_time_factors']
+    assert factors['small:int8'] < factors['small'] == 0.3
+
+    # An int8 small model observed to be fast is chosen where fp32 small is not
+    for _ in range(20):
+        policy.observe_real_time_factor('small:int8', 0.1)
+    assert policy.choose(1200, 0, 0, 1, loaded_sizes=['small', 'small:int8'])[0] == 'tiny'
+    assert policy.choose(1200, 0, 0, 1, loaded_sizes=['small', 'small:int8'], precision='int8')[0] == 'small'
+
+
+def test_most_accurate_size_that_fits_the_target_is_chosen():
+    policy = ModelPolicy(sizes=('tiny', 'base', 'small', 'medium'), target_seconds=300)
+    loaded = ['tiny', 'base', 'small', 'medium']
+    assert policy.choose(300, 0, 0, 2, loaded_sizes=loaded)[0] == 'medium'
+    assert policy.choose(900, 0, 0, 2, loaded_sizes=loaded)[0] == 'small'
+    size, details = policy.choose(2000, 0, 0, 2, loaded_sizes=loaded)
+    assert size == 'base'
+    assert details == {'duration_seconds': 2000, 'queue_wait_seconds': 0.0, 'estimated_seconds': 200.0,
+                       'target_seconds': 300}
+    # Nothing fits: the fastest size is used
+    assert policy.choose(100_000, 0, 0, 2, loaded_sizes=loaded)[0] == 'tiny'
+
+
+def test_unknown_duration_counts_as_the_assumed_length():
+    policy = ModelPolicy(target_seconds=300, assumed_seconds=900)
+    size, details = policy.choose(None, 0, 0, 1, loaded_sizes=['tiny', 'base', 'small', 'medium'])
+    assert size == 'small'
+    assert details['duration_seconds'] is None
+
+
+def test_queue_load_pushes_towards_faster_sizes():
+    policy = ModelPolicy(target_seconds=300)
+    loaded = ['tiny', 'base', 'small', 'medium']
+    policy.observe_job(100)
+    assert policy.queue_wait_seconds(queued=0, running=1, workers=2) == 0.0
+    assert policy.queue_wait_seconds(queued=3, running=2, workers=2) == 200.0
+    assert policy.choose(300, 0, 1, 2, loaded_sizes=loaded)[0] == 'medium'
+    assert policy.choose(300, 3, 2, 2, loaded_sizes=loaded)[0] == 'small'
+
+
+def test_loading_a_model_counts_against_the_target():
+    policy = ModelPolicy(target_seconds=300)
+    assert policy.choose(300, 0, 0, 1, loaded_sizes=['tiny', 'base', 'small'],
+                         load_seconds={'medium': 90})[0] == 'small'
+    assert policy.choose(300, 0, 0, 1, loaded_sizes=['tiny', 'base', 'small'],
+                         load_seconds={'medium': 30})[0] == 'medium'
+
+
+def test_observed_speeds_replace_the_defaults_gradually():
+    policy = ModelPolicy(smoothing=0.5)
+    policy.observe_real_time_factor('base', 0.3)
+    policy.observe_job(10)
+    policy.observe_job(20)
+    policy.observe_real_time_factor('large', 5)
+    stats = policy.stats()
+    assert stats['real_time_factors']['base'] == 0.2
+    assert stats['job_seconds'] == 15.0
+    assert 'large' not in stats['real_time_factors']
@@ -0,0 +1,82 @@
+import pytest
+
+from model_registry import ModelRegistry, estimated_model_mb
+
+
+class Model:
+    """Stands in for a loaded Whisper model; its size comes from the estimates."""
+
+    def __init__(self, model_size):
+        self.model_size = model_size
+
+
+@pytest.fixture
+def registry():
+    return ModelRegistry(Model, memory_budget_mb=2000)
+
+
+def test_unpinned_budget_leaves_out_pinned_models_and_other_charges(registry):
+    registry.get('small')
+    registry.pin('base')
+    registry.charge('other', 100)
+    registry.charge('chunk_pool', 300)
+    # The small model can be evicted; the pinned base model and the other charge stay
+    assert registry.unpinned_budget_mb(excluding_charge='chunk_pool') == 2000 - estimated_model_mb('base') - 100
+    assert registry.unpinned_budget_mb() == 2000 - estimated_model_mb('base') - 400
+
+
+def test_models_are_loaded_once_and_shared(registry):
+    first = registry.get('base')
+    assert registry.get('base') is first
+    stats = registry.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['memory_mb'] == estimated_model_mb('base')
+
+
+def test_least_recently_used_model_is_evicted(registry):
+    registry.get('small')
+    registry.get('base')
+    registry.get('small')
+    # A second small-sized model only fits without base, the least recently used
+    registry.get('small.en')
+    assert registry.loaded_sizes() == ['small', 'small.en']
+    assert registry.stats()['evictions'] == 1
+
+
+def test_pinned_models_are_not_evicted(registry):
+    model = registry.pin('small')
+    registry.get('base')
+    registry.get('small.en')
+    assert registry.is_loaded('small')
+    registry.evict('small')
+    assert registry.is_loaded('small')
+    registry.unpin('small')
+    registry.evict('small')
+    assert not registry.is_loaded('small')
+    assert registry.pin('small') is not model
+
+
+def test_failed_pin_is_undone():
+    def fail(model_size):
+        raise RuntimeError('no weights')
+    registry = ModelRegistry(fail)
+    with pytest.raises(RuntimeError):
+        registry.pin('base')
+    assert registry.stats()['pinned'] == {}
+
+
+def test_charges_count_against_the_budget(registry):
+    registry.get('small')
+    registry.get('base')
+    registry.charge('chunk_pool', 1000)
+    # Making room for the charge evicts the least recently used model
+    assert registry.loaded_sizes() == ['base']
+    assert registry.stats()['charged_mb'] == {'chunk_pool': 1000}
+    registry.charge('chunk_pool', 0)
+    assert registry.stats()['charged_mb'] == {}
+    registry.get('small')
+    assert registry.loaded_sizes() == ['base', 'small']
+
+
+def test_quantized_models_are_estimated_smaller():
+    assert estimated_model_mb('small:int8') < estimated_model_mb('small')
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from pcm_cache import SAMPLE_RATE, PCMCache, file_key
+
+
+def audio(seconds, value=0.1):
+    return np.full(int(seconds * SAMPLE_RATE), value, dtype=np.float32)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    return str(tmp_path / 'pcm')
+
+
+def npy_files(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.npy'))
+
+
+def test_short_audio_stays_in_memory(folder):
+    cache = PCMCache(folder, mmap_min_seconds=10)
+    short = audio(1)
+    assert cache.put('a', short, {'title': 'A'}) is short
+    assert npy_files(folder) == []
+    cached, metadata = cache.get('a')
+    assert cached is short and metadata == {'title': 'A'}
+    assert cache.get('b') is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_long_audio_comes_back_memory_mapped(folder):
+    cache = PCMCache(folder, mmap_min_seconds=1)
+    long = audio(2)
+    returned = cache.put('a', long, {'title': 'A'})
+    assert isinstance(returned, np.memmap) and not returned.flags.writeable
+    np.testing.assert_array_equal(returned, long)
+    cached, metadata = PCMCache(folder, mmap_min_seconds=1).get('a')
+    assert isinstance(cached, np.memmap)
+    assert metadata == {'title': 'A'}
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_memory_tier_evicts_least_recently_used(folder):
+    cache = PCMCache(folder, memory_max_bytes=2 * audio(1).nbytes, mmap_min_seconds=10)
+    for key in 'abc':
+        cache.put(key, audio(1))
+        if key == 'b':
+            cache.get('a')
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+
+
+def test_disk_tier_evicts_least_recently_used_but_keeps_the_new_entry(folder):
+    size = audio(1).nbytes + 128
+    cache = PCMCache(folder, disk_max_bytes=2 * size, mmap_min_seconds=0)
+    cache.put('a', audio(1))
+    cache.put('b', audio(1))
+    cache.get('a')
+    cache.put('c', audio(1))
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert len(npy_files(folder)) == 2
+    # A single entry larger than the budget is still cached
+    cache.put('d', audio(3))
+    assert npy_files(folder) == [cache._name('d') + '.npy']
+
+
+def test_files_written_by_another_process_are_adopted(folder):
+    cache = PCMCache(folder, mmap_min_seconds=0)
+    PCMCache(folder, mmap_min_seconds=0).put('a', audio(1))
+    assert 'a' in cache
+    assert cache.get('a') is not None
+    assert cache.stats()['disk_entries'] == 1
+
+
+def test_shrink_frees_the_oldest_files(folder):
+    cache = PCMCache(folder, mmap_min_seconds=0)
+    cache.put('a', audio(1), {'title': 'A'})
+    cache.put('b', audio(1))
+    files, freed = cache.shrink(1)
+    assert files == 1 and freed > audio(1).nbytes
+    assert 'a' not in cache and 'b' in cache
+    assert os.listdir(folder) == [cache._name('b') + '.npy']
+
+
+def test_file_key_changes_when_the_file_does(tmp_path):
+    path = tmp_path / 'a.wav'
+    path.write_bytes(b'one')
+    key = file_key(str(path))
+    assert file_key(str(path)) == key
+    path.write_bytes(b'three')
+    assert file_key(str(path)) != key
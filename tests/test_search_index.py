@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from conftest import make_transcript
+from search_index import SearchIndex, build_match_query
+from transcript_store import TRANSCRIPT_EXTENSION, write_transcript
+
+
+@pytest.fixture
+def folder(tmp_path):
+    path = tmp_path / 'transcripts'
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / 'search.sqlite3'))
+
+
+def save(folder, name, words, **metadata):
+    return write_transcript(str(folder / f"{name}{TRANSCRIPT_EXTENSION}"), make_transcript(words, **metadata))
+
+
+def files(results):
+    return sorted(result['transcript_file'] for result in results['results'])
+
+
+def rowid_ranges(index):
+    """Each indexed file's recorded ``(first_rowid, segment_count)`` and the rowids its segments really have."""
+    with index._connect() as conn:
+        ranges = {row['filename']: (row['first_rowid'], row['segment_count'])
+                  for row in conn.execute("SELECT filename, first_rowid, segment_count FROM transcripts")}
+        rowids = {}
+        for row in conn.execute("SELECT segments_fts.rowid, filename FROM segments_fts "
+                                "JOIN transcripts ON transcripts.id = segments_fts.transcript_id"):
+            rowids.setdefault(row['filename'], []).append(row[0])
+    return ranges, {name: sorted(ids) for name, ids in rowids.items()}
+
+
+def test_match_query_quotes_terms_and_phrases():
+    assert build_match_query('red "big dog" NEAR(') == '"red" "big dog" "NEAR("'
+    assert build_match_query('  ""  ') == ''
+
+
+def test_words_and_phrases(folder, index):
+    index.add(save(folder, 'a', ('The', 'big', 'red', 'dog.')))
+    index.add(save(folder, 'b', ('A', 'red', 'big', 'dog.')))
+    assert files(index.search('big dog')) == [f"a{TRANSCRIPT_EXTENSION}", f"b{TRANSCRIPT_EXTENSION}"]
+    assert files(index.search('"big red"')) == [f"a{TRANSCRIPT_EXTENSION}"]
+    assert files(index.search('"red big" dog')) == [f"b{TRANSCRIPT_EXTENSION}"]
+    result = index.search('"big red"')['results'][0]
+    assert result['segments'][0]['highlighted'] == ' The <mark>big red</mark> dog.'
+    assert index.search('')['total'] == 0
+
+
+def test_operators_in_queries_are_plain_text(folder, index):
+    index.add(save(folder, 'a', ('Cats', 'OR', 'dogs.')))
+    assert index.search('cats OR')['total'] == 1
+    assert index.search('AND')['total'] == 0
+
+
+def test_each_transcript_has_a_contiguous_rowid_range(folder, index):
+    a = save(folder, 'a', ('One.', 'Two.', 'Three.'))
+    b = save(folder, 'b', ('Four.', 'Five.'))
+    index.add(a)
+    index.add(b)
+    # Re-indexing moves a to a new range after b
+    index.add(a)
+    ranges, rowids = rowid_ranges(index)
+    for name, (first, count) in ranges.items():
+        assert rowids[name] == list(range(first, first + count))
+    assert ranges[f"a{TRANSCRIPT_EXTENSION}"][0] > ranges[f"b{TRANSCRIPT_EXTENSION}"][0]
+    index.remove(f"b{TRANSCRIPT_EXTENSION}")
+    assert index.search('four')['total'] == 0
+    assert index.search('one')['total'] == 1
+
+
+def test_sync_folder_follows_new_changed_and_deleted_files(folder, index):
+    a = save(folder, 'a', ('Apples.',))
+    b = save(folder, 'b', ('Bananas.',))
+    assert index.sync_folder(str(folder)) == 2
+    assert index.sync_folder(str(folder)) == 0
+
+    os.remove(b)
+    save(folder, 'a', ('Cherries.',))
+    stat = os.stat(a)
+    os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert index.sync_folder(str(folder)) == 1
+    assert index.search('bananas')['total'] == 0
+    assert index.search('apples')['total'] == 0
+    assert files(index.search('cherries')) == [f"a{TRANSCRIPT_EXTENSION}"]
+
+
+def test_sync_folder_survives_a_file_deleted_while_indexing(folder, index, monkeypatch):
+    a = save(folder, 'a', ('Apples.',))
+    save(folder, 'b', ('Bananas.',))
+    add = index.add
+
+    def add_after_deleting_a(path, transcript_data=None):
+        if path == a and os.path.exists(a):
+            os.remove(a)
+        return add(path, transcript_data)
+    monkeypatch.setattr(index, 'add', add_after_deleting_a)
+    assert index.sync_folder(str(folder)) == 1
+    assert index.search('apples')['total'] == 0
+    assert files(index.search('bananas')) == [f"b{TRANSCRIPT_EXTENSION}"]
+
+
+def test_pages(folder, index):
+    for i in range(5):
+        index.add(save(folder, f"t{i}", ('Shared', f"word{i}.")))
+    first = index.search('shared', per_page=2)
+    second = index.search('shared', page=2, per_page=2)
+    assert first['total'] == 5
+    assert len(first['results']) == len(second['results']) == 2
+    assert not set(files(first)) & set(files(second))
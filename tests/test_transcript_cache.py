@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from transcript_cache import TranscriptCache, hash_audio, make_key
+
+
+def entry(text):
+    return {'text': text, 'segments': [], 'language': 'en'}
+
+
+def entry_bytes(text):
+    return len(json.dumps(entry(text), separators=(',', ':')))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    return str(tmp_path / 'transcripts')
+
+
+def test_keys_follow_content_model_and_options():
+    audio = np.zeros(16000, dtype=np.float32)
+    content_id = hash_audio(audio)
+    assert content_id == hash_audio(audio.copy())
+    assert content_id != hash_audio(np.ones(16000, dtype=np.float32))
+    key = make_key(content_id, 'base', {'language': 'en', 'vad': False})
+    assert key == make_key(content_id, 'base', {'vad': False, 'language': 'en'})
+    assert key != make_key(content_id, 'small', {'language': 'en', 'vad': False})
+    assert key != make_key(content_id, 'base', {'language': 'de', 'vad': False})
+
+
+def test_round_trip_and_counters(folder):
+    cache = TranscriptCache(folder)
+    assert cache.get('a') is None
+    cache.put('a', entry('one'))
+    assert 'a' in cache
+    assert cache.get('a') == entry('one')
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(folder):
+    cache = TranscriptCache(folder, max_bytes=2 * entry_bytes('one'))
+    cache.put('a', entry('one'))
+    cache.put('b', entry('two'))
+    cache.get('a')
+    cache.put('c', entry('six'))
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert sorted(os.listdir(folder)) == ['a.json', 'c.json']
+
+
+def test_an_entry_larger_than_the_budget_is_kept_alone(folder):
+    cache = TranscriptCache(folder, max_bytes=10)
+    cache.put('a', entry('one'))
+    cache.put('b', entry('two'))
+    assert os.listdir(folder) == ['b.json']
+
+
+def test_entries_written_by_another_process_are_adopted(folder):
+    cache = TranscriptCache(folder)
+    other = TranscriptCache(folder)
+    other.put('a', entry('one'))
+    assert cache.get('a') == entry('one')
+    assert cache.stats()['entries'] == 1
+
+
+def test_index_is_rebuilt_oldest_first(folder):
+    cache = TranscriptCache(folder)
+    cache.put('a', entry('one'))
+    cache.put('b', entry('two'))
+    os.utime(os.path.join(folder, 'b.json'), (1, 1))
+    reopened = TranscriptCache(folder)
+    assert reopened.shrink(1) == (1, entry_bytes('two'))
+    assert 'b' not in reopened and 'a' in reopened
+
+
+def test_unreadable_entry_is_a_miss(folder):
+    cache = TranscriptCache(folder)
+    cache.put('a', entry('one'))
+    with open(os.path.join(folder, 'a.json'), 'w') as f:
+        f.write('{not json')
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
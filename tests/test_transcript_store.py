@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+import zipfile
+
+import pytest
+
+from transcript_store import TRANSCRIPT_EXTENSION, TranscriptReader, convert_legacy, write_transcript
+
+
+def test_round_trip(tmp_path, transcript):
+    path = write_transcript(str(tmp_path / f"a{TRANSCRIPT_EXTENSION}"), transcript)
+    assert zipfile.is_zipfile(path)
+    reader = TranscriptReader(path)
+    assert not reader.is_legacy
+    assert reader.text() == transcript['text']
+    assert reader.metadata()['language'] == 'en'
+    assert 'format_version' not in reader.metadata()
+    assert reader.to_dict()['segments'] == transcript['segments']
+
+
+def test_segments_leave_out_tokens_and_words_unless_asked(tmp_path, transcript):
+    path = write_transcript(str(tmp_path / f"a{TRANSCRIPT_EXTENSION}"), transcript)
+    segments = TranscriptReader(path).segments()
+    assert [segment['text'] for segment in segments] == [' Hello there.', ' How are you?']
+    assert 'tokens' not in segments[0] and 'words' not in segments[0]
+    with_tokens = TranscriptReader(path).segments(include_tokens=True)
+    assert with_tokens[1]['tokens'] == transcript['segments'][1]['tokens']
+
+
+def test_word_index_lookups(tmp_path, transcript):
+    path = write_transcript(str(tmp_path / f"a{TRANSCRIPT_EXTENSION}"), transcript)
+    words = TranscriptReader(path).words()
+    assert len(words) == 5
+    # 'are' is spoken from 1.5 s
+    index = words.at_time(1.7)
+    assert words.word(index)['word'] == 'are'
+    assert words.word(index)['segment'] == 1
+    assert words.at_char(transcript['text'].index('there')) == 1
+    assert [word['word'] for word in words.segment_words(0)] == [' Hello', ' there.']
+
+
+def test_transcript_without_words(tmp_path, transcript):
+    for segment in transcript['segments']:
+        del segment['words']
+    path = write_transcript(str(tmp_path / f"a{TRANSCRIPT_EXTENSION}"), transcript)
+    assert TranscriptReader(path).words() is None
+
+
+def test_legacy_json_is_read_and_converted(tmp_path, transcript):
+    legacy_path = tmp_path / 'legacy.json'
+    legacy_path.write_text(json.dumps(transcript), encoding='utf-8')
+    reader = TranscriptReader(str(legacy_path))
+    assert reader.is_legacy
+    assert reader.text() == transcript['text']
+    assert 'words' not in reader.segments()[0]
+    assert len(reader.words()) == 5
+
+    new_path = convert_legacy(str(legacy_path), remove=True)
+    assert new_path.endswith(TRANSCRIPT_EXTENSION)
+    assert not legacy_path.exists()
+    assert TranscriptReader(new_path).text() == transcript['text']
+
+
+def test_concurrent_writes_of_one_path_do_not_collide(tmp_path, transcript):
+    path = str(tmp_path / f"a{TRANSCRIPT_EXTENSION}")
+    threads = [threading.Thread(target=write_transcript, args=(path, transcript)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert TranscriptReader(path).text() == transcript['text']
+    assert os.listdir(tmp_path) == [f"a{TRANSCRIPT_EXTENSION}"]
+
+
+def test_failed_write_leaves_no_partial_file(tmp_path, transcript):
+    transcript['segments'][0]['text'] = object()
+    with pytest.raises(TypeError):
+        write_transcript(str(tmp_path / f"a{TRANSCRIPT_EXTENSION}"), transcript)
+    assert os.listdir(tmp_path) == []
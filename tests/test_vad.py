@@ -0,0 +1,76 @@
+import numpy as np
+
+from chunking import SAMPLE_RATE
+from vad import SpeechTimeline, compact_speech, detect_speech
+
+
+def tone(seconds, amplitude=0.3, pitch=180.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * pitch * t)).astype(np.float32)
+
+
+def silence(seconds, amplitude=0.0005, seed=0):
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def test_speech_separated_by_long_pauses_is_split():
+    audio = np.concatenate([silence(3), tone(2), silence(3, seed=1), tone(2), silence(3, seed=2)])
+    regions = detect_speech(audio)
+    assert len(regions) == 2
+    (first_start, first_end), (second_start, second_end) = regions
+    assert abs(first_start / SAMPLE_RATE - 3) < 0.4 and abs(first_end / SAMPLE_RATE - 5) < 0.4
+    assert abs(second_start / SAMPLE_RATE - 8) < 0.4 and abs(second_end / SAMPLE_RATE - 10) < 0.4
+
+
+def test_short_pauses_are_bridged():
+    audio = np.concatenate([silence(3), tone(1), silence(0.5, seed=1), tone(1), silence(3, seed=2)])
+    assert len(detect_speech(audio, min_silence_seconds=1.0)) == 1
+
+
+def test_continuous_speech_is_kept_whole():
+    audio = tone(10)
+    assert detect_speech(audio) == [(0, len(audio))]
+
+
+def test_steady_noise_is_kept_whole():
+    rng = np.random.default_rng(0)
+    audio = (0.05 * rng.standard_normal(10 * SAMPLE_RATE)).astype(np.float32)
+    assert detect_speech(audio) == [(0, len(audio))]
+
+
+def test_digital_silence_has_no_speech():
+    assert detect_speech(np.zeros(5 * SAMPLE_RATE, dtype=np.float32)) == []
+    assert detect_speech(np.zeros(0, dtype=np.float32)) == []
+
+
+def test_timeline_maps_compacted_times_back():
+    regions = [(2 * SAMPLE_RATE, 4 * SAMPLE_RATE), (10 * SAMPLE_RATE, 11 * SAMPLE_RATE)]
+    timeline = SpeechTimeline(regions, 12 * SAMPLE_RATE)
+    assert timeline.to_original(0.5) == 2.5
+    assert timeline.to_original(2.5) == 10.5
+    # A time on the join belongs to the end of the first region or the start of the second
+    assert timeline.to_original(2.0, is_end=True) == 4.0
+    assert timeline.to_original(2.0) == 10.0
+
+    segment = timeline.remap_segment({'start': 1.5, 'end': 2.0, 'words': [{'word': ' hi', 'start': 1.5, 'end': 2.0}]})
+    assert (segment['start'], segment['end']) == (3.5, 4.0)
+    assert (segment['words'][0]['start'], segment['words'][0]['end']) == (3.5, 4.0)
+
+    report = timeline.report()
+    assert report['regions'] == 2
+    assert report['speech_seconds'] == 3.0
+    assert report['skipped_seconds'] == 9.0
+
+
+def test_compact_speech_concatenates_regions():
+    audio = np.concatenate([silence(3), tone(2), silence(3, seed=1), tone(2), silence(3, seed=2)])
+    speech, timeline = compact_speech(audio)
+    assert len(speech) == sum(end - start for start, end in timeline.regions)
+    assert len(speech) < len(audio)
+
+
+def test_compact_speech_of_silence_is_empty():
+    speech, timeline = compact_speech(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    assert len(speech) == 0
+    assert timeline.report()['skipped_ratio'] == 1.0
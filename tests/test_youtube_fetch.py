@@ -0,0 +1,163 @@
+import shutil
+import threading
+import wave
+
+import numpy as np
+import pytest
+
+import youtube_fetch
+from chunking import SAMPLE_RATE
+from jobs import CancelToken, TranscriptionCancelled
+from youtube_fetch import Fetch, YouTubeFetcher
+
+
+class LocalYDL:
+    """Stands in for ``yt_dlp.YoutubeDL``: resolves every URL to a local audio file.
+
+    ``videos`` maps a URL to ``(path, info)``; unknown URLs fail the way
+    yt-dlp does for a private video.
+    """
+
+    def __init__(self, videos, options=None):
+        self.videos = videos
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        assert not download
+        if url not in self.videos:
+            raise Exception(f"ERROR: [youtube] {url}: Private video")
+        path, info = self.videos[url]
+        return dict(info, url=path, acodec='pcm_s16le')
+
+
+def local_stream_decode(source, buffer, headers=None, cancel_token=None, on_chunk=None):
+    """Stands in for ffmpeg: streams a raw s16le file into ``buffer`` in one-second chunks."""
+    with open(source, 'rb') as f:
+        data = f.read()
+    step = 2 * SAMPLE_RATE
+    for start in range(0, len(data), step):
+        if cancel_token is not None:
+            cancel_token.check()
+        buffer.append(data[start:start + step])
+        if on_chunk is not None:
+            on_chunk(buffer)
+    buffer.finish()
+
+
+def write_pcm(path, seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pcm = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    path.write_bytes(pcm.tobytes())
+    return pcm
+
+
+@pytest.fixture
+def local_decoder(monkeypatch):
+    monkeypatch.setattr(youtube_fetch, 'stream_decode', local_stream_decode)
+
+
+def make_fetcher(videos, **options):
+    ready = []
+    fetcher = YouTubeFetcher(workers=2, ydl_factory=lambda ydl_options: LocalYDL(videos, ydl_options),
+                             on_ready=ready.append, **options)
+    return fetcher, ready
+
+
+def test_short_video_is_ready_before_it_is_fully_fetched(tmp_path, local_decoder):
+    path = tmp_path / 'short.pcm'
+    pcm = write_pcm(path, 10)
+    url = 'https://www.youtube.com/watch?v=short'
+    fetcher, ready = make_fetcher({url: (str(path), {'id': 'short', 'title': 'Short', 'duration': 10})},
+                                  ready_seconds=3, progressive_max_seconds=60)
+    events = []
+    fetch = fetcher.fetch(url, progress=lambda event, **data: events.append(data))
+    assert fetch.ready.wait(5)
+    audio = fetch.buffer.to_array()
+    fetcher.shutdown()
+
+    assert fetch.error is None
+    assert fetch.progressive
+    assert (fetch.video_id, fetch.title, fetch.duration) == ('short', 'Short', 10)
+    assert ready == [fetch]
+    np.testing.assert_allclose(audio, pcm / 32768.0, atol=1e-6)
+    assert events[0]['status'] == 'started'
+    assert events[-1] == {'status': 'finished', 'buffered_seconds': 10.0}
+
+
+def test_long_video_is_ready_only_once_complete(tmp_path, local_decoder):
+    path = tmp_path / 'long.pcm'
+    write_pcm(path, 5)
+    url = 'https://www.youtube.com/watch?v=long'
+    fetcher, ready = make_fetcher({url: (str(path), {'id': 'long', 'title': 'Long', 'duration': 5})},
+                                  ready_seconds=1, progressive_max_seconds=2)
+    fetch = Fetch(url)
+    seen_ready_early = []
+
+    def progress(event, **data):
+        seen_ready_early.append(fetch.ready.is_set() and not fetch.buffer.finished)
+    fetcher.start(fetch, progress)
+    assert fetch.ready.wait(5)
+    fetcher.shutdown()
+    assert fetch.error is None
+    assert len(seen_ready_early) > 2
+    assert not fetch.progressive
+    assert fetch.buffer.finished
+    assert not any(seen_ready_early)
+
+
+def test_unavailable_video_reports_a_friendly_error(local_decoder):
+    fetcher, ready = make_fetcher({})
+    fetch = fetcher.fetch('https://www.youtube.com/watch?v=private')
+    assert fetch.ready.wait(5)
+    fetcher.shutdown()
+    assert 'unavailable or private' in str(fetch.error)
+    assert fetch.buffer.finished
+    with pytest.raises(Exception):
+        fetch.buffer.wait_for(1)
+
+
+def test_cancelled_fetch_stops(tmp_path, local_decoder):
+    path = tmp_path / 'video.pcm'
+    write_pcm(path, 5)
+    url = 'https://www.youtube.com/watch?v=cancel'
+    blocked = threading.Event()
+    videos = {url: (str(path), {'id': 'cancel', 'title': 'Cancel', 'duration': 5})}
+
+    class SlowYDL(LocalYDL):
+        def extract_info(self, url, download=False):
+            blocked.wait(5)
+            return super().extract_info(url, download)
+
+    fetcher = YouTubeFetcher(workers=1, ydl_factory=lambda options: SlowYDL(videos, options))
+    token = CancelToken()
+    fetch = fetcher.fetch(url, cancel_token=token)
+    token.cancel()
+    blocked.set()
+    assert fetch.ready.wait(5)
+    fetcher.shutdown()
+    assert isinstance(fetch.error, TranscriptionCancelled)
+    assert fetch.buffer.samples == 0
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='needs FFmpeg')
+def test_fetch_decodes_with_ffmpeg(tmp_path):
+    path = tmp_path / 'video.wav'
+    pcm = write_pcm(tmp_path / 'video.pcm', 2)
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+    url = 'https://www.youtube.com/watch?v=wav'
+    fetcher, ready = make_fetcher({url: (str(path), {'id': 'wav', 'title': 'Wav', 'duration': 2})})
+    fetch = fetcher.fetch(url)
+    assert fetch.ready.wait(10)
+    fetcher.shutdown()
+    assert fetch.error is None
+    assert abs(fetch.buffer.seconds - 2) < 0.05
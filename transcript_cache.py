@@ -0,0 +1,142 @@
+"""
+Content-addressed transcript cache.
+Transcription results are stored on disk under a key derived from the audio
+content (or YouTube video ID), the model size and the decode options, so a
+repeat submission of the same audio skips Whisper entirely.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def hash_audio(audio):
+    """Content ID of a decoded PCM array."""
+    return 'audio:' + hashlib.sha256(audio.tobytes()).hexdigest()
+
+
+def make_key(content_id, model_size, options=None):
+    """Cache key for ``content_id`` transcribed with ``model_size`` and ``options``."""
+    material = json.dumps([content_id, model_size, options or {}], sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class TranscriptCache:
+    """Size-bounded on-disk cache of transcription results.
+
+    Entries are evicted least recently used first once their total size
+    exceeds ``max_bytes``. The index is rebuilt from the folder at startup,
+    ordered by modification time, which is refreshed on every hit.
+    """
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        os.makedirs(folder, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.folder, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+
+    def _adopt(self, key):
+        """Index an entry another worker process wrote since the index was built.
+
+        Must be called with ``self._lock`` held; returns whether ``key`` is cached.
+        """
+        if key in self._entries:
+            return True
+        try:
+            self._entries[key] = os.path.getsize(self._path(key))
+        except OSError:
+            return False
+        return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._adopt(key)
+
+    def get(self, key):
+        """Return the cached transcript for ``key``, or None."""
+        with self._lock:
+            if not self._adopt(key):
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    transcript = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return transcript
+
+    def put(self, key, transcript):
+        """Store ``transcript`` under ``key`` and evict to stay within budget."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(transcript, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries[key] = os.path.getsize(path)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def shrink(self, nbytes):
+        """Evict least recently used entries until ``nbytes`` are freed; returns ``(files, bytes)`` removed."""
+        files = freed = 0
+        with self._lock:
+            while freed < nbytes and self._entries:
+                key, size = self._entries.popitem(last=False)
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    continue
+                files += 1
+                freed += size
+        return files, freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,299 @@
+"""
+Compact on-disk transcript format.
+A transcript is a deflate-compressed ZIP archive whose members hold the
+metadata, the plain text, the segment table and the token arrays separately,
+so the text or the segments can be read without touching the rest. The full
+JSON document is rebuilt on demand for exports. Word timestamps, when
+present, are kept as parallel arrays that ``WordIndex`` binary-searches.
+
+Legacy pretty-printed ``.json`` transcripts are read transparently.
+"""
+
+import io
+import json
+import os
+import sys
+import uuid
+import zipfile
+
+import numpy as np
+
+TRANSCRIPT_EXTENSION = '.transcript'
+FORMAT_VERSION = 1
+
+META_MEMBER = 'meta.json'
+TEXT_MEMBER = 'text.txt'
+SEGMENTS_MEMBER = 'segments.json'
+TOKENS_MEMBER = 'tokens.npy'
+TOKEN_OFFSETS_MEMBER = 'token_offsets.npy'
+WORD_SEGMENT_OFFSETS_MEMBER = 'word_segment_offsets.npy'
+WORD_CHARS_MEMBER = 'word_chars.npy'
+WORD_STARTS_MEMBER = 'word_starts.npy'
+WORD_ENDS_MEMBER = 'word_ends.npy'
+WORD_PROBABILITIES_MEMBER = 'word_probabilities.npy'
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _npy_load(archive, member):
+    return np.load(io.BytesIO(archive.read(member)))
+
+
+def word_arrays(text, segments):
+    """Word timings of ``segments`` as parallel arrays, or None if they have none.
+
+    Returns a dict of ``segment_offsets`` (each segment's first word, plus
+    the total), ``chars`` (start and end offset of each word in ``text``),
+    ``starts``, ``ends`` and ``probabilities``.
+    """
+    counts = [len(segment.get('words') or []) for segment in segments]
+    if not any(counts):
+        return None
+    segment_offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum(counts, out=segment_offsets[1:])
+    total = int(segment_offsets[-1])
+    chars = np.zeros((total, 2), dtype=np.int32)
+    starts = np.zeros(total, dtype=np.float32)
+    ends = np.zeros(total, dtype=np.float32)
+    probabilities = np.zeros(total, dtype=np.float16)
+
+    i = 0
+    cursor = 0
+    for segment in segments:
+        for word in segment.get('words') or []:
+            # Words are located in the text in order; one that can't be found
+            # nearby is pinned to the current position rather than skipping ahead
+            stripped = word['word'].strip()
+            position = text.find(stripped, cursor, cursor + len(word['word']) + 64) if stripped else -1
+            if position < 0:
+                position = cursor
+            cursor = position + len(stripped)
+            chars[i] = (position, cursor)
+            starts[i] = word['start']
+            ends[i] = word['end']
+            probabilities[i] = word.get('probability', 0.0)
+            i += 1
+    return {'segment_offsets': segment_offsets, 'chars': chars, 'starts': starts, 'ends': ends,
+            'probabilities': probabilities}
+
+
+class WordIndex:
+    """Word timings of a transcript, searchable by time and by text offset.
+
+    Words are ordered by time and by position in the text, so both lookups
+    are binary searches over the arrays built by ``word_arrays()``.
+    """
+
+    def __init__(self, text, arrays):
+        self.text = text
+        self.segment_offsets = arrays['segment_offsets']
+        self.chars = arrays['chars']
+        self.starts = arrays['starts']
+        self.ends = arrays['ends']
+        self.probabilities = arrays['probabilities']
+
+    def __len__(self):
+        return len(self.starts)
+
+    def word(self, index):
+        """Word ``index`` as a dict with its times and character span."""
+        char_start, char_end = (int(value) for value in self.chars[index])
+        return {
+            'index': int(index),
+            'word': self.text[char_start:char_end],
+            'start': round(float(self.starts[index]), 3),
+            'end': round(float(self.ends[index]), 3),
+            'probability': round(float(self.probabilities[index]), 3),
+            'char_start': char_start,
+            'char_end': char_end,
+            'segment': int(np.searchsorted(self.segment_offsets, index, side='right')) - 1,
+        }
+
+    def at_time(self, seconds):
+        """Index of the word being spoken at ``seconds``, or the last one before it."""
+        return max(int(np.searchsorted(self.starts, seconds, side='right')) - 1, 0)
+
+    def at_char(self, offset):
+        """Index of the word at character ``offset`` of the text, or the last one before it."""
+        return max(int(np.searchsorted(self.chars[:, 0], offset, side='right')) - 1, 0)
+
+    def segment_words(self, segment_index):
+        """The ``words`` list of one segment, as Whisper returns it."""
+        words = []
+        first, last = int(self.segment_offsets[segment_index]), int(self.segment_offsets[segment_index + 1])
+        for i in range(first, last):
+            # The word keeps the whitespace before it, as Whisper emits it
+            previous_end = int(self.chars[i - 1, 1]) if i else 0
+            words.append({
+                'word': self.text[previous_end:int(self.chars[i, 1])],
+                'start': round(float(self.starts[i]), 3),
+                'end': round(float(self.ends[i]), 3),
+                'probability': round(float(self.probabilities[i]), 3),
+            })
+        return words
+
+
+def write_transcript(path, transcript_data):
+    """Write ``transcript_data`` (the dict Whisper results are saved as) to ``path``."""
+    segments = transcript_data.get('segments') or []
+    metadata = {k: v for k, v in transcript_data.items() if k not in ('text', 'segments')}
+    metadata['format_version'] = FORMAT_VERSION
+
+    # Segment fields are stored column-wise; tokens go to a flat int32 array
+    columns = {}
+    for segment in segments:
+        for key in segment:
+            if key not in ('tokens', 'words') and key not in columns:
+                columns[key] = []
+    for segment in segments:
+        for key, values in columns.items():
+            values.append(segment.get(key))
+    lengths = [len(segment.get('tokens') or []) for segment in segments]
+    offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.fromiter(
+        (token for segment in segments for token in (segment.get('tokens') or [])),
+        dtype=np.int32,
+        count=int(offsets[-1]),
+    )
+    words = word_arrays(transcript_data.get('text', ''), segments)
+
+    # Concurrent writers of the same path each get their own partial file
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(META_MEMBER, json.dumps(metadata, ensure_ascii=False))
+            archive.writestr(TEXT_MEMBER, transcript_data.get('text', ''))
+            archive.writestr(SEGMENTS_MEMBER, json.dumps(
+                {'count': len(segments), 'columns': columns}, ensure_ascii=False, separators=(',', ':')))
+            archive.writestr(TOKENS_MEMBER, _npy_bytes(tokens))
+            archive.writestr(TOKEN_OFFSETS_MEMBER, _npy_bytes(offsets))
+            if words is not None:
+                archive.writestr(WORD_SEGMENT_OFFSETS_MEMBER, _npy_bytes(words['segment_offsets']))
+                archive.writestr(WORD_CHARS_MEMBER, _npy_bytes(words['chars']))
+                archive.writestr(WORD_STARTS_MEMBER, _npy_bytes(words['starts']))
+                archive.writestr(WORD_ENDS_MEMBER, _npy_bytes(words['ends']))
+                archive.writestr(WORD_PROBABILITIES_MEMBER, _npy_bytes(words['probabilities']))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return path
+
+
+class TranscriptReader:
+    """Lazy reader for a stored transcript.
+
+    Each accessor only decompresses the members it needs. Legacy ``.json``
+    transcripts are parsed in full on first access instead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.is_legacy = not zipfile.is_zipfile(path)
+        self._legacy = None
+
+    def _load_legacy(self):
+        if self._legacy is None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._legacy = json.load(f)
+        return self._legacy
+
+    def _read(self, member):
+        with zipfile.ZipFile(self.path) as archive:
+            return archive.read(member)
+
+    def metadata(self):
+        """Everything except the text and segments (source, title, language...)."""
+        if self.is_legacy:
+            return {k: v for k, v in self._load_legacy().items() if k not in ('text', 'segments')}
+        metadata = json.loads(self._read(META_MEMBER))
+        metadata.pop('format_version', None)
+        return metadata
+
+    def text(self):
+        if self.is_legacy:
+            return self._load_legacy().get('text', '')
+        return self._read(TEXT_MEMBER).decode('utf-8')
+
+    def segments(self, include_tokens=False, include_words=False):
+        """Segment dicts in order, optionally with their ``tokens`` and ``words`` lists."""
+        if self.is_legacy:
+            segments = self._load_legacy().get('segments', [])
+            if include_tokens and include_words:
+                return segments
+            excluded = {key for key, included in (('tokens', include_tokens), ('words', include_words))
+                        if not included}
+            return [{k: v for k, v in s.items() if k not in excluded} for s in segments]
+
+        with zipfile.ZipFile(self.path) as archive:
+            table = json.loads(archive.read(SEGMENTS_MEMBER))
+            if include_tokens:
+                tokens = _npy_load(archive, TOKENS_MEMBER)
+                offsets = _npy_load(archive, TOKEN_OFFSETS_MEMBER)
+        words = self.words() if include_words else None
+        columns = table['columns']
+        segments = []
+        for i in range(table['count']):
+            segment = {key: values[i] for key, values in columns.items() if values[i] is not None}
+            if include_tokens:
+                segment['tokens'] = tokens[offsets[i]:offsets[i + 1]].tolist()
+            if words is not None:
+                segment['words'] = words.segment_words(i)
+            segments.append(segment)
+        return segments
+
+    def words(self):
+        """The transcript's WordIndex, or None if it has no word timestamps."""
+        if self.is_legacy:
+            data = self._load_legacy()
+            arrays = word_arrays(data.get('text', ''), data.get('segments', []))
+            return WordIndex(data.get('text', ''), arrays) if arrays is not None else None
+        with zipfile.ZipFile(self.path) as archive:
+            if WORD_STARTS_MEMBER not in archive.namelist():
+                return None
+            arrays = {
+                'segment_offsets': _npy_load(archive, WORD_SEGMENT_OFFSETS_MEMBER),
+                'chars': _npy_load(archive, WORD_CHARS_MEMBER),
+                'starts': _npy_load(archive, WORD_STARTS_MEMBER),
+                'ends': _npy_load(archive, WORD_ENDS_MEMBER),
+                'probabilities': _npy_load(archive, WORD_PROBABILITIES_MEMBER),
+            }
+            text = archive.read(TEXT_MEMBER).decode('utf-8')
+        return WordIndex(text, arrays)
+
+    def to_dict(self):
+        """The full transcript as it would have been saved in JSON."""
+        if self.is_legacy:
+            return self._load_legacy()
+        metadata = self.metadata()
+        data = {'text': self.text(), 'segments': self.segments(include_tokens=True, include_words=True)}
+        data.update(metadata)
+        return data
+
+
+def convert_legacy(json_path, remove=False):
+    """Rewrite a legacy ``.json`` transcript in the compact format."""
+    reader = TranscriptReader(json_path)
+    new_path = os.path.splitext(json_path)[0] + TRANSCRIPT_EXTENSION
+    write_transcript(new_path, reader.to_dict())
+    if remove:
+        os.remove(json_path)
+    return new_path
+
+
+if __name__ == '__main__':
+    # Usage: python transcript_store.py [transcripts_folder] [--remove]
+    folder = next((arg for arg in sys.argv[1:] if not arg.startswith('--')), 'transcripts')
+    remove = '--remove' in sys.argv
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('.json'):
+            json_path = os.path.join(folder, name)
+            old_size = os.path.getsize(json_path)
+            new_path = convert_legacy(json_path, remove=remove)
+            print(f"{name}: {old_size} -> {os.path.getsize(new_path)} bytes ({os.path.basename(new_path)})")
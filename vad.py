@@ -0,0 +1,125 @@
+"""
+Voice activity detection.
+A cheap energy-based pre-pass over 16 kHz PCM finds the regions that contain
+speech so that long silences are cut before Whisper sees the audio. The
+speech regions are concatenated for transcription and segment timestamps
+are mapped back onto the original recording afterwards.
+"""
+
+import numpy as np
+
+from chunking import SAMPLE_RATE, frame_energy
+
+VAD_FRAME_SECONDS = 0.03
+
+
+def detect_speech(audio, min_silence_seconds=1.0, padding_seconds=0.25, min_speech_seconds=0.25,
+                  margin_db=12.0, floor_db=-55.0, speech_db=-30.0):
+    """Return speech regions of ``audio`` as a list of ``(start, end)`` sample offsets.
+
+    A frame counts as speech when its level is above ``floor_db`` and either
+    ``margin_db`` above the recording's noise floor (its 10th percentile
+    level) or above ``speech_db`` outright, so audio at speech level is kept
+    however little its level varies. A recording whose levels don't spread
+    over ``margin_db`` (continuous speech, music, steady noise) has no pauses
+    to tell apart from the rest and is returned whole, unless it is all below
+    ``floor_db``. Pauses shorter than ``min_silence_seconds`` are kept,
+    regions are widened by ``padding_seconds`` either side and blips shorter
+    than ``min_speech_seconds`` are dropped.
+    """
+    frame = int(SAMPLE_RATE * VAD_FRAME_SECONDS)
+    energy = frame_energy(audio, VAD_FRAME_SECONDS)
+    if len(energy) == 0:
+        return []
+    level = 20 * np.log10(np.maximum(energy, 1e-10))
+    noise_floor, loud = np.percentile(level, [10, 90])
+    if loud - noise_floor < margin_db:
+        return [(0, len(audio))] if loud > floor_db else []
+    threshold = max(min(noise_floor + margin_db, speech_db), floor_db)
+    speech = np.concatenate(([False], level > threshold, [False]))
+
+    # Rising and falling edges of the speech mask, in frames
+    edges = np.flatnonzero(np.diff(speech.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+
+    # Bridge short pauses, then pad and drop what is too short to be speech
+    gaps = starts[1:] - ends[:-1]
+    keep = np.concatenate(([True], gaps >= min_silence_seconds / VAD_FRAME_SECONDS))
+    starts = starts[keep]
+    ends = np.concatenate((ends[:-1][keep[1:]], ends[-1:]))
+    long_enough = (ends - starts) >= min_speech_seconds / VAD_FRAME_SECONDS
+    padding = int(padding_seconds / VAD_FRAME_SECONDS)
+    starts = np.maximum(starts[long_enough] - padding, 0) * frame
+    ends = np.minimum((ends[long_enough] + padding) * frame, len(audio))
+
+    regions = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+class SpeechTimeline:
+    """Maps times in the concatenated speech audio back to the original recording."""
+
+    def __init__(self, regions, total_samples):
+        self.regions = regions
+        self.total_samples = total_samples
+        lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+        self._compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / SAMPLE_RATE
+        self._original_starts = np.array([start for start, _ in regions], dtype=np.float64) / SAMPLE_RATE
+        self._lengths = lengths / SAMPLE_RATE
+
+    def to_original(self, seconds, is_end=False):
+        """Original time of ``seconds`` on the compacted timeline.
+
+        ``is_end`` maps a time falling exactly on a join to the end of the
+        earlier region rather than the start of the next one.
+        """
+        if not self.regions:
+            return seconds
+        side = 'left' if is_end else 'right'
+        index = max(int(np.searchsorted(self._compact_starts, seconds, side=side)) - 1, 0)
+        offset = min(seconds - self._compact_starts[index], self._lengths[index])
+        return float(self._original_starts[index] + offset)
+
+    def remap_segment(self, segment):
+        """Return a copy of ``segment`` (and its words) on the original timeline."""
+        segment = dict(segment)
+        segment['start'] = round(self.to_original(segment['start']), 3)
+        segment['end'] = round(self.to_original(segment['end'], is_end=True), 3)
+        if segment.get('words'):
+            segment['words'] = [
+                dict(word, start=round(self.to_original(word['start']), 3),
+                     end=round(self.to_original(word['end'], is_end=True), 3))
+                for word in segment['words']
+            ]
+        return segment
+
+    def report(self):
+        """How much of the recording was kept and skipped."""
+        total = self.total_samples / SAMPLE_RATE
+        speech = float(self._lengths.sum())
+        return {
+            'regions': len(self.regions),
+            'total_seconds': round(total, 2),
+            'speech_seconds': round(speech, 2),
+            'skipped_seconds': round(total - speech, 2),
+            'skipped_ratio': round(1 - speech / total, 3) if total else 0.0,
+        }
+
+
+def compact_speech(audio, **options):
+    """Cut silence from ``audio``; returns ``(speech_audio, SpeechTimeline)``.
+
+    ``options`` are passed to ``detect_speech()``.
+    """
+    regions = detect_speech(audio, **options)
+    timeline = SpeechTimeline(regions, len(audio))
+    if not regions:
+        return audio[:0], timeline
+    return np.concatenate([audio[start:end] for start, end in regions]), timeline
@@ -0,0 +1,167 @@
+"""
+YouTube audio fetching.
+yt-dlp only resolves the video's native audio stream; ffmpeg reads that
+stream directly and decodes it into a growing PCM buffer, so there is no
+intermediate MP3 transcode and no file on disk. Fetches run in their own
+thread pool, several at a time, ahead of and alongside transcription.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ingest import AudioBuffer, stream_decode
+from jobs import CancelToken, TranscriptionCancelled
+
+logger = logging.getLogger(__name__)
+
+YDL_OPTIONS = {
+    # The container YouTube already serves (opus/webm or m4a); ffmpeg decodes it as it arrives
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'noplaylist': True,
+    # Add user agent and other headers to avoid 403 errors
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    },
+    'extractor_retries': 3,
+    'no_warnings': False,
+}
+
+
+def default_ydl_factory(options):
+    import yt_dlp
+    return yt_dlp.YoutubeDL(options)
+
+
+def friendly_error(error):
+    """Translate a yt-dlp failure into a message for the user."""
+    message = str(error)
+    if "403" in message or "Forbidden" in message:
+        return Exception("YouTube access forbidden. This video may be restricted or require sign-in. Try a different video or check if the URL is correct.")
+    if "unavailable" in message.lower() or "private" in message.lower():
+        return Exception("This YouTube video is unavailable or private. Please try a different video.")
+    return Exception(f"YouTube download failed: {message}")
+
+
+def media_source(info):
+    """Return ``(url, headers)`` of the audio stream chosen by yt-dlp."""
+    formats = info.get('requested_formats') or [info]
+    for fmt in formats:
+        if fmt.get('url') and fmt.get('acodec') != 'none':
+            return fmt['url'], fmt.get('http_headers') or {}
+    raise Exception("No audio stream found for this YouTube video.")
+
+
+class Fetch:
+    """One video being fetched: its metadata, decoded audio and readiness.
+
+    ``ready`` is set once enough audio is buffered to start transcribing, or
+    when the fetch ends (check ``error``). ``buffer`` keeps growing after that.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.video_id = None
+        self.title = None
+        self.duration = None
+        self.buffer = AudioBuffer()
+        self.ready = threading.Event()
+        self.error = None
+        self.download_seconds = None
+        # True if transcription may start before the fetch has finished
+        self.progressive = False
+        self.cancel_token = CancelToken()
+
+    def abort(self):
+        """Stop fetching, e.g. because the transcript turned out to be cached."""
+        self.cancel_token.cancel()
+
+
+class YouTubeFetcher:
+    """Runs up to ``workers`` fetches at once.
+
+    A fetch becomes ready after ``ready_seconds`` of audio when the video is
+    shorter than ``progressive_max_seconds``; longer or open-ended videos are
+    only ready once complete, so they can be split across processes.
+    ``ydl_factory(options)`` builds the YoutubeDL-like object used to resolve
+    URLs and can be replaced with a stand-in. ``on_ready(fetch)`` is called
+    when a fetch becomes ready.
+    """
+
+    def __init__(self, workers=3, ready_seconds=30, progressive_max_seconds=None,
+                 ydl_factory=None, on_ready=None):
+        self.ready_seconds = ready_seconds
+        self.progressive_max_seconds = progressive_max_seconds
+        self.ydl_factory = ydl_factory or default_ydl_factory
+        self.on_ready = on_ready
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetcher')
+
+    def fetch(self, url, progress=None, cancel_token=None):
+        """Start fetching ``url`` in the background and return its Fetch."""
+        fetch = Fetch(url)
+        self.start(fetch, progress, cancel_token)
+        return fetch
+
+    def start(self, fetch, progress=None, cancel_token=None):
+        """Schedule ``fetch``; ``progress(event, **data)`` receives ``download`` events."""
+        if cancel_token is not None:
+            cancel_token.on_cancel(fetch.abort)
+        self._executor.submit(self._run, fetch, progress)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _extract(self, url):
+        with self.ydl_factory(dict(YDL_OPTIONS)) as ydl:
+            try:
+                return ydl.extract_info(url, download=False)
+            except Exception as e:
+                raise friendly_error(e) from e
+
+    def _mark_ready(self, fetch):
+        if not fetch.ready.is_set():
+            fetch.ready.set()
+            if self.on_ready is not None:
+                self.on_ready(fetch)
+
+    def _run(self, fetch, progress):
+        started = time.perf_counter()
+        try:
+            fetch.cancel_token.check()
+            info = self._extract(fetch.url)
+            fetch.video_id = info.get('id')
+            fetch.title = info.get('title') or 'Unknown'
+            fetch.duration = info.get('duration')
+            fetch.buffer.expected_seconds = fetch.duration
+            url, headers = media_source(info)
+            fetch.progressive = bool(fetch.duration) and (
+                self.progressive_max_seconds is None or fetch.duration < self.progressive_max_seconds)
+            report_step = max(fetch.duration / 100, 5) if fetch.duration else 30
+            next_report = [0.0]
+
+            def on_chunk(buffer):
+                seconds = buffer.seconds
+                if fetch.progressive and seconds >= self.ready_seconds:
+                    self._mark_ready(fetch)
+                if progress is not None and seconds >= next_report[0]:
+                    next_report[0] = seconds + report_step
+                    progress('download', buffered_seconds=round(seconds, 1), total_seconds=fetch.duration,
+                             percent=min(100.0, round(100 * seconds / fetch.duration, 1)) if fetch.duration else None)
+
+            if progress is not None:
+                progress('download', status='started', title=fetch.title, total_seconds=fetch.duration)
+            stream_decode(url, fetch.buffer, headers, fetch.cancel_token, on_chunk=on_chunk)
+            if progress is not None:
+                progress('download', status='finished', buffered_seconds=round(fetch.buffer.seconds, 1))
+        except TranscriptionCancelled as e:
+            fetch.error = e
+        except Exception as e:
+            logger.error(f"Error fetching YouTube audio for {fetch.url}: {e}")
+            fetch.error = e
+        finally:
+            fetch.download_seconds = time.perf_counter() - started
+            if not fetch.buffer.finished:
+                fetch.buffer.finish(fetch.error)
+            self._mark_ready(fetch)